@@ -2,66 +2,349 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-from typing import Callable, Dict, List, Tuple
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
 
+from src import metrics, profiling
+from src.analysis import (
+    DEFAULT_TIME_LIMIT,
+    PositionAnalysis,
+    analyze_games,
+    record_game,
+)
+from src.benchmark import (
+    DEFAULT_BASELINE_PATH,
+    DEFAULT_MIN_TIME,
+    DEFAULT_REPEAT,
+    DEFAULT_SEED,
+    DEFAULT_TOLERANCE,
+    compare_results,
+    format_comparison,
+    format_result,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
 from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.game import Game
 from src.gamestate import GameState
+from src.pipeline import DEFAULT_SHARD_SIZE, SelfPlayConfig, TrainingPipeline
 from src.players.humanplayer import HumanPlayer
-from src.players.player import Player
-from src.resolver import resolve
-
-
-class Game:
-    def __init__(self, state: GameState, players: Tuple[Player, Player]) -> None:
-        self._winner = PLAYER_UNRESOLVED
-        self._turn_length = 0
-        self._state = state
-        self._players = players
-
-    def get_state(self) -> GameState:
-        return self._state
-
-    def get_turn_length(self) -> int:
-        return self._turn_length
-
-    def get_winner(self) -> int:
-        return self._winner
-
-    def run(self) -> int:
-        if self._winner != PLAYER_UNRESOLVED:
-            return self._winner
-        self._turn_length += 1
-        for p in self._players:
-            # player action
-            print(repr(self._state))
-            self._state = p.play(self._state)
-            # resolve flag state
-            resolve(self._state)
-            # check winner
-            self._winner = self._state.get_winner()
-            if self._winner != PLAYER_UNRESOLVED:
-                return self._winner
-        return PLAYER_UNRESOLVED
+from src.replaybuffer import ReplayBuffer
+from src.runner import DEFAULT_MAX_TURNS, get_player_type, run_games
+from src.tournament import (
+    DEFAULT_CONFIDENCE,
+    DEFAULT_GAMES_PER_ROUND,
+    DEFAULT_MAX_GAMES,
+    DEFAULT_MIN_GAMES,
+    MODE_ROUND_ROBIN,
+    MODES,
+    Tournament,
+    format_standings,
+)
 
 
 def watch_main(arg: List[str]) -> None:
-    pass
+    parser = argparse.ArgumentParser(description="Run games between CPU players")
+    parser.add_argument("--player-a", default="random", help="type of the player A")
+    parser.add_argument("--player-b", default="greedy", help="type of the player B")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument("--report-interval", type=float, default=1.0)
+    parser.add_argument(
+        "--record", default=None, help="log file to append the records of the games"
+    )
+    parser.add_argument(
+        "--db", default=None, help="SQLite database to store the results of the games"
+    )
+    parser.add_argument(
+        "--profile",
+        type=float,
+        default=None,
+        metavar="INTERVAL",
+        help="count the time of the phases of the games, reported every INTERVAL"
+        " seconds by each worker",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="file to write the metrics of the games in the Prometheus format,"
+        " one per worker by {worker} in the name",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=metrics.DEFAULT_EXPORT_INTERVAL,
+        help="seconds between the writes of the metrics file",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="serve the metrics over HTTP on the local port (with --workers 1)",
+    )
+    args = parser.parse_args(arg)
+    if args.profile is not None:
+        profiling.enable(args.profile)
+    metrics_path = args.metrics_file
+    if (
+        metrics_path is not None
+        and args.workers != 1
+        and "{worker}" not in metrics_path
+    ):
+        root, ext = os.path.splitext(metrics_path)
+        metrics_path = f"{root}.{{worker}}{ext}"
+    if metrics_path is not None or args.metrics_port is not None:
+        metrics.enable(metrics_path, args.metrics_interval)
+    server = None if args.metrics_port is None else metrics.serve(args.metrics_port)
+    stats = run_games(
+        (args.player_a, args.player_b),
+        args.games,
+        num_workers=args.workers,
+        seed=args.seed,
+        max_turns=args.max_turns,
+        report_interval=args.report_interval,
+        on_report=lambda s: print(s.summary()),
+        record_path=args.record,
+        db_path=args.db,
+    )
+    print(stats.summary())
+    if args.profile is not None and args.workers == 1:
+        print(profiling.get_summary())
+    if metrics_path is not None and args.workers == 1:
+        metrics.export(metrics_path)
+    if server is not None:
+        server.shutdown()
 
 
 def vscpu_main(arg: List[str]) -> None:
-    pass
+    parser = argparse.ArgumentParser(description="Play a game against a CPU player")
+    parser.add_argument("--cpu", default="greedy", help="type of the CPU player")
+    parser.add_argument("--second", action="store_true", help="play as player B")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(arg)
+    human_id = PLAYER_B if args.second else PLAYER_A
+    cpu_id = PLAYER_A if args.second else PLAYER_B
+    players = {
+        human_id: HumanPlayer(human_id),
+        cpu_id: get_player_type(args.cpu)(cpu_id),
+    }
+    game = Game(
+        GameState.new(random.Random(args.seed)), (players[PLAYER_A], players[PLAYER_B])
+    )
+    while not game.is_over():
+        game.run()
+    _print_result(game)
 
 
 def vshuman_main(arg: List[str]) -> None:
     game = Game(GameState.new(), (HumanPlayer(PLAYER_A), HumanPlayer(PLAYER_B)))
-    while game.run() == PLAYER_UNRESOLVED:
-        pass
-    print(f"Player {game.run() + 1} win!")
-    print(repr(game.get_state()))
+    while not game.is_over():
+        game.run()
+    _print_result(game)
+
+
+def analyze_main(arg: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        description="Play games between CPU players and analyze them double-dummy"
+    )
+    parser.add_argument("--player-a", default="random", help="type of the player A")
+    parser.add_argument("--player-b", default="greedy", help="type of the player B")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=DEFAULT_TIME_LIMIT,
+        help="seconds to search each position",
+    )
+    args = parser.parse_args(arg)
+    records = [
+        record_game(
+            (args.player_a, args.player_b),
+            None if args.seed is None else args.seed + i,
+            args.max_turns,
+        )
+        for i in range(args.games)
+    ]
+
+    def report(index: int, analysis: List[PositionAnalysis]) -> None:
+        exact = sum(1 for a in analysis if a.exact)
+        differing = sum(1 for a in analysis if a.exact and not a.is_best())
+        value = analysis[0].value if analysis else 0
+        print(
+            f"game {index}: {len(analysis)} moves, {exact} solved, "
+            f"{differing} differing from the solved best move, "
+            f"initial value {value}"
+        )
+
+    analyze_games(records, args.workers, time_limit=args.time_limit, on_result=report)
+
+
+def tournament_main(arg: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        description="Rate the CPU players by a tournament between them"
+    )
+    parser.add_argument(
+        "players", nargs="+", help="types of the players, e.g. random greedy ismcts"
+    )
+    parser.add_argument("--mode", choices=MODES, default=MODE_ROUND_ROBIN)
+    parser.add_argument("--rounds", type=int, default=None, help="limit of the rounds")
+    parser.add_argument(
+        "--max-games", type=int, default=DEFAULT_MAX_GAMES, help="games per pairing"
+    )
+    parser.add_argument(
+        "--games-per-round",
+        type=int,
+        default=DEFAULT_GAMES_PER_ROUND,
+        help="games per pairing in each round, played on the same deals by sides",
+    )
+    parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES)
+    parser.add_argument(
+        "--z",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help="standard score of the intervals to settle the pairings",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    args = parser.parse_args(arg)
+    tournament = Tournament(
+        args.players,
+        mode=args.mode,
+        max_games=args.max_games,
+        games_per_round=args.games_per_round,
+        min_games=args.min_games,
+        z=args.z,
+        seed=args.seed,
+        max_turns=args.max_turns,
+    )
+
+    def report(t: Tournament) -> None:
+        settled = sum(1 for p in t.get_ratings().get_pairings() if not t.is_active(p))
+        print(f"round {t.get_round()}: {settled} pairings settled or played out")
+
+    standings = tournament.run(args.workers, args.rounds, on_round=report)
+    print(format_standings(standings))
+
+
+def bench_main(arg: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the engine and compare the results to the baseline"
+    )
+    parser.add_argument("names", nargs="*", help="benchmarks to run (all if not given)")
+    parser.add_argument("--output", default=None, help="JSON file of the results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="slowdown from the baseline reported as a regression",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write the results as the baseline instead of comparing",
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME)
+    args = parser.parse_args(arg)
+    results = run_benchmarks(
+        args.names or None,
+        seed=args.seed,
+        repeat=args.repeat,
+        min_time=args.min_time,
+        on_result=lambda r: print(format_result(r)),
+    )
+    if args.output:
+        save_results(args.output, results)
+    if args.update_baseline:
+        save_results(args.baseline, results)
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline: {args.baseline}")
+        return
+    comparisons = compare_results(results, load_results(args.baseline), args.tolerance)
+    for c in comparisons:
+        print(format_comparison(c))
+    if any(c.regressed for c in comparisons):
+        sys.exit(1)
 
 
 def train_main(arg: List[str]) -> None:
-    pass
+    parser = argparse.ArgumentParser(
+        description="Stream the mini-batches of the samples from self-play games"
+    )
+    parser.add_argument("--player-a", default="random", help="type of the player A")
+    parser.add_argument("--player-b", default="random", help="type of the player B")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--games", type=int, default=None, help="games per worker")
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument(
+        "--data-dir", default=None, help="directory of the shards (temporary if None)"
+    )
+    parser.add_argument(
+        "--buffer", default=None, help="replay buffer file to append the samples"
+    )
+    parser.add_argument("--buffer-capacity", type=int, default=1 << 20)
+    args = parser.parse_args(arg)
+    config = SelfPlayConfig(
+        (args.player_a, args.player_b), args.max_turns, args.shard_size, args.seed
+    )
+    buffer = ReplayBuffer(args.buffer, args.buffer_capacity) if args.buffer else None
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        if buffer is not None:
+            stack.enter_context(buffer)
+        pipeline = stack.enter_context(
+            TrainingPipeline(
+                data_dir,
+                config,
+                args.batch_size,
+                num_workers=args.workers,
+                games_per_worker=args.games,
+                rng=random.Random(args.seed),
+            )
+        )
+        start = time.perf_counter()
+        num_batches = 0
+        num_samples = 0
+        for batch in pipeline:
+            num_batches += 1
+            num_samples += len(batch)
+            if buffer is not None:
+                for i in range(len(batch)):
+                    buffer.append_encoded(batch.get_record(i))
+            if num_batches >= args.batches:
+                break
+        elapsed = time.perf_counter() - start
+        print(
+            f"{num_batches} batches, {num_samples} samples in {elapsed:.1f}s "
+            f"({num_samples / max(elapsed, 1e-9):.0f} samples/s)"
+        )
+
+
+def _print_result(game: Game) -> None:
+    if game.get_winner() == PLAYER_UNRESOLVED:
+        print("Draw!")
+    else:
+        print(f"Player {game.get_winner() + 1} win!")
+    print(repr(game.get_state()))
 
 
 def _await_user_input() -> None:
@@ -0,0 +1,439 @@
+"""Battle Line Actions.
+
+A turn of the player (play a card from the hand, then draw a card) is described by a
+`Move`, and every move is mapped onto a single integer action id in
+[0, NUM_ACTIONS) for automated players and training environments.
+"""
+
+from enum import IntEnum, auto
+from typing import List, NamedTuple, Optional, Tuple
+
+from src.cards.cards import Card, TacticCard
+from src.cards.cardtypes import TacticEnvironments, TacticMorales, Tactics
+from src.consts import NUM_CARDS, NUM_FLAGS, PLAYER_A, PLAYER_B
+from src.gamestate import GameState, GuileOperation
+
+DRAW_TROOPS = 0
+DRAW_TACTICS = 1
+
+MAX_STACK_SIZE = 4
+SCOUT_DRAW_SIZE = 3
+SCOUT_RETURN_SIZE = 2
+
+
+class MoveKinds(IntEnum):
+    """Define the kinds of moves."""
+
+    DEPLOY = auto()
+    ENVIRONMENT = auto()
+    SCOUT = auto()
+    REDEPLOY = auto()
+    DESERTER = auto()
+    TRAITOR = auto()
+    PASS = auto()
+
+
+class Move(NamedTuple):
+    """Move of a single turn.
+
+    kind: kind of the move.
+    card: card id (`Card.get_card_id`) of the card played from the hand.
+    flag: index of the flag to deploy the card on, or to reclaim a card from.
+    slot: index of the reclaimed card in the (sorted) stack of the flag.
+    dest: index of the flag to redeploy the reclaimed card on, -1 to discard it.
+    draw: deck to draw from after the play (DRAW_TROOPS or DRAW_TACTICS).
+        For the scout, number of cards drawn from the tactics deck instead.
+        Drawing is skipped when both decks are empty.
+    """
+
+    kind: MoveKinds
+    card: int = -1
+    flag: int = -1
+    slot: int = -1
+    dest: int = -1
+    draw: int = DRAW_TROOPS
+
+
+_NUM_DRAWS = 2
+_NUM_DEPLOY_CARDS = NUM_CARDS + len(TacticMorales)
+_NUM_DESTS = NUM_FLAGS + 1  # flags and the discard
+_ENV_CARD_BASE = NUM_CARDS + int(Tactics.FOG) - 1
+_GUILE_CARD_IDS = {
+    MoveKinds.SCOUT: NUM_CARDS + int(Tactics.SCOUT) - 1,
+    MoveKinds.REDEPLOY: NUM_CARDS + int(Tactics.REDEPLOY) - 1,
+    MoveKinds.DESERTER: NUM_CARDS + int(Tactics.DESERTER) - 1,
+    MoveKinds.TRAITOR: NUM_CARDS + int(Tactics.TRAITOR) - 1,
+}
+_LEADERS = (Tactics.LEADER_ALEXANDER, Tactics.LEADER_DARIUS)
+
+_DEPLOY_BASE = 0
+_ENV_BASE = _DEPLOY_BASE + _NUM_DEPLOY_CARDS * NUM_FLAGS * _NUM_DRAWS
+_SCOUT_BASE = _ENV_BASE + len(TacticEnvironments) * NUM_FLAGS * _NUM_DRAWS
+_REDEPLOY_BASE = _SCOUT_BASE + SCOUT_DRAW_SIZE + 1
+_DESERTER_BASE = _REDEPLOY_BASE + NUM_FLAGS * MAX_STACK_SIZE * _NUM_DESTS * _NUM_DRAWS
+_TRAITOR_BASE = _DESERTER_BASE + NUM_FLAGS * MAX_STACK_SIZE * _NUM_DRAWS
+_PASS_ACTION = _TRAITOR_BASE + NUM_FLAGS * MAX_STACK_SIZE * NUM_FLAGS * _NUM_DRAWS
+
+NUM_ACTIONS = _PASS_ACTION + 1
+
+
+def encode_move(move: Move) -> int:
+    kind = move.kind
+    if kind == MoveKinds.DEPLOY:
+        return (
+            _DEPLOY_BASE + (move.card * NUM_FLAGS + move.flag) * _NUM_DRAWS + move.draw
+        )
+    if kind == MoveKinds.ENVIRONMENT:
+        env = move.card - _ENV_CARD_BASE
+        return _ENV_BASE + (env * NUM_FLAGS + move.flag) * _NUM_DRAWS + move.draw
+    if kind == MoveKinds.SCOUT:
+        return _SCOUT_BASE + move.draw
+    if kind == MoveKinds.REDEPLOY:
+        dest = move.dest if move.dest >= 0 else NUM_FLAGS
+        slot = move.flag * MAX_STACK_SIZE + move.slot
+        return _REDEPLOY_BASE + (slot * _NUM_DESTS + dest) * _NUM_DRAWS + move.draw
+    if kind == MoveKinds.DESERTER:
+        slot = move.flag * MAX_STACK_SIZE + move.slot
+        return _DESERTER_BASE + slot * _NUM_DRAWS + move.draw
+    if kind == MoveKinds.TRAITOR:
+        slot = move.flag * MAX_STACK_SIZE + move.slot
+        return _TRAITOR_BASE + (slot * NUM_FLAGS + move.dest) * _NUM_DRAWS + move.draw
+    if kind == MoveKinds.PASS:
+        return _PASS_ACTION
+    raise ValueError(f"unknown move: {move}")
+
+
+def _decode_action(action: int) -> Move:
+    if action < _ENV_BASE:
+        rest, draw = divmod(action - _DEPLOY_BASE, _NUM_DRAWS)
+        card, flag = divmod(rest, NUM_FLAGS)
+        return Move(MoveKinds.DEPLOY, card=card, flag=flag, draw=draw)
+    if action < _SCOUT_BASE:
+        rest, draw = divmod(action - _ENV_BASE, _NUM_DRAWS)
+        env, flag = divmod(rest, NUM_FLAGS)
+        return Move(
+            MoveKinds.ENVIRONMENT, card=_ENV_CARD_BASE + env, flag=flag, draw=draw
+        )
+    if action < _REDEPLOY_BASE:
+        card = _GUILE_CARD_IDS[MoveKinds.SCOUT]
+        return Move(MoveKinds.SCOUT, card=card, draw=action - _SCOUT_BASE)
+    if action < _DESERTER_BASE:
+        rest, draw = divmod(action - _REDEPLOY_BASE, _NUM_DRAWS)
+        slot, dest = divmod(rest, _NUM_DESTS)
+        flag, slot = divmod(slot, MAX_STACK_SIZE)
+        return Move(
+            MoveKinds.REDEPLOY,
+            card=_GUILE_CARD_IDS[MoveKinds.REDEPLOY],
+            flag=flag,
+            slot=slot,
+            dest=dest if dest < NUM_FLAGS else -1,
+            draw=draw,
+        )
+    if action < _TRAITOR_BASE:
+        slot, draw = divmod(action - _DESERTER_BASE, _NUM_DRAWS)
+        flag, slot = divmod(slot, MAX_STACK_SIZE)
+        card = _GUILE_CARD_IDS[MoveKinds.DESERTER]
+        return Move(MoveKinds.DESERTER, card=card, flag=flag, slot=slot, draw=draw)
+    if action < _PASS_ACTION:
+        rest, draw = divmod(action - _TRAITOR_BASE, _NUM_DRAWS)
+        slot, dest = divmod(rest, NUM_FLAGS)
+        flag, slot = divmod(slot, MAX_STACK_SIZE)
+        return Move(
+            MoveKinds.TRAITOR,
+            card=_GUILE_CARD_IDS[MoveKinds.TRAITOR],
+            flag=flag,
+            slot=slot,
+            dest=dest,
+            draw=draw,
+        )
+    return Move(MoveKinds.PASS)
+
+
+_ACTION_TABLE = [_decode_action(a) for a in range(NUM_ACTIONS)]
+
+
+def decode_action(action: int) -> Move:
+    if not 0 <= action < NUM_ACTIONS:
+        raise ValueError(f"invalid action: {action}")
+    return _ACTION_TABLE[action]
+
+
+def get_opponent(player: int) -> int:
+    return PLAYER_B if player == PLAYER_A else PLAYER_A
+
+
+def legal_actions(state: GameState, player: int) -> List[int]:
+    """Enumerate the legal action ids of the player in ascending order."""
+    opponent = get_opponent(player)
+    flags = state.get_flags()
+    troops_deck = state.get_troops_deck()
+    tactics_deck = state.get_tactics_deck()
+    draws = [DRAW_TROOPS] if troops_deck.is_remain() else []
+    if tactics_deck.is_remain():
+        draws.append(DRAW_TACTICS)
+    if not draws:
+        # both decks are empty; the draw is skipped
+        draws.append(DRAW_TROOPS)
+    open_flags = [i for i, f in enumerate(flags) if not f.is_resolved()]
+    deployable = [
+        i
+        for i in open_flags
+        if len(flags[i].get_stacked_cards(player)) < flags[i].get_required_card_num()
+    ]
+    hands = state.get_hands(player)
+    can_play_tactics: Optional[bool] = None
+    actions: List[int] = []
+    for card in hands:
+        card_id = card.get_card_id()
+        if card_id < NUM_CARDS:
+            base = _DEPLOY_BASE + card_id * NUM_FLAGS * _NUM_DRAWS
+            for f in deployable:
+                for d in draws:
+                    actions.append(base + f * _NUM_DRAWS + d)
+            continue
+        if can_play_tactics is None:
+            can_play_tactics = state.get_num_played_tactics(
+                player
+            ) <= state.get_num_played_tactics(opponent)
+        if not can_play_tactics:
+            continue
+        tactic = Tactics(card_id - NUM_CARDS + 1)
+        if tactic in TacticMorales:
+            if tactic in _LEADERS and state.has_played_leader(player):
+                continue
+            base = _DEPLOY_BASE + card_id * NUM_FLAGS * _NUM_DRAWS
+            for f in deployable:
+                for d in draws:
+                    actions.append(base + f * _NUM_DRAWS + d)
+        elif tactic in TacticEnvironments:
+            base = _ENV_BASE + (card_id - _ENV_CARD_BASE) * NUM_FLAGS * _NUM_DRAWS
+            for f in open_flags:
+                for d in draws:
+                    actions.append(base + f * _NUM_DRAWS + d)
+        elif tactic == Tactics.SCOUT:
+            for n_tactics in range(SCOUT_DRAW_SIZE + 1):
+                if (
+                    len(tactics_deck) >= n_tactics
+                    and len(troops_deck) >= SCOUT_DRAW_SIZE - n_tactics
+                ):
+                    actions.append(_SCOUT_BASE + n_tactics)
+        elif tactic == Tactics.REDEPLOY:
+            for f in open_flags:
+                for slot in range(len(flags[f].get_stacked_cards(player))):
+                    base = (f * MAX_STACK_SIZE + slot) * _NUM_DESTS
+                    for dest in deployable + [NUM_FLAGS]:
+                        if dest == f:
+                            continue
+                        for d in draws:
+                            actions.append(
+                                _REDEPLOY_BASE + (base + dest) * _NUM_DRAWS + d
+                            )
+        elif tactic == Tactics.DESERTER:
+            for f in open_flags:
+                for slot in range(len(flags[f].get_stacked_cards(opponent))):
+                    base = (f * MAX_STACK_SIZE + slot) * _NUM_DRAWS
+                    for d in draws:
+                        actions.append(_DESERTER_BASE + base + d)
+        elif tactic == Tactics.TRAITOR:
+            for f in open_flags:
+                for slot in range(len(flags[f].get_stacked_cards(opponent))):
+                    base = (f * MAX_STACK_SIZE + slot) * NUM_FLAGS
+                    for dest in deployable:
+                        for d in draws:
+                            actions.append(
+                                _TRAITOR_BASE + (base + dest) * _NUM_DRAWS + d
+                            )
+    if not deployable or all(isinstance(c, TacticCard) for c in hands):
+        # passing is allowed only when no troop could be deployed
+        actions.append(_PASS_ACTION)
+    actions.sort()
+    return actions
+
+
+def legal_moves(state: GameState, player: int) -> List[Move]:
+    return [_ACTION_TABLE[a] for a in legal_actions(state, player)]
+
+
+def apply_action(state: GameState, player: int, action: int) -> Optional[Card]:
+    return apply_move(state, player, decode_action(action))
+
+
+def apply_move(state: GameState, player: int, move: Move) -> Optional[Card]:
+    """Apply the move of the player to the state in place.
+
+    Returns:
+        Optional[Card] - the card drawn at the end of the turn, if any.
+    """
+    kind = move.kind
+    if kind == MoveKinds.PASS:
+        return None
+    hands = state.get_hands(player)
+    card = _take_card_from_hands(hands, move.card)
+    state.add_played_tactic(player, card)
+    flags = state.get_flags()
+    if kind == MoveKinds.DEPLOY:
+        flags[move.flag].add_stack(player, card)  # type: ignore
+    elif kind == MoveKinds.ENVIRONMENT:
+        flags[move.flag].add_env(player, card)  # type: ignore
+    elif kind == MoveKinds.SCOUT:
+        _scout(state, player, move.draw)
+        state.get_operations(player).append(GuileOperation(card, None))  # type: ignore
+        return None
+    else:
+        owner = player if kind == MoveKinds.REDEPLOY else get_opponent(player)
+        reclaim_flag = flags[move.flag]
+        reclaimed = reclaim_flag.get_stacked_cards(owner)[move.slot]
+        removal = reclaim_flag.remove_stack(owner, reclaimed)
+        assert removal is not None
+        if move.dest >= 0:
+            flags[move.dest].add_stack(player, removal)
+            operation = GuileOperation(card, None)  # type: ignore
+        else:
+            operation = GuileOperation(card, removal)  # type: ignore
+        state.get_operations(player).append(operation)
+    return draw_card(state, player, move.draw)
+
+
+def draw_card(state: GameState, player: int, deck: int) -> Optional[Card]:
+    troops_deck = state.get_troops_deck()
+    tactics_deck = state.get_tactics_deck()
+    card: Optional[Card] = None
+    if deck == DRAW_TACTICS and tactics_deck.is_remain():
+        card = tactics_deck.draw()
+    elif troops_deck.is_remain():
+        card = troops_deck.draw()
+    elif tactics_deck.is_remain():
+        card = tactics_deck.draw()
+    if card is not None:
+        state.add_hand(player, card)
+    return card
+
+
+def choose_scout_returns(state: GameState, player: int, n_tactics: int) -> List[Card]:
+    """Choose the cards the scout returns to the decks.
+
+    The scout returns the two weakest cards (the first ones in the sorted order)
+    among the hands and the cards to be drawn, except the scout card itself.
+    """
+    scout_id = _GUILE_CARD_IDS[MoveKinds.SCOUT]
+    cards = [c for c in state.get_hands(player) if c.get_card_id() != scout_id]
+    cards.extend(state.get_tactics_deck().peek(n_tactics))
+    cards.extend(state.get_troops_deck().peek(SCOUT_DRAW_SIZE - n_tactics))
+    cards.sort()
+    return cards[:SCOUT_RETURN_SIZE]
+
+
+def _scout(state: GameState, player: int, n_tactics: int) -> None:
+    returns = choose_scout_returns(state, player, n_tactics)
+    hands = state.get_hands(player)
+    troops_deck = state.get_troops_deck()
+    tactics_deck = state.get_tactics_deck()
+    hands.extend(tactics_deck.draw() for _ in range(n_tactics))
+    hands.extend(troops_deck.draw() for _ in range(SCOUT_DRAW_SIZE - n_tactics))
+    for returned in returns:
+        hands.remove(returned)
+        if isinstance(returned, TacticCard):
+            tactics_deck.back(returned, player)
+        else:
+            troops_deck.back(returned, player)  # type: ignore
+    hands.sort()
+
+
+def _take_card_from_hands(hands: List[Card], card_id: int) -> Card:
+    for i, c in enumerate(hands):
+        if c.get_card_id() == card_id:
+            return hands.pop(i)
+    raise ValueError(f"card {card_id} is not in the hands")
+
+
+def infer_move(before: GameState, after: GameState, player: int) -> Optional[Move]:
+    """Infer the move the player played between the two states.
+
+    Returns:
+        Optional[Move] - the move, or None if the states are not related by
+            a single move of the player.
+    """
+    opponent = get_opponent(player)
+    draw = (
+        DRAW_TACTICS
+        if len(after.get_tactics_deck()) < len(before.get_tactics_deck())
+        else DRAW_TROOPS
+    )
+    before_ops = before.get_operations(player)
+    after_ops = after.get_operations(player)
+    if len(after_ops) == len(before_ops) + 1:
+        guile = after_ops[-1].get_tactic_guile_card()
+        kind = _GUILE_MOVE_KINDS[guile.get_tactics()]
+        if kind == MoveKinds.SCOUT:
+            return _infer_scout(before, after, player)
+        owner = player if kind == MoveKinds.REDEPLOY else opponent
+        reclaimed = _find_stack_diff(before, after, owner, removed=True)
+        if reclaimed is None:
+            return None
+        flag, slot = reclaimed
+        redeployed = _find_stack_diff(before, after, player, removed=False)
+        dest = redeployed[0] if redeployed is not None else -1
+        if kind == MoveKinds.TRAITOR and dest < 0:
+            return None
+        if kind == MoveKinds.DESERTER:
+            dest = -1
+        return Move(kind, guile.get_card_id(), flag, slot, dest, draw)
+    if len(after_ops) != len(before_ops):
+        return None
+    deployed = _find_stack_diff(before, after, player, removed=False)
+    if deployed is not None:
+        flag, slot = deployed
+        card = after.get_flags()[flag].get_stacked_cards(player)[slot]
+        return Move(MoveKinds.DEPLOY, card.get_card_id(), flag, draw=draw)
+    for i, (b, a) in enumerate(zip(before.get_flags(), after.get_flags())):
+        b_envs = b.get_stacked_envs(player)
+        a_envs = a.get_stacked_envs(player)
+        if len(a_envs) > len(b_envs):
+            card = [e for e in a_envs if e not in b_envs][0]
+            return Move(MoveKinds.ENVIRONMENT, card.get_card_id(), i, draw=draw)
+    if len(after.get_hands(player)) == len(before.get_hands(player)):
+        return Move(MoveKinds.PASS)
+    return None
+
+
+_GUILE_MOVE_KINDS = {
+    Tactics.SCOUT: MoveKinds.SCOUT,
+    Tactics.REDEPLOY: MoveKinds.REDEPLOY,
+    Tactics.DESERTER: MoveKinds.DESERTER,
+    Tactics.TRAITOR: MoveKinds.TRAITOR,
+}
+
+
+def _infer_scout(before: GameState, after: GameState, player: int) -> Optional[Move]:
+    scout_id = _GUILE_CARD_IDS[MoveKinds.SCOUT]
+    hands = [c for c in before.get_hands(player) if c.get_card_id() != scout_id]
+    after_hands = after.get_hands(player)
+    for n_tactics in range(SCOUT_DRAW_SIZE + 1):
+        if (
+            len(before.get_tactics_deck()) < n_tactics
+            or len(before.get_troops_deck()) < SCOUT_DRAW_SIZE - n_tactics
+        ):
+            continue
+        cards = hands + list(before.get_tactics_deck().peek(n_tactics))
+        cards.extend(before.get_troops_deck().peek(SCOUT_DRAW_SIZE - n_tactics))
+        if all(c in cards for c in after_hands):
+            return Move(MoveKinds.SCOUT, scout_id, draw=n_tactics)
+    return None
+
+
+def _find_stack_diff(
+    before: GameState, after: GameState, player: int, removed: bool
+) -> Optional[Tuple[int, int]]:
+    """Find the flag and the slot of the card removed from/added to the stack."""
+    for i, (b, a) in enumerate(zip(before.get_flags(), after.get_flags())):
+        b_stack = b.get_stacked_cards(player)
+        a_stack = a.get_stacked_cards(player)
+        if removed and len(a_stack) < len(b_stack):
+            for slot, c in enumerate(b_stack):
+                if c not in a_stack:
+                    return i, slot
+        if not removed and len(a_stack) > len(b_stack):
+            for slot, c in enumerate(a_stack):
+                if c not in b_stack:
+                    return i, slot
+    return None
@@ -0,0 +1,173 @@
+"""Double-dummy analysis of recorded games.
+
+Every hand and the order of the decks are revealed, then each position of the
+game is searched by the perfect-information AlphaBetaSolver.
+"""
+
+import multiprocessing
+import random
+import time
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.actions import apply_action, encode_move, get_opponent, infer_move
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.encoding import decode_state, encode_state
+from src.gamestate import GameState
+from src.resolver import resolve
+from src.runner import DEFAULT_MAX_TURNS, get_player_type
+from src.search.solver import DEFAULT_MAX_DEPTH, DEFAULT_NUM_SLOTS, AlphaBetaSolver
+from src.search.transposition import REPLACE_DEPTH, TranspositionTable
+
+DEFAULT_TIME_LIMIT = 1.0
+
+
+class GameRecord(NamedTuple):
+    """Initial state (see `encode_state`) and the actions played from it.
+
+    The players move alternately from PLAYER_A.
+    """
+
+    initial: bytes
+    actions: Sequence[int]
+
+
+class PositionAnalysis(NamedTuple):
+    """Result of the analysis of the position before the `ply`-th action.
+
+    value: score of the best move for the player (see `search.solver`).
+    exact: whether the value is the game-theoretic one.
+    """
+
+    ply: int
+    player: int
+    played: int
+    best: int
+    value: int
+    exact: bool
+    depth: int
+    nodes: int
+
+    def is_best(self) -> bool:
+        return self.played == self.best
+
+
+def record_game(
+    player_types: Tuple[str, str],
+    seed: Optional[int] = None,
+    max_turns: int = DEFAULT_MAX_TURNS,
+) -> GameRecord:
+    """Play a game between the players, recording the actions."""
+    if seed is not None:
+        random.seed(seed)
+    players = (
+        get_player_type(player_types[PLAYER_A])(PLAYER_A),
+        get_player_type(player_types[PLAYER_B])(PLAYER_B),
+    )
+    state = GameState.new(random.Random(seed))
+    initial = encode_state(state)
+    actions: List[int] = []
+    player = PLAYER_A
+    while state.get_winner() == PLAYER_UNRESOLVED and len(actions) < max_turns * 2:
+        new_state = players[player].play(state)
+        move = infer_move(state, new_state, player)
+        if move is None:
+            raise ValueError(f"the move of the player {player} is not inferable")
+        actions.append(encode_move(move))
+        state = new_state
+        resolve(state)
+        player = get_opponent(player)
+    return GameRecord(initial, actions)
+
+
+def replay_states(record: GameRecord) -> List[GameState]:
+    """Restore the state before each action and the final state."""
+    state = decode_state(record.initial)
+    states = [state.clone()]
+    player = PLAYER_A
+    for action in record.actions:
+        apply_action(state, player, action)
+        resolve(state)
+        states.append(state.clone())
+        player = get_opponent(player)
+    return states
+
+
+def analyze_game(
+    record: GameRecord,
+    time_limit: Optional[float] = DEFAULT_TIME_LIMIT,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    num_slots: int = DEFAULT_NUM_SLOTS,
+) -> List[PositionAnalysis]:
+    """Search every position of the game with everything revealed.
+
+    The positions are searched from the end of the game, so the proven values of
+    the later positions are reused from the shared transposition table by the
+    earlier ones.
+
+    Args:
+        time_limit - seconds to search each position, None for no limit
+    """
+    solver = AlphaBetaSolver(TranspositionTable(num_slots, REPLACE_DEPTH))
+    states = replay_states(record)
+    results: List[PositionAnalysis] = []
+    for ply in reversed(range(len(record.actions))):
+        player = PLAYER_A if ply % 2 == 0 else PLAYER_B
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        result = solver.solve_state(states[ply], player, deadline, max_depth)
+        results.append(
+            PositionAnalysis(
+                ply,
+                player,
+                record.actions[ply],
+                encode_move(result.move),
+                result.value,
+                result.exact,
+                result.depth,
+                result.nodes,
+            )
+        )
+    results.reverse()
+    return results
+
+
+def _analyze_indexed_game(
+    args: Tuple[int, GameRecord, Optional[float], int],
+) -> Tuple[int, List[PositionAnalysis]]:
+    index, record, time_limit, max_depth = args
+    return index, analyze_game(record, time_limit, max_depth)
+
+
+def analyze_games(
+    records: Iterable[GameRecord],
+    num_workers: Optional[int] = None,
+    time_limit: Optional[float] = DEFAULT_TIME_LIMIT,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    on_result: Optional[Callable[[int, List[PositionAnalysis]], None]] = None,
+) -> List[List[PositionAnalysis]]:
+    """Analyze the games across the process pool, one game per task.
+
+    Args:
+        num_workers - size of the process pool, games run in process if 1
+        on_result - called with the index and the analysis of each game as it
+            finishes
+    """
+    tasks = [(i, r, time_limit, max_depth) for i, r in enumerate(records)]
+    analyses: List[List[PositionAnalysis]] = [[] for _ in tasks]
+    if num_workers == 1:
+        results: Iterable = map(_analyze_indexed_game, tasks)
+        _collect(results, analyses, on_result)
+        return analyses
+    with multiprocessing.Pool(num_workers or multiprocessing.cpu_count()) as pool:
+        _collect(pool.imap_unordered(_analyze_indexed_game, tasks), analyses, on_result)
+    return analyses
+
+
+def _collect(
+    results: Iterable[Tuple[int, List[PositionAnalysis]]],
+    analyses: List[List[PositionAnalysis]],
+    on_result: Optional[Callable[[int, List[PositionAnalysis]], None]],
+) -> None:
+    for index, analysis in results:
+        analyses[index] = analysis
+        if on_result is not None:
+            on_result(index, analysis)
@@ -0,0 +1,307 @@
+"""Micro and macro benchmarks of the engine on seeded fixtures.
+
+The fixtures are built from fixed seeds, so the benchmarks time the same
+positions on every run. Each benchmark is repeated and the fastest repeat is
+kept, as the least disturbed by the other processes.
+
+The results are written as JSON (see `save_results`) and compared to a stored
+baseline (see `compare_results`), so the regressions show up in the review.
+"""
+
+import json
+import platform
+import random
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.actions import apply_action, legal_actions, legal_moves
+from src.cards.cards import CardGenerator, TroopAndTacticMoraleCard, TroopCard
+from src.cards.cardtypes import Formations
+from src.consts import PLAYER_A, PLAYER_B
+from src.flag import Flag
+from src.gamestate import GameState
+from src.resolver import (
+    aggregate_used_troops,
+    check_resolvable_for_single_flag,
+    resolve,
+)
+from src.runner import play_game
+
+DEFAULT_SEED = 0
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.05
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_BASELINE_PATH = "benchmarks/baseline.json"
+
+FIXTURE_PLIES = (8, 16, 24, 32)
+
+# Benchmark of `number` operations, returning the seconds they took.
+Benchmark = Callable[[int], float]
+
+# completed stacks of PLAYER_A by the card ids, against a stack of PLAYER_B
+# which could still beat them
+_FORMATION_STACKS: Dict[Formations, Tuple[Tuple[int, ...], Tuple[int, ...]]] = {
+    Formations.WEDGE: ((3, 4, 5), (56, 57)),
+    Formations.PHALANX: ((7, 17, 27), (38, 48)),
+    Formations.BATTALION_ORDER: ((40, 42, 48), (6, 9)),
+    Formations.SKIRMISH_LINE: ((0, 11, 22), (36, 47)),
+    Formations.HOST: ((9, 15, 21), (33, 34)),
+}
+
+
+class BenchmarkResult(NamedTuple):
+    """Time of an operation, by the fastest of `repeat` runs of `number` ones."""
+
+    name: str
+    seconds_per_op: float
+    number: int
+    repeat: int
+
+    def get_ops_per_sec(self) -> float:
+        return 1.0 / self.seconds_per_op if self.seconds_per_op > 0 else 0.0
+
+
+class Comparison(NamedTuple):
+    """Result of a benchmark against the baseline.
+
+    ratio: current time over the baseline time, above 1 when slower.
+    """
+
+    name: str
+    baseline: float
+    current: float
+    ratio: float
+    regressed: bool
+
+
+def get_fixture_states(seed: int = DEFAULT_SEED) -> List[GameState]:
+    """States of a game by random legal actions, after each of FIXTURE_PLIES."""
+    rng = random.Random(seed)
+    state = GameState.new(random.Random(seed))
+    states = []
+    player = PLAYER_A
+    for ply in range(max(FIXTURE_PLIES) + 1):
+        if ply in FIXTURE_PLIES:
+            states.append(state.clone())
+        apply_action(state, player, rng.choice(legal_actions(state, player)))
+        resolve(state)
+        player = PLAYER_B if player == PLAYER_A else PLAYER_A
+    return states
+
+
+def get_formation_flag(formation: Formations) -> Flag:
+    """Flag with the formation completed by PLAYER_A, undecided by PLAYER_B."""
+    flag = Flag()
+    a_cards, b_cards = _FORMATION_STACKS[formation]
+    for player, cards in ((PLAYER_A, a_cards), (PLAYER_B, b_cards)):
+        for card_id in cards:
+            flag.add_stack(player, _get_stack_card(card_id))
+    return flag
+
+
+def _get_stack_card(card_id: int) -> TroopAndTacticMoraleCard:
+    card = CardGenerator.from_id(card_id)
+    assert isinstance(card, TroopCard)
+    return card
+
+
+def _cycle(fixtures: Sequence, number: int) -> List:
+    return [fixtures[i % len(fixtures)] for i in range(number)]
+
+
+def get_benchmarks(seed: int = DEFAULT_SEED) -> Dict[str, Benchmark]:
+    """Benchmarks by the names, on the fixtures of the seed."""
+    states = get_fixture_states(seed)
+    used = [aggregate_used_troops(s) for s in states]
+    cards = [_get_stack_card(i) for i in (5, 25, 45)]
+    benchmarks: Dict[str, Benchmark] = {}
+
+    def clone(number: int) -> float:
+        targets = _cycle(states, number)
+        started = time.perf_counter()
+        for s in targets:
+            s.clone()
+        return time.perf_counter() - started
+
+    def add_stack(number: int) -> float:
+        flags = [Flag() for _ in range(number // len(cards) + 1)]
+        started = time.perf_counter()
+        for flag in flags:
+            for card in cards:
+                flag.add_stack(PLAYER_A, card)
+        return (time.perf_counter() - started) * number / (len(flags) * len(cards))
+
+    def aggregate(number: int) -> float:
+        targets = _cycle(states, number)
+        started = time.perf_counter()
+        for s in targets:
+            aggregate_used_troops(s)
+        return time.perf_counter() - started
+
+    def resolve_states(number: int) -> float:
+        targets = [s.clone() for s in _cycle(states, number)]
+        started = time.perf_counter()
+        for s in targets:
+            resolve(s)
+        return time.perf_counter() - started
+
+    def get_winner(number: int) -> float:
+        targets = _cycle(states, number)
+        started = time.perf_counter()
+        for s in targets:
+            s.get_winner()
+        return time.perf_counter() - started
+
+    def actions(number: int) -> float:
+        targets = _cycle(states, number)
+        started = time.perf_counter()
+        for s in targets:
+            legal_actions(s, PLAYER_A)
+        return time.perf_counter() - started
+
+    def moves(number: int) -> float:
+        targets = _cycle(states, number)
+        started = time.perf_counter()
+        for s in targets:
+            legal_moves(s, PLAYER_A)
+        return time.perf_counter() - started
+
+    def random_games(number: int) -> float:
+        started = time.perf_counter()
+        for i in range(number):
+            play_game(("random", "random"), seed + i)
+        return time.perf_counter() - started
+
+    benchmarks["gamestate.clone"] = clone
+    benchmarks["flag.add_stack"] = add_stack
+    benchmarks["resolver.aggregate_used_troops"] = aggregate
+    for formation in reversed(Formations):
+        name = formation.name.lower()
+        benchmarks[f"resolver.check_resolvable.{name}"] = _check_resolvable(
+            get_formation_flag(formation), used
+        )
+    benchmarks["resolver.resolve"] = resolve_states
+    benchmarks["gamestate.get_winner"] = get_winner
+    benchmarks["actions.legal_actions"] = actions
+    benchmarks["actions.legal_moves"] = moves
+    benchmarks["game.random_game"] = random_games
+    return benchmarks
+
+
+def _check_resolvable(flag: Flag, used: Sequence[List[TroopCard]]) -> Benchmark:
+    def check(number: int) -> float:
+        targets = _cycle(used, number)
+        started = time.perf_counter()
+        for cards in targets:
+            check_resolvable_for_single_flag(flag, cards)
+        return time.perf_counter() - started
+
+    return check
+
+
+def run_benchmark(
+    name: str,
+    benchmark: Benchmark,
+    repeat: int = DEFAULT_REPEAT,
+    min_time: float = DEFAULT_MIN_TIME,
+) -> BenchmarkResult:
+    """Time the benchmark, with the number of operations taking `min_time`."""
+    number = 1
+    while True:
+        elapsed = benchmark(number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, benchmark(number))
+    return BenchmarkResult(name, best / number, number, repeat)
+
+
+def run_benchmarks(
+    names: Optional[Sequence[str]] = None,
+    seed: int = DEFAULT_SEED,
+    repeat: int = DEFAULT_REPEAT,
+    min_time: float = DEFAULT_MIN_TIME,
+    on_result: Optional[Callable[[BenchmarkResult], None]] = None,
+) -> List[BenchmarkResult]:
+    """Run the benchmarks of the names (all if None)."""
+    benchmarks = get_benchmarks(seed)
+    if names is not None:
+        unknown = [n for n in names if n not in benchmarks]
+        if unknown:
+            raise ValueError(f"unknown benchmarks: {', '.join(unknown)}")
+    results = []
+    for name, benchmark in benchmarks.items():
+        if names is not None and name not in names:
+            continue
+        result = run_benchmark(name, benchmark, repeat, min_time)
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return results
+
+
+def save_results(path: str, results: Sequence[BenchmarkResult]) -> None:
+    """Write the results as JSON, along with the platform they ran on."""
+    data = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "benchmarks": {
+            r.name: {
+                "seconds_per_op": r.seconds_per_op,
+                "ops_per_sec": r.get_ops_per_sec(),
+                "number": r.number,
+                "repeat": r.repeat,
+            }
+            for r in results
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path: str) -> Dict[str, float]:
+    """Seconds per operation of the benchmarks saved by `save_results`."""
+    with open(path) as f:
+        data = json.load(f)
+    return {name: entry["seconds_per_op"] for name, entry in data["benchmarks"].items()}
+
+
+def compare_results(
+    results: Sequence[BenchmarkResult],
+    baseline: Dict[str, float],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[Comparison]:
+    """Compare the results to the baseline, missing ones are skipped.
+
+    A benchmark regressed when it is slower than the baseline by more than the
+    `tolerance` (as the ratio).
+    """
+    comparisons = []
+    for r in results:
+        if r.name not in baseline:
+            continue
+        base = baseline[r.name]
+        ratio = r.seconds_per_op / base if base > 0 else float("inf")
+        comparisons.append(
+            Comparison(r.name, base, r.seconds_per_op, ratio, ratio > 1 + tolerance)
+        )
+    return comparisons
+
+
+def format_result(result: BenchmarkResult) -> str:
+    return (
+        f"{result.name:<40} {result.seconds_per_op * 1e6:12.2f} us/op"
+        f" {result.get_ops_per_sec():12.1f} ops/s"
+    )
+
+
+def format_comparison(comparison: Comparison) -> str:
+    mark = "REGRESSED" if comparison.regressed else "ok"
+    return (
+        f"{comparison.name:<40} {comparison.baseline * 1e6:12.2f} ->"
+        f" {comparison.current * 1e6:12.2f} us/op ({comparison.ratio:5.2f}x) {mark}"
+    )
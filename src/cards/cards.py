@@ -14,6 +14,9 @@ from src.cards.cardtypes import (
     TroopColors,
     Troops,
 )
+from src.consts import NUM_CARD_IDS, NUM_CARDS
+
+_NUM_TROOPS = len(Troops)
 
 
 class Card(metaclass=ABCMeta):
@@ -22,6 +25,14 @@ class Card(metaclass=ABCMeta):
     def get_card_type(self) -> CardType:
         raise NotImplementedError()
 
+    def get_card_id(self) -> int:
+        """Return the unique card id in [0, NUM_CARD_IDS)."""
+        raise NotImplementedError()
+
+    def __deepcopy__(self, _memo) -> "Card":
+        # cards are immutable
+        return self
+
 
 class PlayedCard(metaclass=ABCMeta):
     """Game Card in Playing Field."""
@@ -45,6 +56,7 @@ class TroopCard(Card, TroopAndTacticMoraleCard):
     ) -> None:  # noqa: D107
         self._color = TroopColors(int(color))
         self._number = Troops(int(number))
+        self._id = (int(self._color) - 1) * _NUM_TROOPS + int(self._number) - 1
 
     def get_card_type(self) -> CardType:
         return CardType.TROOP
@@ -55,6 +67,9 @@ class TroopCard(Card, TroopAndTacticMoraleCard):
     def get_color(self) -> TroopColors:
         return self._color
 
+    def get_card_id(self) -> int:
+        return self._id
+
     def __repr__(self) -> str:  # noqa: D105
         return f"[{self._color.name[0]}{int(self._number):02}]"
 
@@ -93,6 +108,7 @@ class TacticCard(Card, metaclass=ABCMeta):
 
     def __init__(self, value: Union[Tactics, int]) -> None:  # noqa: D107
         self._value = Tactics(int(value))
+        self._id = NUM_CARDS + int(self._value) - 1
 
     def get_card_type(self) -> CardType:
         return CardType.TACTIC
@@ -100,6 +116,9 @@ class TacticCard(Card, metaclass=ABCMeta):
     def get_tactics(self) -> Tactics:
         return self._value
 
+    def get_card_id(self) -> int:
+        return self._id
+
     def __repr__(self) -> str:  # noqa: D105: D105
         tactics_table = {
             Tactics.LEADER_ALEXANDER: "MLA",
@@ -212,6 +231,16 @@ class CardGenerator:
             return TacticGuileCard(value)
         raise ValueError(value)
 
+    @staticmethod
+    def from_id(card_id: int) -> Card:
+        """Create the card from the id given by `Card.get_card_id`."""
+        if not 0 <= card_id < NUM_CARD_IDS:
+            raise ValueError(f"invalid card id: {card_id}")
+        if card_id < NUM_CARDS:
+            color, number = divmod(card_id, _NUM_TROOPS)
+            return TroopCard(color + 1, number + 1)
+        return CardGenerator.tactic(card_id - NUM_CARDS + 1)
+
     @staticmethod
     def troops() -> Iterable[TroopCard]:
         return [
@@ -1,22 +1,36 @@
 """Card decks definition."""
 
 import random
-from typing import Generic, Iterable, TypeVar
+from typing import Dict, Generic, Iterable, Optional, TypeVar
 
 from src.cards.cards import CardGenerator, TacticCard, TroopCard
+from src.consts import PLAYER_UNRESOLVED
 
 TDeckCard = TypeVar("TDeckCard")
 
 
 class Deck(Generic[TDeckCard]):
-    def __init__(self, cards: Iterable[TDeckCard]) -> None:
+    def __init__(
+        self, cards: Iterable[TDeckCard], known: Optional[Dict[int, int]] = None
+    ) -> None:
+        """Initialize the deck from the bottom card.
+
+        Args:
+            known - players knowing the card at the position (from the bottom),
+                since they put the card back
+        """
         self._cards = list(cards)
+        self._known: Dict[int, int] = known or {}
 
-    def shuffle(self) -> None:
-        random.shuffle(self._cards)
+    def shuffle(self, rng: Optional[random.Random] = None) -> None:
+        (rng or random).shuffle(self._cards)
+        self._known = {}
 
     def draw(self) -> TDeckCard:
-        return self._cards.pop()
+        card = self._cards.pop()
+        if self._known:
+            self._known.pop(len(self._cards), None)
+        return card
 
     def is_remain(self) -> bool:
         return len(self._cards) > 0
@@ -24,15 +38,26 @@ class Deck(Generic[TDeckCard]):
     def __len__(self) -> int:
         return len(self._cards)
 
-    def back(self, card: TDeckCard) -> None:
+    def back(self, card: TDeckCard, player: int = PLAYER_UNRESOLVED) -> None:
+        """Put the card back on the top, known by the player if given."""
+        if player != PLAYER_UNRESOLVED:
+            self._known[len(self._cards)] = player
         self._cards.append(card)
 
+    def get_known(self) -> Dict[int, int]:
+        """Map the positions (from the bottom) to the players knowing the card."""
+        return self._known
+
+    def get_known_cards(self, player: int) -> Dict[int, TDeckCard]:
+        """Map the positions (from the bottom) to the cards known by the player."""
+        return {i: self._cards[i] for i, p in self._known.items() if p == player}
+
     def peek(self, num: int) -> Iterable[TDeckCard]:
         for i in range(num):
             yield self._cards[-(1 + i)]
 
     def __deepcopy__(self, _memo) -> "Deck[TDeckCard]":
-        return Deck(self._cards[:])
+        return Deck(self._cards, dict(self._known))
 
 
 class TroopsDeck(Deck[TroopCard]):
@@ -41,16 +66,18 @@ class TroopsDeck(Deck[TroopCard]):
         return TroopsDeck(CardGenerator.troops())
 
     @staticmethod
-    def shuffled() -> "TroopsDeck":
+    def shuffled(rng: Optional[random.Random] = None) -> "TroopsDeck":
         t = TroopsDeck.new()
-        t.shuffle()
+        t.shuffle(rng)
         return t
 
-    def __init__(self, cards=Iterable[TroopCard]) -> None:
-        super().__init__(cards)
+    def __init__(
+        self, cards=Iterable[TroopCard], known: Optional[Dict[int, int]] = None
+    ) -> None:
+        super().__init__(cards, known)
 
     def __deepcopy__(self, _memo) -> "TroopsDeck":
-        return TroopsDeck(self._cards)
+        return TroopsDeck(self._cards, dict(self._known))
 
 
 class TacticsDeck(Deck[TacticCard]):
@@ -59,13 +86,15 @@ class TacticsDeck(Deck[TacticCard]):
         return TacticsDeck(CardGenerator.tactics())
 
     @staticmethod
-    def shuffled() -> "TacticsDeck":
+    def shuffled(rng: Optional[random.Random] = None) -> "TacticsDeck":
         t = TacticsDeck.new()
-        t.shuffle()
+        t.shuffle(rng)
         return t
 
-    def __init__(self, cards=Iterable[TacticCard]) -> None:
-        super().__init__(cards)
+    def __init__(
+        self, cards=Iterable[TacticCard], known: Optional[Dict[int, int]] = None
+    ) -> None:
+        super().__init__(cards, known)
 
     def __deepcopy__(self, _memo) -> "TacticsDeck":
-        return TacticsDeck(self._cards)
+        return TacticsDeck(self._cards, dict(self._known))
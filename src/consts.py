@@ -10,3 +10,6 @@ NUM_PLAYER = 2
 NUM_INITIAL_HAND = 7
 NUM_CARDS = 10 * 6
 NUM_COLORS = 6
+NUM_TACTICS = 10
+NUM_CARD_IDS = NUM_CARDS + NUM_TACTICS
+NUM_FLAGS = 9
@@ -0,0 +1,202 @@
+"""SQLite sink of the finished games for the queries of the results.
+
+Tables:
+    games: player types, winner (PLAYER_UNRESOLVED for a draw), turn length
+        and seed of each game, indexed by the players, the winner and the length
+    claims: flags claimed in each game, with the turn of the claim (NULL if not
+        observed) and the formation completed by the claimer
+
+The games are buffered and inserted in a single transaction per `batch_size`
+games, so the sink keeps up with the headless runner.
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.cards.cardtypes import Formations
+from src.consts import NUM_FLAGS, PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.events import FlagClaimed, GameEvent
+from src.gamestate import GameState
+from src.resolver import get_formation
+
+DEFAULT_BATCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    player_a TEXT NOT NULL,
+    player_b TEXT NOT NULL,
+    winner INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    seed INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_player_a ON games (player_a);
+CREATE INDEX IF NOT EXISTS games_player_b ON games (player_b);
+CREATE INDEX IF NOT EXISTS games_winner ON games (winner);
+CREATE INDEX IF NOT EXISTS games_turns ON games (turns);
+CREATE TABLE IF NOT EXISTS claims (
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    flag INTEGER NOT NULL,
+    player INTEGER NOT NULL,
+    turn INTEGER,
+    formation TEXT
+);
+CREATE INDEX IF NOT EXISTS claims_game_id ON claims (game_id);
+CREATE INDEX IF NOT EXISTS claims_flag ON claims (flag);
+"""
+
+
+class FlagClaim(NamedTuple):
+    """A flag claimed by the player.
+
+    turn: turn of the claim, None if not observed.
+    formation: formation completed by the player, stored by the name.
+    """
+
+    flag: int
+    player: int
+    turn: Optional[int]
+    formation: Optional[Formations]
+
+
+class ClaimTurnObserver:
+    """Record the turns of the claims from the events of `Game`."""
+
+    def __init__(self) -> None:
+        self._turns: List[Optional[int]] = [None] * NUM_FLAGS
+
+    def __call__(self, event: GameEvent) -> None:
+        if isinstance(event, FlagClaimed):
+            self._turns[event.flag] = event.turn
+
+    def get_turns(self) -> List[Optional[int]]:
+        """Turn of the claim of each flag, None if not claimed."""
+        return self._turns
+
+
+def get_flag_claims(
+    state: GameState, turns: Optional[Sequence[Optional[int]]] = None
+) -> Tuple[FlagClaim, ...]:
+    """Claims of the flags resolved on the state (see `Flag.get_resolved`).
+
+    Args:
+        turns - turns of the claims of the flags (see `ClaimTurnObserver`)
+    """
+    claims = []
+    for n, flag in enumerate(state.get_flags()):
+        player = flag.get_resolved()
+        if player == PLAYER_UNRESOLVED:
+            continue
+        turn = None if turns is None else turns[n]
+        claims.append(FlagClaim(n, player, turn, get_formation(flag, player)))
+    return tuple(claims)
+
+
+class GameDatabase:
+    """Store the finished games into the SQLite database at the path.
+
+    The buffered games are inserted when `batch_size` games are added, by
+    `flush` and by `close`.
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        if batch_size <= 0:
+            raise ValueError(f"invalid batch size: {batch_size}")
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._batch_size = batch_size
+        self._games: List[Tuple[str, str, int, int, Optional[int]]] = []
+        self._claims: List[Tuple[FlagClaim, ...]] = []
+
+    def add_game(
+        self,
+        player_types: Tuple[str, str],
+        winner: int,
+        turns: int,
+        claims: Iterable[FlagClaim] = (),
+        seed: Optional[int] = None,
+    ) -> None:
+        self._games.append(
+            (player_types[PLAYER_A], player_types[PLAYER_B], winner, turns, seed)
+        )
+        self._claims.append(tuple(claims))
+        if len(self._games) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Insert the buffered games in a transaction."""
+        if not self._games:
+            return
+        with self._conn:
+            cursor = self._conn.cursor()
+            (next_id,) = cursor.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM games"
+            ).fetchone()
+            cursor.executemany(
+                "INSERT INTO games (id, player_a, player_b, winner, turns, seed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                ((next_id + i,) + g for i, g in enumerate(self._games)),
+            )
+            cursor.executemany(
+                "INSERT INTO claims (game_id, flag, player, turn, formation)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        next_id + i,
+                        c.flag,
+                        c.player,
+                        c.turn,
+                        None if c.formation is None else c.formation.name,
+                    )
+                    for i, claims in enumerate(self._claims)
+                    for c in claims
+                ),
+            )
+        self._games = []
+        self._claims = []
+
+    def get_num_games(self) -> int:
+        self.flush()
+        return self._conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def get_win_rates(self) -> Dict[str, float]:
+        """Rate of the wins of each player type over the games it played."""
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT player, AVG(won) FROM ("
+            " SELECT player_a AS player, winner = ? AS won FROM games"
+            " UNION ALL"
+            " SELECT player_b AS player, winner = ? AS won FROM games"
+            ") GROUP BY player",
+            (PLAYER_A, PLAYER_B),
+        )
+        return dict(rows)
+
+    def get_average_claim_turns(self) -> Dict[int, float]:
+        """Average turn of the claims of each flag."""
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT flag, AVG(turn) FROM claims WHERE turn IS NOT NULL GROUP BY flag"
+        )
+        return dict(rows)
+
+    def get_formation_wins(self) -> Dict[Formations, int]:
+        """Number of the flags claimed by each formation."""
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT formation, COUNT(*) FROM claims"
+            " WHERE formation IS NOT NULL GROUP BY formation"
+        )
+        return {Formations[name]: count for name, count in rows}
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self) -> "GameDatabase":
+        return self
+
+    def __exit__(self, *_args) -> None:
+        self.close()
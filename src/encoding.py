@@ -0,0 +1,294 @@
+"""Encode the game state into flat integer arrays."""
+
+import random
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.cards.cards import CardGenerator, TroopCard
+from src.cards.cardtypes import TacticEnvironments
+from src.cards.decks import TacticsDeck, TroopsDeck
+from src.consts import (
+    NUM_CARD_IDS,
+    NUM_CARDS,
+    NUM_FLAGS,
+    NUM_TACTICS,
+    PLAYER_A,
+    PLAYER_B,
+    PLAYER_IDS,
+    PLAYER_UNRESOLVED,
+)
+from src.flag import Flag
+from src.gamestate import GameState, GuileOperation
+
+# per flag: own cards, opposite cards, fog, mud, owner
+_STACK_SLOTS = 4
+_FLAG_FEATURES = _STACK_SLOTS * 2 + 3
+_HANDS_OFFSET = 0
+_FLAGS_OFFSET = _HANDS_OFFSET + NUM_CARD_IDS
+_COUNTS_OFFSET = _FLAGS_OFFSET + NUM_FLAGS * _FLAG_FEATURES
+
+OWNER_NONE = 0
+OWNER_SELF = 1
+OWNER_OPPOSITE = 2
+
+OBSERVATION_SIZE = _COUNTS_OFFSET + 3
+OBSERVATION_TYPECODE = "b"
+
+
+def new_observation_buffer(num: int = 1) -> array:
+    return array(OBSERVATION_TYPECODE, bytes(OBSERVATION_SIZE * num))
+
+
+def encode_observation(
+    state: GameState, player: int, out: Optional[array] = None, offset: int = 0
+) -> array:
+    """Encode the state as seen by the player.
+
+    Layout (OBSERVATION_SIZE values):
+        [0, NUM_CARD_IDS) - 1 if the card is in the hands of the player
+        then, for each flag:
+            own stacked cards as (card id + 1), 0 for empty slots (4 values)
+            opposite stacked cards as well (4 values)
+            1 if fog is deployed, 1 if mud is deployed
+            owner of the flag (OWNER_NONE, OWNER_SELF or OWNER_OPPOSITE)
+        then the size of the troops deck, of the tactics deck and of the
+        opposite hands.
+
+    Args:
+        out - array to write the observation in, a new one is allocated if None
+        offset - index to start writing the observation from in `out`
+    """
+    if out is None:
+        out = new_observation_buffer()
+    opponent = PLAYER_B if player == PLAYER_A else PLAYER_A
+    out[offset : offset + OBSERVATION_SIZE] = _EMPTY_OBSERVATION
+    for c in state.get_hands(player):
+        out[offset + _HANDS_OFFSET + c.get_card_id()] = 1
+    pos = offset + _FLAGS_OFFSET
+    for flag in state.get_flags():
+        for i, c in enumerate(flag.get_stacked_cards(player)):
+            out[pos + i] = c.get_card_id() + 1
+        for i, c in enumerate(flag.get_stacked_cards(opponent)):
+            out[pos + _STACK_SLOTS + i] = c.get_card_id() + 1
+        for p in (player, opponent):
+            for e in flag.get_stacked_envs(p):
+                if e.get_tactic_envs() == TacticEnvironments.FOG:
+                    out[pos + _STACK_SLOTS * 2] = 1
+                else:
+                    out[pos + _STACK_SLOTS * 2 + 1] = 1
+        resolved = flag.get_resolved()
+        if resolved != PLAYER_UNRESOLVED:
+            out[pos + _STACK_SLOTS * 2 + 2] = (
+                OWNER_SELF if resolved == player else OWNER_OPPOSITE
+            )
+        pos += _FLAG_FEATURES
+    pos = offset + _COUNTS_OFFSET
+    out[pos] = len(state.get_troops_deck())
+    out[pos + 1] = len(state.get_tactics_deck())
+    out[pos + 2] = len(state.get_hands(opponent))
+    return out
+
+
+_EMPTY_OBSERVATION = new_observation_buffer()
+
+
+_NO_CARD = 0xFF
+_CARDS = [CardGenerator.from_id(i) for i in range(NUM_CARD_IDS)]
+
+
+def _put_cards(out: bytearray, cards: Iterable) -> None:
+    ids = [c.get_card_id() for c in cards]
+    out.append(len(ids))
+    out.extend(ids)
+
+
+def _get_cards(data: bytes, pos: int) -> Tuple[List, int]:
+    n = data[pos]
+    pos += 1
+    return [_CARDS[i] for i in data[pos : pos + n]], pos + n
+
+
+def _get_known(data: bytes, pos: int) -> Tuple[Dict[int, int], int]:
+    n = data[pos]
+    pos += 1
+    known = {data[pos + i * 2]: data[pos + i * 2 + 1] for i in range(n)}
+    return known, pos + n * 2
+
+
+def encode_state(state: GameState) -> bytes:
+    """Encode the whole state, including the hidden cards, into compact bytes.
+
+    Every card is a single byte of its id, each list of cards is prefixed by its
+    length. The result is far smaller and faster to pass between processes than
+    the pickled GameState, and `decode_state` restores it.
+
+    Layout:
+        hands of A and B, troops deck and tactics deck (from the bottom), each
+        deck followed by the count and the pairs of the positions and the
+        players of the known cards (see `Deck.back`)
+        then, for each flag:
+            owner + 1, last stacked player + 1
+            stacked cards of A and B, stacked environments of A and B
+        then the guile operations of A and B, as the count followed by pairs of
+        the guile card and the discarded card (0xFF for none)
+        then the numbers of the tactics and the leaders played by A and B,
+        since the cards moved by the traitor do not tell who played them.
+    """
+    out = bytearray()
+    for p in PLAYER_IDS:
+        _put_cards(out, state.get_hands(p))
+    for deck in (state.get_troops_deck(), state.get_tactics_deck()):
+        _put_cards(out, reversed(list(deck.peek(len(deck)))))
+        known = deck.get_known()
+        out.append(len(known))
+        for i, p in known.items():
+            out.append(i)
+            out.append(p)
+    for flag in state.get_flags():
+        out.append(flag.get_resolved() + 1)
+        out.append(flag.get_last_stacked_player() + 1)
+        for p in PLAYER_IDS:
+            _put_cards(out, flag.get_stacked_cards(p))
+        for p in PLAYER_IDS:
+            _put_cards(out, flag.get_stacked_envs(p))
+    for p in PLAYER_IDS:
+        ops = state.get_operations(p)
+        out.append(len(ops))
+        for op in ops:
+            discarded = op.get_discarded_troop_card()
+            out.append(op.get_tactic_guile_card().get_card_id())
+            out.append(_NO_CARD if discarded is None else discarded.get_card_id())
+    out.extend(state.get_played_tactics())
+    out.extend(state.get_played_leaders())
+    return bytes(out)
+
+
+def decode_state(data: bytes) -> GameState:
+    """Restore the state encoded by `encode_state`."""
+    pos = 0
+    hands = []
+    for _ in PLAYER_IDS:
+        cards, pos = _get_cards(data, pos)
+        hands.append(cards)
+    troops, pos = _get_cards(data, pos)
+    known_troops, pos = _get_known(data, pos)
+    tactics, pos = _get_cards(data, pos)
+    known_tactics, pos = _get_known(data, pos)
+    flags = []
+    for _ in range(NUM_FLAGS):
+        flag = Flag()
+        resolved = data[pos] - 1
+        flag.set_last_stacked_player(data[pos + 1] - 1)
+        pos += 2
+        for p in PLAYER_IDS:
+            flag.stacks[p], pos = _get_cards(data, pos)
+        for p in PLAYER_IDS:
+            flag.envs[p], pos = _get_cards(data, pos)
+        if resolved != PLAYER_UNRESOLVED:
+            flag.resolve(resolved)
+        flags.append(flag)
+    operations: List[List[GuileOperation]] = []
+    for _ in PLAYER_IDS:
+        n = data[pos]
+        pos += 1
+        ops = []
+        for _ in range(n):
+            guile, discarded = data[pos], data[pos + 1]
+            pos += 2
+            ops.append(
+                GuileOperation(
+                    _CARDS[guile],  # type: ignore
+                    None if discarded == _NO_CARD else _CARDS[discarded],  # type: ignore
+                )
+            )
+        operations.append(ops)
+    played_tactics = list(data[pos : pos + 2])
+    played_leaders = list(data[pos + 2 : pos + 4])
+    pos += 4
+    if pos != len(data):
+        raise ValueError(f"malformed state: {len(data) - pos} bytes left")
+    return GameState(
+        TroopsDeck(troops, known_troops),
+        TacticsDeck(tactics, known_tactics),
+        flags,
+        operations,
+        hands,
+        played_tactics,
+        played_leaders,
+    )
+
+
+def _new_zobrist_keys(rng: random.Random, *shape: int) -> List:
+    if len(shape) == 1:
+        return [rng.getrandbits(64) for _ in range(shape[0])]
+    return [_new_zobrist_keys(rng, *shape[1:]) for _ in range(shape[0])]
+
+
+_zobrist_rng = random.Random(0x5EED)
+_NUM_PLAYERS = len(PLAYER_IDS)
+_ZOBRIST_STACK = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_FLAGS, NUM_CARD_IDS)
+_ZOBRIST_ENV = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_FLAGS, NUM_CARD_IDS)
+_ZOBRIST_RESOLVED = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_FLAGS)
+_ZOBRIST_LAST_STACKED = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_FLAGS)
+_ZOBRIST_GUILE = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_CARD_IDS)
+_ZOBRIST_DISCARDED = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_CARD_IDS)
+_ZOBRIST_HAND = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_CARD_IDS)
+# number of the troops and tactics cards in the hands
+_ZOBRIST_HAND_TROOPS = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_CARD_IDS)
+_ZOBRIST_HAND_TACTICS = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS, NUM_CARD_IDS)
+_ZOBRIST_TROOPS_DECK = _new_zobrist_keys(_zobrist_rng, NUM_CARDS + 1)
+# card ids by the position from the bottom of the deck
+_ZOBRIST_DECK_ORDER = _new_zobrist_keys(_zobrist_rng, NUM_CARDS, NUM_CARD_IDS)
+_ZOBRIST_TACTICS_DECK = _new_zobrist_keys(_zobrist_rng, NUM_TACTICS + 1)
+_ZOBRIST_TO_MOVE = _new_zobrist_keys(_zobrist_rng, _NUM_PLAYERS)
+del _zobrist_rng
+
+
+def get_state_hash(state: GameState, to_move: int, hidden: bool = False) -> int:
+    """Compute the 64-bit Zobrist hash of the state.
+
+    By default only the public part of the state is hashed: the flags, the guile
+    operations, the sizes of the decks and the number of the troops and tactics
+    cards in the hands, so the states reached by different orders of the same
+    moves share the hash.
+    With `hidden`, the cards in the hands and the order of the decks are hashed
+    as well.
+    """
+    h = _ZOBRIST_TO_MOVE[to_move]
+    for i, flag in enumerate(state.get_flags()):
+        resolved = flag.get_resolved()
+        if resolved != PLAYER_UNRESOLVED:
+            h ^= _ZOBRIST_RESOLVED[resolved][i]
+        last = flag.get_last_stacked_player()
+        if last != PLAYER_UNRESOLVED:
+            h ^= _ZOBRIST_LAST_STACKED[last][i]
+        for p in PLAYER_IDS:
+            keys = _ZOBRIST_STACK[p][i]
+            for c in flag.stacks[p]:
+                h ^= keys[c.get_card_id()]
+            keys = _ZOBRIST_ENV[p][i]
+            for c in flag.envs[p]:
+                h ^= keys[c.get_card_id()]
+    for p in PLAYER_IDS:
+        for op in state.get_operations(p):
+            h ^= _ZOBRIST_GUILE[p][op.get_tactic_guile_card().get_card_id()]
+            discarded = op.get_discarded_troop_card()
+            if discarded is not None:
+                h ^= _ZOBRIST_DISCARDED[p][discarded.get_card_id()]
+        hands = state.get_hands(p)
+        if hidden:
+            keys = _ZOBRIST_HAND[p]
+            for c in hands:
+                h ^= keys[c.get_card_id()]
+        else:
+            troops = sum(1 for c in hands if isinstance(c, TroopCard))
+            h ^= _ZOBRIST_HAND_TROOPS[p][troops]
+            h ^= _ZOBRIST_HAND_TACTICS[p][len(hands) - troops]
+    h ^= _ZOBRIST_TROOPS_DECK[len(state.get_troops_deck())]
+    h ^= _ZOBRIST_TACTICS_DECK[len(state.get_tactics_deck())]
+    if hidden:
+        for deck in (state.get_troops_deck(), state.get_tactics_deck()):
+            n = len(deck)
+            for i, c in enumerate(deck.peek(n)):
+                h ^= _ZOBRIST_DECK_ORDER[n - 1 - i][c.get_card_id()]
+    return h
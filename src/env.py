@@ -0,0 +1,404 @@
+"""Vectorized environments to run many games in lockstep."""
+
+import multiprocessing
+import os
+import random
+from array import array
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+from typing import Any, List, MutableSequence, NamedTuple, Optional, Sequence, Tuple
+
+from src.actions import NUM_ACTIONS, apply_action, get_opponent, legal_actions
+from src.consts import PLAYER_A, PLAYER_UNRESOLVED
+from src.encoding import (
+    OBSERVATION_SIZE,
+    OBSERVATION_TYPECODE,
+    encode_observation,
+    new_observation_buffer,
+)
+from src.gamestate import GameState
+from src.resolver import resolve
+
+DEFAULT_MAX_MOVES = 200
+# seconds to wait for the workers at each step before giving them up
+DEFAULT_TIMEOUT = 60.0
+
+REWARD_WIN = 1.0
+REWARD_LOSE = -1.0
+REWARD_DRAW = 0.0
+
+
+class StepResult(NamedTuple):
+    """Stacked results of the games.
+
+    observations: N * OBSERVATION_SIZE values, seen by the player to move next.
+    rewards: N rewards for the player who took the action.
+    dones: N flags whether the game is finished (and reset) by the action.
+    masks: N * NUM_ACTIONS flags whether the action is legal for the next move.
+    players: N players to move next.
+    """
+
+    observations: MutableSequence[int]
+    rewards: MutableSequence[float]
+    dones: MutableSequence[int]
+    masks: MutableSequence[int]
+    players: MutableSequence[int]
+
+
+class VectorEnv:
+    """Run N independent games in lockstep.
+
+    Finished games are reset automatically, then the observation and the mask
+    of the new game are returned in place of the terminal ones.
+    Games exceeding `max_moves` moves are finished as a draw.
+    """
+
+    def __init__(
+        self,
+        num_games: int,
+        seed: Optional[int] = None,
+        max_moves: int = DEFAULT_MAX_MOVES,
+        buffers: Optional[StepResult] = None,
+    ) -> None:
+        """Initialize the environment.
+
+        Args:
+            buffers - buffers to write the results in, allocated if None.
+                They must be sized and typed as the fields of StepResult.
+        """
+        assert num_games > 0
+        self._num_games = num_games
+        self._rng = random.Random(seed)
+        self._max_moves = max_moves
+        self._states: List[GameState] = []
+        self._moves = [0] * num_games
+        if buffers is None:
+            buffers = StepResult(
+                new_observation_buffer(num_games),
+                array("f", [0.0] * num_games),
+                bytearray(num_games),
+                bytearray(NUM_ACTIONS * num_games),
+                array("b", [PLAYER_A] * num_games),
+            )
+        self._observations = buffers.observations
+        self._rewards = buffers.rewards
+        self._dones = buffers.dones
+        self._masks = buffers.masks
+        self._players = buffers.players
+
+    def get_num_games(self) -> int:
+        return self._num_games
+
+    def get_states(self) -> Sequence[GameState]:
+        return self._states
+
+    def reset(self) -> StepResult:
+        self._states = [GameState.new(self._rng) for _ in range(self._num_games)]
+        for i in range(self._num_games):
+            self._moves[i] = 0
+            self._rewards[i] = REWARD_DRAW
+            self._dones[i] = 0
+            self._players[i] = PLAYER_A
+            self._observe(i)
+        return self._result()
+
+    def step(self, actions: Sequence[int]) -> StepResult:
+        if not self._states:
+            raise ValueError("the environment must be reset before stepping")
+        if len(actions) != self._num_games:
+            raise ValueError(f"{self._num_games} actions required: {len(actions)}")
+        for i, action in enumerate(actions):
+            self._step_single(i, action)
+        return self._result()
+
+    def _step_single(self, index: int, action: int) -> None:
+        if (
+            not 0 <= action < NUM_ACTIONS
+            or not self._masks[index * NUM_ACTIONS + action]
+        ):
+            raise ValueError(f"illegal action {action} for the game {index}")
+        state = self._states[index]
+        player = self._players[index]
+        apply_action(state, player, action)
+        resolve(state)
+        self._moves[index] += 1
+        winner = state.get_winner()
+        if winner != PLAYER_UNRESOLVED:
+            self._rewards[index] = REWARD_WIN if winner == player else REWARD_LOSE
+            self._dones[index] = 1
+        elif self._moves[index] >= self._max_moves:
+            self._rewards[index] = REWARD_DRAW
+            self._dones[index] = 1
+        else:
+            self._rewards[index] = REWARD_DRAW
+            self._dones[index] = 0
+        if self._dones[index]:
+            self._states[index] = GameState.new(self._rng)
+            self._moves[index] = 0
+            self._players[index] = PLAYER_A
+        else:
+            self._players[index] = get_opponent(player)
+        self._observe(index)
+
+    def _observe(self, index: int) -> None:
+        state = self._states[index]
+        player = self._players[index]
+        encode_observation(state, player, self._observations, index * OBSERVATION_SIZE)
+        offset = index * NUM_ACTIONS
+        masks = self._masks
+        masks[offset : offset + NUM_ACTIONS] = _EMPTY_MASK
+        for a in legal_actions(state, player):
+            masks[offset + a] = 1
+
+    def _result(self) -> StepResult:
+        return StepResult(
+            self._observations, self._rewards, self._dones, self._masks, self._players
+        )
+
+
+_EMPTY_MASK = bytes(NUM_ACTIONS)
+
+_COMMAND_RESET = 1
+_COMMAND_STEP = 2
+_COMMAND_CLOSE = 3
+
+
+def _align(size: int) -> int:
+    # keep every section aligned for the typed views
+    return -(-size // 8) * 8
+
+
+class _SharedViews:
+    """Typed views over the shared memory block of SubprocVectorEnv.
+
+    Layout: command (int32), status of each worker (uint8), then actions (int32),
+    rewards (float32), observations, dones, masks and players.
+    """
+
+    def __init__(self, buf: Any, num_games: int, num_workers: int) -> None:
+        view = memoryview(buf)
+        views: List[memoryview] = []
+        offset = 0
+        for fmt, size in self._get_sections(num_games, num_workers):
+            views.append(view[offset : offset + size].cast(fmt))
+            offset += _align(size)
+        c, s, a, r, o, d, m, p = views
+        self.command = c
+        self.status = s
+        self.actions = a
+        self.result = StepResult(o, r, d, m, p)
+
+    @staticmethod
+    def _get_sections(num_games: int, num_workers: int) -> List[Tuple[str, int]]:
+        return [
+            ("i", 4),
+            ("B", num_workers),
+            ("i", num_games * 4),
+            ("f", num_games * 4),
+            (OBSERVATION_TYPECODE, num_games * OBSERVATION_SIZE),
+            ("B", num_games),
+            ("B", num_games * NUM_ACTIONS),
+            ("b", num_games),
+        ]
+
+    @staticmethod
+    def get_size(num_games: int, num_workers: int) -> int:
+        sections = _SharedViews._get_sections(num_games, num_workers)
+        return sum(_align(size) for _, size in sections)
+
+    def get_slice(self, start: int, end: int) -> StepResult:
+        o, r, d, m, p = self.result
+        return StepResult(
+            o[start * OBSERVATION_SIZE : end * OBSERVATION_SIZE],
+            r[start:end],
+            d[start:end],
+            m[start * NUM_ACTIONS : end * NUM_ACTIONS],
+            p[start:end],
+        )
+
+    def release(self) -> None:
+        for v in (self.command, self.status, self.actions, *self.result):
+            v.release()
+
+
+def _run_worker(
+    shm_name: str,
+    num_games: int,
+    num_workers: int,
+    index: int,
+    bounds: Tuple[int, int],
+    seed: Optional[int],
+    max_moves: int,
+    barrier: Any,
+    core: Optional[int],
+) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    views = _SharedViews(shm.buf, num_games, num_workers)
+    if core is not None:
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError:
+            # reported as a failure of the worker at the first step
+            views.status[index] = 1
+    start, end = bounds
+    env = VectorEnv(end - start, seed, max_moves, views.get_slice(start, end))
+    try:
+        while True:
+            barrier.wait()
+            command = views.command[0]
+            if command == _COMMAND_CLOSE:
+                break
+            try:
+                if command == _COMMAND_RESET:
+                    env.reset()
+                else:
+                    env.step(views.actions[start:end])
+            except Exception:  # pylint: disable=broad-except
+                views.status[index] = 1
+            barrier.wait()
+    except BrokenBarrierError:
+        pass
+    finally:
+        del env
+        views.release()
+        shm.close()
+
+
+def _get_allowed_cores() -> Optional[List[int]]:
+    """Cores the process may run on, None if the affinity is not supported."""
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    return sorted(os.sched_getaffinity(0))
+
+
+class SubprocVectorEnv:
+    """Run N games in lockstep across worker processes.
+
+    Each worker owns a contiguous slice of the games and writes its results into
+    a shared memory block, so no data is pickled for a step.
+    The workers and the main process synchronize through a barrier at the start
+    and the end of each step.
+    The returned StepResult views the shared memory, which is overwritten by the
+    next step and released by `close`.
+    """
+
+    def __init__(
+        self,
+        num_games: int,
+        num_workers: Optional[int] = None,
+        seed: Optional[int] = None,
+        max_moves: int = DEFAULT_MAX_MOVES,
+        pin_cores: bool = True,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> None:
+        """Start the workers.
+
+        Args:
+            pin_cores - pin each worker to one of the cores the process may run on
+            timeout - seconds to wait for the workers at each step, the workers
+                are given up as not responding after that (no limit if None)
+        """
+        assert num_games > 0
+        cores = _get_allowed_cores() if pin_cores else None
+        num_workers = min(num_games, num_workers or os.cpu_count() or 1)
+        self._num_games = num_games
+        self._num_workers = num_workers
+        self._timeout = timeout
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=_SharedViews.get_size(num_games, num_workers)
+        )
+        self._views = _SharedViews(self._shm.buf, num_games, num_workers)
+        self._barrier = multiprocessing.Barrier(num_workers + 1)
+        self._closed = False
+        self._workers: List[multiprocessing.Process] = []
+        try:
+            for i in range(num_workers):
+                bounds = (
+                    num_games * i // num_workers,
+                    num_games * (i + 1) // num_workers,
+                )
+                worker = multiprocessing.Process(
+                    target=_run_worker,
+                    args=(
+                        self._shm.name,
+                        num_games,
+                        num_workers,
+                        i,
+                        bounds,
+                        None if seed is None else seed + i,
+                        max_moves,
+                        self._barrier,
+                        cores[i % len(cores)] if cores else None,
+                    ),
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+        except BaseException:
+            self._barrier.abort()
+            for worker in self._workers:
+                worker.terminate()
+            self._closed = True
+            self._views.release()
+            self._shm.close()
+            self._shm.unlink()
+            raise
+
+    def get_num_games(self) -> int:
+        return self._num_games
+
+    def get_num_workers(self) -> int:
+        return self._num_workers
+
+    def reset(self) -> StepResult:
+        return self._dispatch(_COMMAND_RESET)
+
+    def step(self, actions: Sequence[int]) -> StepResult:
+        if len(actions) != self._num_games:
+            raise ValueError(f"{self._num_games} actions required: {len(actions)}")
+        masks = self._views.result.masks
+        shared_actions = self._views.actions
+        for i, action in enumerate(actions):
+            if not 0 <= action < NUM_ACTIONS or not masks[i * NUM_ACTIONS + action]:
+                raise ValueError(f"illegal action {action} for the game {i}")
+            shared_actions[i] = action
+        return self._dispatch(_COMMAND_STEP)
+
+    def _dispatch(self, command: int) -> StepResult:
+        if self._closed:
+            raise ValueError("the environment is already closed")
+        self._views.command[0] = command
+        try:
+            self._barrier.wait(self._timeout)
+            self._barrier.wait(self._timeout)
+        except BrokenBarrierError:
+            self.close()
+            raise RuntimeError("worker processes stopped responding")
+        failed = [i for i, s in enumerate(self._views.status) if s]
+        if failed:
+            self.close()
+            raise RuntimeError(f"worker processes failed: {failed}")
+        return self._views.result
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._views.command[0] = _COMMAND_CLOSE
+        try:
+            self._barrier.wait(self._timeout)
+        except BrokenBarrierError:
+            pass
+        for worker in self._workers:
+            worker.join(self._timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._views.release()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SubprocVectorEnv":
+        return self
+
+    def __exit__(self, *_args: Any) -> None:
+        self.close()
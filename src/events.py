@@ -0,0 +1,126 @@
+"""Typed events of the game loop and the observers of them."""
+
+import sys
+from typing import Callable, List, NamedTuple, Optional, TextIO, Union
+
+from src.actions import Move, MoveKinds, infer_move
+from src.cards.cards import Card
+from src.consts import PLAYER_A
+from src.gamestate import GameState
+
+
+class TurnStarted(NamedTuple):
+    """The player is about to move on the state."""
+
+    turn: int
+    player: int
+    state: GameState
+
+
+class CardPlayed(NamedTuple):
+    """A troop, morale or environment card is played on the flag of the move."""
+
+    turn: int
+    player: int
+    move: Move
+    card: Card
+
+
+class GuileUsed(NamedTuple):
+    """A guile tactic is used, see the move for the reclaimed card."""
+
+    turn: int
+    player: int
+    move: Move
+    card: Card
+
+
+class Passed(NamedTuple):
+    """The player passes the turn without playing any card."""
+
+    turn: int
+    player: int
+
+
+class CardDrawn(NamedTuple):
+    """A card is drawn into the hand, including the ones kept by the scout."""
+
+    turn: int
+    player: int
+    card: Card
+
+
+class FlagClaimed(NamedTuple):
+    """The flag is claimed by the player at the resolution after the move."""
+
+    turn: int
+    player: int
+    flag: int
+
+
+class GameOver(NamedTuple):
+    """The game is over, by the flags or by the time of the loser (`timeout`).
+
+    The winner is PLAYER_UNRESOLVED for a draw, when both players passed in a row.
+    """
+
+    turn: int
+    winner: int
+    timeout: bool = False
+
+
+GameEvent = Union[
+    TurnStarted, CardPlayed, GuileUsed, Passed, CardDrawn, FlagClaimed, GameOver
+]
+Observer = Callable[[GameEvent], None]
+
+
+def get_move_events(
+    turn: int, player: int, before: GameState, after: GameState
+) -> List[GameEvent]:
+    """Describe the move of the player from the states (before the resolution).
+
+    No event is made if the move is not inferable.
+    """
+    move = infer_move(before, after, player)
+    if move is None:
+        return []
+    if move.kind == MoveKinds.PASS:
+        return [Passed(turn, player)]
+    hands = before.get_hands(player)
+    card = next(c for c in hands if c.get_card_id() == move.card)
+    events: List[GameEvent] = []
+    if move.kind in (MoveKinds.DEPLOY, MoveKinds.ENVIRONMENT):
+        events.append(CardPlayed(turn, player, move, card))
+    else:
+        events.append(GuileUsed(turn, player, move, card))
+    held = set(c.get_card_id() for c in hands)
+    for c in after.get_hands(player):
+        if c.get_card_id() not in held:
+            events.append(CardDrawn(turn, player, c))
+    return events
+
+
+class TerminalObserver:
+    """Render the state before each move and report the claimed flags."""
+
+    def __init__(self, out: Optional[TextIO] = None) -> None:
+        self._out = out or sys.stdout
+
+    def __call__(self, event: GameEvent) -> None:
+        if isinstance(event, TurnStarted):
+            print(repr(event.state), file=self._out)
+        elif isinstance(event, FlagClaimed):
+            print(
+                f"{_get_player_repr(event.player)} claims the flag {event.flag + 1}",
+                file=self._out,
+            )
+        elif isinstance(event, GameOver) and event.timeout:
+            print(
+                f"{_get_player_repr(1 - event.winner)} ran out of time",
+                file=self._out,
+            )
+
+
+def _get_player_repr(player: int) -> str:
+    return "Player A" if player == PLAYER_A else "Player B"
@@ -65,10 +65,11 @@ class Flag:
         self._flag_position = player
 
     def get_required_card_num(self) -> int:
-        stacked_envs = [
-            e.get_tactic_envs() for e in itertools.chain.from_iterable(self.envs)
-        ]
-        return 4 if TacticEnvironments.MUD in stacked_envs else 3
+        for envs in self.envs:
+            for e in envs:
+                if e.get_tactics() == TacticEnvironments.MUD:
+                    return 4
+        return 3
 
     def is_formation_disabled(self) -> bool:
         stacked_envs = [
@@ -87,6 +88,9 @@ class Flag:
     def get_last_stacked_player(self) -> int:
         return self._last_stacked_player
 
+    def set_last_stacked_player(self, player: int) -> None:
+        self._last_stacked_player = player
+
     def add_stack(self, player: int, card: TroopAndTacticMoraleCard) -> None:
         self.stacks[player].append(card)
         self.stacks[player].sort()
@@ -98,7 +102,7 @@ class Flag:
         if isinstance(card, TroopCard):
             return self.remove_stack_troops(player, card.get_color(), card.get_troop())
         if isinstance(card, TacticMoraleCard):
-            self.remove_stack_tacticmorales(player, card.get_tactics())
+            return self.remove_stack_tacticmorales(player, card.get_tactics())
         raise ValueError(f"unknown card: {repr(card)}")
 
     def remove_stack_troops(
@@ -174,5 +178,13 @@ class Flag:
             *side_a_cards, *side_a_envs, *side_b_cards, *side_b_envs, *flags
         )
 
+    def __deepcopy__(self, _memo) -> "Flag":
+        flag = Flag()
+        flag.stacks = [s[:] for s in self.stacks]
+        flag.envs = [e[:] for e in self.envs]
+        flag._last_stacked_player = self._last_stacked_player
+        flag._flag_position = self._flag_position
+        return flag
+
     def __eq__(self, o: object) -> bool:
         return isinstance(o, Flag) and self.stacks == o.stacks
@@ -0,0 +1,194 @@
+"""Battle Line Game Loop."""
+
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from src.actions import Move, MoveKinds, infer_move
+from src.consts import PLAYER_IDS, PLAYER_UNRESOLVED
+from src.events import (
+    FlagClaimed,
+    GameEvent,
+    GameOver,
+    Observer,
+    TerminalObserver,
+    TurnStarted,
+    get_move_events,
+)
+from src import metrics, profiling
+from src.gamestate import GameState
+from src.players.player import Player
+from src.resolver import resolve
+
+
+class TimeControl(NamedTuple):
+    """Time allowed to a player.
+
+    move_time: seconds for each move.
+    total_time: seconds for the whole game, the player loses the game when it is
+        used up (no limit if None).
+    """
+
+    move_time: float
+    total_time: Optional[float] = None
+
+
+_PASS_MOVE = Move(MoveKinds.PASS)
+
+
+class Game:
+    def __init__(
+        self,
+        state: GameState,
+        players: Tuple[Player, Player],
+        verbose: bool = True,
+        time_controls: Optional[Tuple[Optional[TimeControl], ...]] = None,
+        observers: Iterable[Observer] = (),
+    ) -> None:
+        """Initialize the game.
+
+        Args:
+            verbose - render the game on the terminal by a TerminalObserver
+            time_controls - time controls of the players, given the deadline of
+                each move by `Player.play_until`
+            observers - called with the events of the game (see `src.events`)
+        """
+        self._winner = PLAYER_UNRESOLVED
+        self._over = False
+        self._passes = 0
+        self._turn_length = 0
+        self._state = state
+        self._players = players
+        self._observers: List[Observer] = list(observers)
+        if verbose:
+            self._observers.append(TerminalObserver())
+        self._time_controls = time_controls or (None, None)
+        self._remaining = [
+            None if c is None else c.total_time for c in self._time_controls
+        ]
+        self._overruns: List[List[float]] = [[] for _ in PLAYER_IDS]
+
+    def get_state(self) -> GameState:
+        return self._state
+
+    def get_turn_length(self) -> int:
+        return self._turn_length
+
+    def get_winner(self) -> int:
+        return self._winner
+
+    def is_over(self) -> bool:
+        """Whether the game is over, by a winner or by a draw."""
+        return self._over
+
+    def get_remaining_time(self, player: int) -> Optional[float]:
+        return self._remaining[player]
+
+    def get_overruns(self, player: int) -> List[float]:
+        """Seconds the moves of the player took beyond their deadlines."""
+        return self._overruns[player]
+
+    def add_observer(self, observer: Observer) -> None:
+        self._observers.append(observer)
+
+    def remove_observer(self, observer: Observer) -> None:
+        self._observers.remove(observer)
+
+    def run(self) -> int:
+        """Play a turn of both players, returning the winner if any.
+
+        The game ends as a draw (without a winner) when both players pass in a
+        row, since neither could move anymore.
+        """
+        if self._over:
+            return self._winner
+        self._turn_length += 1
+        turn = self._turn_length
+        profile = profiling.is_enabled()
+        metered = metrics.is_enabled()
+        for i, p in enumerate(self._players):
+            # the events are made only when observed
+            observed = bool(self._observers)
+            before = self._state
+            if observed:
+                self._notify(TurnStarted(turn, i, before))
+            # player action
+            started = time.perf_counter()
+            deadline = self._get_deadline(i, started)
+            self._state = p.play_until(self._state, deadline)
+            if profile or metered:
+                elapsed = time.perf_counter() - started
+                if profile:
+                    profiling.add_phase_time(profiling.PHASE_DECISION, elapsed)
+                if metered:
+                    metrics.observe_move(type(p).__name__, elapsed)
+            if deadline is not None and self._check_time(i, started, deadline):
+                self._winner = PLAYER_IDS[1 - i]
+                self._over = True
+                if observed:
+                    self._notify(GameOver(turn, self._winner, timeout=True))
+                return self._winner
+            if infer_move(before, self._state, i) == _PASS_MOVE:
+                self._passes += 1
+            else:
+                self._passes = 0
+            if observed:
+                for event in get_move_events(turn, i, before, self._state):
+                    self._notify(event)
+                resolved = [f.get_resolved() for f in self._state.get_flags()]
+            # resolve flag state
+            if profile:
+                resolve_started = time.perf_counter()
+                resolve(self._state)
+                profiling.add_phase_time(
+                    profiling.PHASE_RESOLVE, time.perf_counter() - resolve_started
+                )
+            else:
+                resolve(self._state)
+            if observed:
+                for n, flag in enumerate(self._state.get_flags()):
+                    if flag.get_resolved() != resolved[n]:
+                        self._notify(FlagClaimed(turn, flag.get_resolved(), n))
+            # check winner
+            if profile:
+                winner_started = time.perf_counter()
+                self._winner = self._state.get_winner()
+                profiling.add_phase_time(
+                    profiling.PHASE_WINNER, time.perf_counter() - winner_started
+                )
+            else:
+                self._winner = self._state.get_winner()
+            if self._winner != PLAYER_UNRESOLVED or self._passes >= 2:
+                self._over = True
+                if observed:
+                    self._notify(GameOver(turn, self._winner))
+                break
+        if profile:
+            profiling.maybe_report()
+        if metered:
+            metrics.maybe_export()
+        return self._winner
+
+    def _notify(self, event: GameEvent) -> None:
+        for observer in self._observers:
+            observer(event)
+
+    def _get_deadline(self, player: int, started: float) -> Optional[float]:
+        control = self._time_controls[player]
+        if control is None:
+            return None
+        budget = control.move_time
+        remaining = self._remaining[player]
+        if remaining is not None:
+            budget = min(budget, remaining)
+        return started + budget
+
+    def _check_time(self, player: int, started: float, deadline: float) -> bool:
+        """Record the time of the move, returning whether the time is used up."""
+        finished = time.perf_counter()
+        if finished > deadline:
+            self._overruns[player].append(finished - deadline)
+        remaining = self._remaining[player]
+        if remaining is None:
+            return False
+        self._remaining[player] = remaining - (finished - started)
+        return self._remaining[player] <= 0
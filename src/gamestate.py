@@ -1,10 +1,20 @@
 """Battle Line Game System."""
 
 import copy
+import random
+import time
 from copy import deepcopy
-from typing import Iterable, List, Optional, Sequence
-
-from src.cards.cards import Card, TacticGuileCard, TroopAndTacticMoraleCard
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from src import profiling
+from src.cards.cards import (
+    Card,
+    TacticCard,
+    TacticGuileCard,
+    TacticMoraleCard,
+    TroopAndTacticMoraleCard,
+)
+from src.cards.cardtypes import TacticGuiles, TacticMorales
 from src.cards.decks import TacticsDeck, TroopsDeck
 from src.consts import (
     NUM_INITIAL_HAND,
@@ -33,6 +43,10 @@ class GuileOperation:
     def get_discarded_troop_card(self) -> Optional[TroopAndTacticMoraleCard]:
         return self._discarded
 
+    def __deepcopy__(self, _memo) -> "GuileOperation":
+        # operations are immutable
+        return self
+
     def __repr__(self) -> str:
         text = repr(self._guile_card)
         if self._discarded:
@@ -40,10 +54,13 @@ class GuileOperation:
         return text
 
 
+_LEADERS = (TacticMorales.LEADER_ALEXANDER, TacticMorales.LEADER_DARIUS)
+
+
 class GameState:
     @staticmethod
-    def new() -> "GameState":
-        troops = TroopsDeck.shuffled()
+    def new(rng: Optional[random.Random] = None) -> "GameState":
+        troops = TroopsDeck.shuffled(rng)
         a_list: List[Card] = list(
             sorted([troops.draw() for _ in range(NUM_INITIAL_HAND)])
         )
@@ -52,7 +69,7 @@ class GameState:
         )
         return GameState(
             troops,
-            TacticsDeck.shuffled(),
+            TacticsDeck.shuffled(rng),
             [Flag() for _ in range(9)],
             [[], []],
             [a_list, b_list],
@@ -65,7 +82,15 @@ class GameState:
         flags: Iterable[Flag],
         operations: Iterable[List[GuileOperation]],
         hands: Iterable[List[Card]],
+        played_tactics: Optional[Sequence[int]] = None,
+        played_leaders: Optional[Sequence[int]] = None,
     ) -> None:
+        """Initialize the state.
+
+        The numbers of the tactics and the leaders played by each player are
+        counted from the flags and the operations unless given, crediting the
+        cards moved by the traitor to the side they are on.
+        """
         self._troops_deck = troops_deck
         self._tactics_deck = tactics_deck
         self._flags = list(flags)
@@ -74,9 +99,18 @@ class GameState:
         assert len(self._flags) == 9
         assert len(self._operations) == 2
         assert len(self._hands) == 2
+        if played_tactics is None or played_leaders is None:
+            played_tactics, played_leaders = self._count_played_tactics()
+        self._played_tactics = list(played_tactics)
+        self._played_leaders = list(played_leaders)
 
     def clone(self) -> "GameState":
-        return deepcopy(self)
+        if not profiling.is_enabled():
+            return deepcopy(self)
+        started = time.perf_counter()
+        state = deepcopy(self)
+        profiling.add_phase_time(profiling.PHASE_CLONE, time.perf_counter() - started)
+        return state
 
     def get_troops_deck(self) -> TroopsDeck:
         return self._troops_deck
@@ -124,6 +158,59 @@ class GameState:
                     return True
         return False
 
+    def get_played_tactics(self) -> Sequence[int]:
+        return self._played_tactics
+
+    def get_played_leaders(self) -> Sequence[int]:
+        return self._played_leaders
+
+    def get_num_played_tactics(self, player: int) -> int:
+        return self._played_tactics[player]
+
+    def has_played_leader(self, player: int) -> bool:
+        return self._played_leaders[player] > 0
+
+    def add_played_tactic(self, player: int, card: Card) -> None:
+        """Count the card played from the hand of the player if it is a tactic.
+
+        The tactics stay counted after they are discarded from the flags.
+        """
+        if not isinstance(card, TacticCard):
+            return
+        self._played_tactics[player] += 1
+        if isinstance(card, TacticMoraleCard) and card.get_tactic_morales() in _LEADERS:
+            self._played_leaders[player] += 1
+
+    def _count_played_tactics(self) -> Tuple[List[int], List[int]]:
+        tactics = [0 for _ in PLAYER_IDS]
+        leaders = [0 for _ in PLAYER_IDS]
+        played: List[Tuple[int, Card]] = []
+        for p in PLAYER_IDS:
+            for flag in self._flags:
+                played.extend((p, c) for c in flag.get_stacked_cards(p))  # type: ignore
+                played.extend((p, c) for c in flag.get_stacked_envs(p))
+            for op in self._operations[p]:
+                guile = op.get_tactic_guile_card()
+                played.append((p, guile))
+                discarded = op.get_discarded_troop_card()
+                if discarded is not None:
+                    # the deserter discards the card of the opponent
+                    owner = (
+                        1 - p
+                        if guile.get_tactic_guiles() == TacticGuiles.DESERTER
+                        else p
+                    )
+                    played.append((owner, discarded))  # type: ignore
+        for p, card in played:
+            if isinstance(card, TacticCard):
+                tactics[p] += 1
+                if (
+                    isinstance(card, TacticMoraleCard)
+                    and card.get_tactic_morales() in _LEADERS
+                ):
+                    leaders[p] += 1
+        return tactics, leaders
+
     def __deepcopy__(self, memo) -> "GameState":
         return GameState(
             copy.deepcopy(self._troops_deck, memo),
@@ -131,6 +218,8 @@ class GameState:
             copy.deepcopy(self._flags, memo),
             copy.deepcopy(self._operations, memo),
             copy.deepcopy(self._hands, memo),
+            self._played_tactics,
+            self._played_leaders,
         )
 
     def get_winner(self) -> int:
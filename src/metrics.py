@@ -0,0 +1,365 @@
+"""Metrics of the games for the dashboards, in the Prometheus text format.
+
+The metrics are off by default and cost a flag check when off. Once enabled
+(see `enable`), the game loop observes:
+    MOVE_LATENCY: seconds of each `Player.play` (through `play_until`), by the
+        type of the player
+    GAMES: games played, by the worker process
+    GAMES_PER_SECOND: games played per second since enabled, by the worker
+
+The histograms count the values into buckets growing geometrically, so their
+quantiles (see `Histogram.get_quantile`) have a bounded relative error.
+The metrics are written to a file every `interval` seconds (see `maybe_export`)
+or served over HTTP (see `serve`). They are kept per process, so the workers
+of a pool write the files of their own, named by `{worker}` in the path.
+"""
+
+import math
+import multiprocessing
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_MINIMUM = 1e-5
+DEFAULT_GROWTH = math.sqrt(2)
+DEFAULT_NUM_BUCKETS = 48
+DEFAULT_EXPORT_INTERVAL = 10.0
+QUANTILES = (0.5, 0.95, 0.99)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Labels = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+
+    def _check_labels(self, labels: Labels) -> None:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"labels of {self.name}: {labels}")
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._render_samples()
+
+    def _render_samples(self) -> Iterator[str]:
+        raise NotImplementedError()
+
+
+class Counter(_Metric):
+    """Value increasing by the labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Labels = ()) -> None:
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError(f"negative increment: {amount}")
+        with self._lock:
+            if labels not in self._values:
+                self._check_labels(labels)
+                self._values[labels] = 0.0
+            self._values[labels] += amount
+
+    def get(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _render_samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield (
+                f"{self.name}{_format_labels(self.label_names, labels)}"
+                f" {_format_value(value)}"
+            )
+
+
+class Gauge(Counter):
+    """Value set by the labels."""
+
+    kind = "gauge"
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            if labels not in self._values:
+                self._check_labels(labels)
+            self._values[labels] = value
+
+
+class _Buckets:
+    def __init__(self, num_buckets: int) -> None:
+        # the last one counts the values beyond the largest bound
+        self.counts = [0] * (num_buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    """Distribution of the values by the labels, in log-scaled buckets.
+
+    The bucket i counts the values in (minimum * growth ** (i - 1),
+    minimum * growth ** i], the first one all the values up to the minimum.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Labels = (),
+        minimum: float = DEFAULT_MINIMUM,
+        growth: float = DEFAULT_GROWTH,
+        num_buckets: int = DEFAULT_NUM_BUCKETS,
+    ) -> None:
+        if minimum <= 0 or growth <= 1 or num_buckets <= 0:
+            raise ValueError(f"invalid buckets: {minimum}, {growth}, {num_buckets}")
+        super().__init__(name, help_text, label_names)
+        self._minimum = minimum
+        self._log_growth = math.log(growth)
+        self._bounds = [minimum * growth**i for i in range(num_buckets)]
+        self._buckets: Dict[Labels, _Buckets] = {}
+
+    def get_bounds(self) -> List[float]:
+        """Upper bounds of the buckets."""
+        return self._bounds
+
+    def _get_index(self, value: float) -> int:
+        if value <= self._minimum:
+            return 0
+        index = math.ceil(math.log(value / self._minimum) / self._log_growth)
+        # the rounding errors of the log at the bounds
+        if index > 0 and value <= self._bounds[min(index, len(self._bounds)) - 1]:
+            index -= 1
+        return min(index, len(self._bounds))
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        buckets = self._buckets.get(labels)
+        if buckets is None:
+            self._check_labels(labels)
+            with self._lock:
+                buckets = self._buckets.setdefault(labels, _Buckets(len(self._bounds)))
+        buckets.counts[self._get_index(value)] += 1
+        buckets.count += 1
+        buckets.sum += value
+
+    def get_count(self, labels: Labels = ()) -> int:
+        buckets = self._buckets.get(labels)
+        return 0 if buckets is None else buckets.count
+
+    def get_sum(self, labels: Labels = ()) -> float:
+        buckets = self._buckets.get(labels)
+        return 0.0 if buckets is None else buckets.sum
+
+    def get_quantile(self, q: float, labels: Labels = ()) -> float:
+        """Estimate the quantile, interpolating geometrically in the bucket.
+
+        NaN without any value, the largest bound for the values beyond it.
+        """
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"invalid quantile: {q}")
+        buckets = self._buckets.get(labels)
+        if buckets is None or buckets.count == 0:
+            return math.nan
+        rank = q * buckets.count
+        cumulative = 0
+        for i, n in enumerate(buckets.counts):
+            if n == 0 or cumulative + n < rank:
+                cumulative += n
+                continue
+            if i == 0:
+                return self._bounds[0]
+            if i == len(self._bounds):
+                return self._bounds[-1]
+            lower, upper = self._bounds[i - 1], self._bounds[i]
+            fraction = (rank - cumulative) / n
+            return lower * (upper / lower) ** fraction
+        return self._bounds[-1]
+
+    def _render_samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._buckets.items())
+        for labels, buckets in items:
+            names = self.label_names + ("le",)
+            cumulative = 0
+            for bound, n in zip(self._bounds, buckets.counts):
+                cumulative += n
+                le = _format_labels(names, labels + (_format_value(bound),))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _format_labels(names, labels + ("+Inf",))
+            yield f"{self.name}_bucket{le} {buckets.count}"
+            label_text = _format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(buckets.sum)}"
+            yield f"{self.name}_count{label_text} {buckets.count}"
+
+    def render(self) -> Iterator[str]:
+        yield from super().render()
+        # precomputed quantiles for the dashboards without histogram_quantile
+        name = f"{self.name}_quantile"
+        yield f"# HELP {name} Quantiles of {self.name} by the buckets."
+        yield f"# TYPE {name} gauge"
+        names = self.label_names + ("quantile",)
+        with self._lock:
+            keys = sorted(self._buckets)
+        for labels in keys:
+            for q in QUANTILES:
+                value = self.get_quantile(q, labels)
+                label_text = _format_labels(names, labels + (str(q),))
+                yield f"{name}{label_text} {_format_value(value)}"
+
+
+class Registry:
+    """Metrics exported together."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        if any(m.name == metric.name for m in self._metrics):
+            raise ValueError(f"duplicate metric: {metric.name}")
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+MOVE_LATENCY = Histogram(
+    "battleline_move_latency_seconds", "Seconds of the moves of the players.", ("bot",)
+)
+GAMES = Counter("battleline_games_total", "Games played.", ("worker",))
+GAMES_PER_SECOND = Gauge(
+    "battleline_games_per_second", "Games played per second.", ("worker",)
+)
+for _metric in (MOVE_LATENCY, GAMES, GAMES_PER_SECOND):
+    REGISTRY.register(_metric)
+
+
+class _State:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.path: Optional[str] = None
+        self.interval = DEFAULT_EXPORT_INTERVAL
+        self.started = 0.0
+        self.last_export = 0.0
+
+
+_state = _State()
+
+
+def enable(
+    path: Optional[str] = None, interval: float = DEFAULT_EXPORT_INTERVAL
+) -> None:
+    """Start observing the games.
+
+    Args:
+        path - file to write the metrics in every `interval` seconds (not
+            written if None), `{worker}` is replaced by the name of the process
+    """
+    now = time.perf_counter()
+    _state.enabled = True
+    _state.path = path
+    _state.interval = interval
+    _state.started = now
+    _state.last_export = now
+
+
+def disable() -> None:
+    _state.enabled = False
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+def get_worker() -> str:
+    return multiprocessing.current_process().name
+
+
+def observe_move(bot: str, seconds: float) -> None:
+    MOVE_LATENCY.observe(seconds, (bot,))
+
+
+def observe_game() -> None:
+    worker = (get_worker(),)
+    GAMES.inc(worker)
+    elapsed = time.perf_counter() - _state.started
+    if elapsed > 0:
+        GAMES_PER_SECOND.set(GAMES.get(worker) / elapsed, worker)
+
+
+def export(path: str, registry: Registry = REGISTRY) -> None:
+    """Write the metrics to the file atomically, for the textfile collectors."""
+    path = path.replace("{worker}", get_worker())
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as f:
+        f.write(registry.render())
+    os.replace(temp, path)
+
+
+def maybe_export() -> None:
+    """Write the metrics to the path of `enable` if the interval has passed."""
+    if not _state.enabled or _state.path is None:
+        return
+    now = time.perf_counter()
+    if now - _state.last_export >= _state.interval:
+        _state.last_export = now
+        export(_state.path)
+
+
+def serve(
+    port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY
+) -> ThreadingHTTPServer:
+    """Serve the metrics over HTTP in a background thread, until `shutdown`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,365 @@
+"""Streaming pipeline of the training samples from the self-play games.
+
+Self-play workers (processes) play games between the players, encode every
+position into a sample (see `replaybuffer.encode_sample`) and write the samples
+into shard files in the data directory. The paths of the finished shards go
+through a bounded queue to the loader, which reads them in a background thread,
+shuffles the samples across the shards and yields mini-batches.
+
+The workers and the loader run concurrently, and the bounded queues give the
+backpressure: the workers wait when the loader (or the disk) falls behind, and
+the loader waits when the learner falls behind.
+"""
+
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import threading
+from array import array
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.actions import NUM_ACTIONS, legal_actions
+from src.encoding import (
+    OBSERVATION_SIZE,
+    OBSERVATION_TYPECODE,
+    encode_observation,
+    new_observation_buffer,
+)
+from src.records import GameRecorder
+from src.replay import iter_samples
+from src.replaybuffer import (
+    MASK_BYTES,
+    RECORD_SIZE,
+    decode_sample,
+    encode_sample,
+    unpack_mask,
+)
+from src.runner import DEFAULT_MAX_TURNS, get_player_type, play_game
+
+DEFAULT_SHARD_SIZE = 1024
+DEFAULT_MAX_PENDING_SHARDS = 8
+DEFAULT_SHUFFLE_SIZE = 8192
+DEFAULT_PREFETCH = 4
+
+_POLL_INTERVAL = 0.1
+_SHARD_SUFFIX = ".bin"
+
+
+class MiniBatch(NamedTuple):
+    """Samples stacked into contiguous buffers.
+
+    observations: N * OBSERVATION_SIZE values (see `encode_observation`).
+    masks: N * MASK_BYTES legal masks packed by bits (see `unpack_mask`).
+    actions: N actions played.
+    returns: N final rewards of the games for the players to move.
+    """
+
+    observations: array
+    masks: bytearray
+    actions: array
+    returns: array
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def get_record(self, index: int) -> bytearray:
+        """The sample encoded by `encode_sample`, e.g. for `ReplayBuffer`."""
+        start = index * OBSERVATION_SIZE
+        mask = self.masks[index * MASK_BYTES : (index + 1) * MASK_BYTES]
+        return encode_sample(
+            self.observations[start : start + OBSERVATION_SIZE],
+            self.actions[index],
+            unpack_mask(mask),
+            self.returns[index],
+        )
+
+
+class SelfPlayConfig(NamedTuple):
+    """Games played by the self-play workers."""
+
+    player_types: Tuple[str, str]
+    max_turns: int = DEFAULT_MAX_TURNS
+    shard_size: int = DEFAULT_SHARD_SIZE
+    seed: Optional[int] = None
+
+
+def encode_game_samples(record: Any) -> List[bytearray]:
+    """Encode every position of the recorded game into a sample."""
+    samples = []
+    observation = new_observation_buffer()
+    mask = bytearray(NUM_ACTIONS)
+    for sample in iter_samples(record):
+        encode_observation(sample.state, sample.player, observation)
+        legal = legal_actions(sample.state, sample.player)
+        for a in legal:
+            mask[a] = 1
+        samples.append(encode_sample(observation, sample.action, mask, sample.outcome))
+        for a in legal:
+            mask[a] = 0
+    return samples
+
+
+def _put(channel: Any, item: Any, stop: Any) -> bool:
+    """Put the item into the bounded queue, returning False if stopped."""
+    while not stop.is_set():
+        try:
+            channel.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _run_self_play(
+    index: int,
+    num_workers: int,
+    config: SelfPlayConfig,
+    data_dir: str,
+    num_games: Optional[int],
+    shards: Any,
+    stop: Any,
+) -> None:
+    """Play the games of the worker, sending the paths of the shards.
+
+    The worker ends by sending None, or the exception raised in it.
+    """
+    try:
+        _play_shards(index, num_workers, config, data_dir, num_games, shards, stop)
+    except Exception as e:  # pylint: disable=broad-except
+        _put(shards, e, stop)
+        return
+    _put(shards, None, stop)
+
+
+def _play_shards(
+    index: int,
+    num_workers: int,
+    config: SelfPlayConfig,
+    data_dir: str,
+    num_games: Optional[int],
+    shards: Any,
+    stop: Any,
+) -> None:
+    pending = bytearray()
+    count = 0
+    game = 0
+    while not stop.is_set() and (num_games is None or game < num_games):
+        seed = None if config.seed is None else config.seed + game * num_workers + index
+        recorder = GameRecorder(seed)
+        play_game(config.player_types, seed, config.max_turns, [recorder])
+        game += 1
+        for sample in encode_game_samples(recorder.get_record()):
+            pending += sample
+            count += 1
+            if count == config.shard_size:
+                if not _put(shards, _write_shard(data_dir, index, pending), stop):
+                    return
+                pending = bytearray()
+                count = 0
+    if count and not stop.is_set():
+        _put(shards, _write_shard(data_dir, index, pending), stop)
+
+
+def _write_shard(data_dir: str, index: int, data: bytearray) -> str:
+    """Write the shard atomically, so the loader never sees a partial one."""
+    fd, temp = tempfile.mkstemp(".tmp", f"shard-{index:03d}-", data_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    path = temp[: -len(".tmp")] + _SHARD_SUFFIX
+    os.replace(temp, path)
+    return path
+
+
+class ShardLoader:
+    """Read the shards in a background thread, yielding shuffled mini-batches.
+
+    The samples pass through a shuffle buffer of `shuffle_size` samples: each
+    new sample replaces one taken at random from the buffer. At most `prefetch`
+    mini-batches are kept ahead of the consumer.
+    The shards are deleted once read unless `keep_shards`.
+    """
+
+    def __init__(
+        self,
+        shards: Any,
+        num_producers: int,
+        batch_size: int,
+        shuffle_size: int = DEFAULT_SHUFFLE_SIZE,
+        prefetch: int = DEFAULT_PREFETCH,
+        rng: Optional[random.Random] = None,
+        keep_shards: bool = False,
+    ) -> None:
+        if batch_size <= 0:
+            raise ValueError(f"invalid batch size: {batch_size}")
+        self._shards = shards
+        self._num_producers = num_producers
+        self._batch_size = batch_size
+        self._shuffle_size = max(shuffle_size, 1)
+        self._rng = rng or random.Random()
+        self._keep_shards = keep_shards
+        self._batches: "queue.Queue[Any]" = queue.Queue(prefetch)
+        self._stop = threading.Event()
+        self._num_samples = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def get_num_samples(self) -> int:
+        """Number of the samples read from the shards so far."""
+        return self._num_samples
+
+    def __iter__(self) -> Iterator[MiniBatch]:
+        while True:
+            item = self._batches.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            self._load()
+        except BaseException as e:  # pylint: disable=broad-except
+            _put(self._batches, e, self._stop)
+            return
+        _put(self._batches, None, self._stop)
+
+    def _load(self) -> None:
+        pool: List[memoryview] = []
+        batch: List[memoryview] = []
+        rng = self._rng
+        finished = 0
+        while finished < self._num_producers and not self._stop.is_set():
+            try:
+                path = self._shards.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if path is None:
+                finished += 1
+                continue
+            if isinstance(path, BaseException):
+                raise path
+            for sample in self._read_shard(path):
+                self._num_samples += 1
+                if len(pool) < self._shuffle_size:
+                    pool.append(sample)
+                    continue
+                i = rng.randrange(len(pool))
+                batch.append(pool[i])
+                pool[i] = sample
+                if len(batch) == self._batch_size:
+                    if not _put(self._batches, _stack(batch), self._stop):
+                        return
+                    batch = []
+        rng.shuffle(pool)
+        for sample in pool:
+            batch.append(sample)
+            if len(batch) == self._batch_size:
+                if not _put(self._batches, _stack(batch), self._stop):
+                    return
+                batch = []
+        if batch:
+            _put(self._batches, _stack(batch), self._stop)
+
+    def _read_shard(self, path: str) -> List[memoryview]:
+        with open(path, "rb") as f:
+            data = memoryview(f.read())
+        if not self._keep_shards:
+            os.remove(path)
+        if len(data) % RECORD_SIZE:
+            raise ValueError(f"malformed shard: {path}")
+        return [data[i : i + RECORD_SIZE] for i in range(0, len(data), RECORD_SIZE)]
+
+
+def _stack(samples: List[memoryview]) -> MiniBatch:
+    observations = array(OBSERVATION_TYPECODE)
+    masks = bytearray()
+    actions = array("H")
+    returns = array("f")
+    for record in samples:
+        observation, mask, action, ret = decode_sample(record)
+        observations.frombytes(observation.tobytes())
+        masks += mask
+        actions.append(action)
+        returns.append(ret)
+    assert len(masks) == len(samples) * MASK_BYTES
+    return MiniBatch(observations, masks, actions, returns)
+
+
+class TrainingPipeline:
+    """Run the self-play workers and the loader, iterating the mini-batches.
+
+    Each worker plays `games_per_worker` games (endlessly if None) and the
+    iteration ends when all of them are consumed. At most `max_pending_shards`
+    shards wait on the disk for the loader.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        config: SelfPlayConfig,
+        batch_size: int,
+        num_workers: Optional[int] = None,
+        games_per_worker: Optional[int] = None,
+        max_pending_shards: int = DEFAULT_MAX_PENDING_SHARDS,
+        shuffle_size: int = DEFAULT_SHUFFLE_SIZE,
+        prefetch: int = DEFAULT_PREFETCH,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        for name in config.player_types:
+            # fail fast before spawning workers
+            get_player_type(name)
+        os.makedirs(data_dir, exist_ok=True)
+        num_workers = num_workers or os.cpu_count() or 1
+        self._stop = multiprocessing.Event()
+        self._shards: Any = multiprocessing.Queue(max_pending_shards)
+        self._workers = [
+            multiprocessing.Process(
+                target=_run_self_play,
+                args=(
+                    i,
+                    num_workers,
+                    config,
+                    data_dir,
+                    games_per_worker,
+                    self._shards,
+                    self._stop,
+                ),
+                daemon=True,
+            )
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._loader = ShardLoader(
+            self._shards, num_workers, batch_size, shuffle_size, prefetch, rng
+        )
+
+    def get_loader(self) -> ShardLoader:
+        return self._loader
+
+    def __iter__(self) -> Iterator[MiniBatch]:
+        return iter(self._loader)
+
+    def close(self) -> None:
+        """Stop the workers and the loader, leaving the unread shards."""
+        self._stop.set()
+        self._loader.close()
+        for worker in self._workers:
+            worker.join(1.0)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._shards.close()
+
+    def __enter__(self) -> "TrainingPipeline":
+        return self
+
+    def __exit__(self, *_args: Any) -> None:
+        self.close()
@@ -0,0 +1,120 @@
+"""Player choosing the move by one-ply evaluation of the formations."""
+
+import random
+from typing import Collection, Dict, List, Optional, Sequence
+
+from src.actions import DRAW_TACTICS, DRAW_TROOPS, Move, MoveKinds, legal_moves
+from src.cards.cards import Card, TroopAndTacticMoraleCard, TroopCard
+from src.cards.cardtypes import Formations
+from src.consts import NUM_CARDS
+from src.flag import Flag
+from src.gamestate import GameState
+from src.players.player import Player
+from src.resolver import (
+    aggregate_used_troops,
+    possible_maximum_strength_for_battalion,
+    possible_maximum_strength_for_host,
+    possible_maximum_strength_for_phalanx,
+    possible_maximum_strength_for_skirmish,
+    possible_maximum_strength_for_wedge,
+)
+
+_FORMATION_FUNCS = [
+    (Formations.WEDGE, possible_maximum_strength_for_wedge),
+    (Formations.PHALANX, possible_maximum_strength_for_phalanx),
+    (Formations.BATTALION_ORDER, possible_maximum_strength_for_battalion),
+    (Formations.SKIRMISH_LINE, possible_maximum_strength_for_skirmish),
+    (Formations.HOST, possible_maximum_strength_for_host),
+]
+_HOST_FUNCS = _FORMATION_FUNCS[-1:]
+
+# strength of the formation never exceeds 40 (four cards of 10)
+_FORMATION_SCALE = 100
+# keep tactics cards in the hands while troops could be deployed
+_TACTIC_PENALTY = 5
+_NON_DEPLOY_SCORE = -10 * _FORMATION_SCALE
+_PASS_SCORE = -100 * _FORMATION_SCALE
+
+
+def evaluate_stack(
+    flag: Flag,
+    stacked_cards: Collection[TroopAndTacticMoraleCard],
+    used_cards: Collection[TroopCard],
+) -> int:
+    """Score the strongest formation the stack could still be completed into."""
+    n_cards = flag.get_required_card_num()
+    funcs = _HOST_FUNCS if flag.is_formation_disabled() else _FORMATION_FUNCS
+    for formation, func in funcs:
+        strength, _ = func(stacked_cards, n_cards, used_cards)
+        if strength > 0:
+            return int(formation) * _FORMATION_SCALE + strength
+    return 0
+
+
+class GreedyPlayer(Player):
+    """Deploy the card keeping the strongest possible formation on its flag.
+
+    Tactics other than morales are played only when no card could be deployed.
+    """
+
+    def __init__(self, player_id: int, rng: Optional[random.Random] = None) -> None:
+        super().__init__(player_id)
+        self._rng = rng or random.Random(random.getrandbits(64))
+
+    def play(self, state: GameState) -> GameState:
+        return self._play_move(state, self.choose_move(state))
+
+    def choose_move(self, state: GameState) -> Move:
+        moves = legal_moves(state, self.get_id())
+        draw = DRAW_TROOPS if state.get_troops_deck().is_remain() else DRAW_TACTICS
+        candidates = [
+            m for m in moves if m.draw == draw or m.kind == MoveKinds.SCOUT
+        ] or moves
+        best_score: Optional[int] = None
+        best_moves: List[Move] = []
+        scorer = _MoveScorer(state, self.get_id())
+        for move in candidates:
+            score = scorer.score(move)
+            if best_score is None or score > best_score:
+                best_score = score
+                best_moves = [move]
+            elif score == best_score:
+                best_moves.append(move)
+        return self._rng.choice(best_moves)
+
+
+class _MoveScorer:
+    def __init__(self, state: GameState, player: int) -> None:
+        self._player = player
+        self._flags: Sequence[Flag] = state.get_flags()
+        self._hands: Dict[int, Card] = {
+            c.get_card_id(): c for c in state.get_hands(player)
+        }
+        self._used_cards = aggregate_used_troops(state)
+        self._base_scores: Dict[int, int] = {}
+        self._deploy_scores: Dict[int, int] = {}
+
+    def score(self, move: Move) -> int:
+        if move.kind == MoveKinds.PASS:
+            return _PASS_SCORE
+        if move.kind != MoveKinds.DEPLOY:
+            return _NON_DEPLOY_SCORE
+        key = move.card * len(self._flags) + move.flag
+        score = self._deploy_scores.get(key)
+        if score is None:
+            score = self._score_deploy(move.flag, move.card)
+            self._deploy_scores[key] = score
+        return score
+
+    def _score_deploy(self, flag_index: int, card_id: int) -> int:
+        flag = self._flags[flag_index]
+        stacked = list(flag.get_stacked_cards(self._player))
+        base = self._base_scores.get(flag_index)
+        if base is None:
+            base = evaluate_stack(flag, stacked, self._used_cards)
+            self._base_scores[flag_index] = base
+        stacked.append(self._hands[card_id])  # type: ignore
+        score = evaluate_stack(flag, stacked, self._used_cards) - base
+        if card_id >= NUM_CARDS:
+            score -= _TACTIC_PENALTY
+        return score
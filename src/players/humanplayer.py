@@ -171,7 +171,7 @@ class HumanPlayer(Player):
         return self._play_tactic_guile_scout(
             state,
             card,
-            (draw_tactics_num, 3 - draw_tactics_num),
+            (3 - draw_tactics_num, draw_tactics_num),
             (ret_card_1, ret_card_2),
         )
 
@@ -207,7 +207,9 @@ class HumanPlayer(Player):
             return None
         reclaim_flag, reclaim_card = flag_and_troop
         redeploy_flag = self._choose_flag_to_deploy(state, reclaim_card)
-        return self._play_redeploy_for_flag(
+        if redeploy_flag is None:
+            return None
+        return self._play_traitor_for_flag(
             state, card, reclaim_flag, reclaim_card, redeploy_flag,
         )
 
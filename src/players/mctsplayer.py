@@ -0,0 +1,154 @@
+"""Player searching the move by Information Set Monte Carlo Tree Search."""
+
+import random
+import time
+from typing import Optional
+
+from src.actions import encode_move, infer_move
+from src.gamestate import GameState
+from src.players.player import Player
+from src.search.mcts import DEFAULT_EXPLORATION, ISMCTS
+from src.search.nodestore import DEFAULT_MAX_MEMORY
+from src.search.parallel import (
+    PARALLEL_LEAF,
+    PARALLEL_ROOT,
+    LeafParallelISMCTS,
+    RootParallelISMCTS,
+)
+from src.search.solver import EndgameSolver, is_endgame
+from src.search.transposition import TranspositionTable
+from src.tracker import CardTracker
+
+DEFAULT_TIME_LIMIT = 1.0
+MOVE_OVERHEAD = 0.005
+
+
+class ISMCTSPlayer(Player):
+    """Search under the wall-clock budget (`time_limit` seconds) or `iterations`.
+
+    With `reuse_tree`, the subtree of the moves actually played is kept for the
+    next turn, following the opposite move inferred from the new state.
+    The cards seen by the player are counted by a CardTracker along the game,
+    following the moves of both players in the same way, and the hidden cards
+    of the search are sampled from it.
+    `parallel` runs the search across `num_workers` processes, either by
+    PARALLEL_ROOT or PARALLEL_LEAF (see `search.parallel`).
+    The tree is kept within `max_memory` bytes by evicting the least visited
+    subtrees. With `transposition_slots`, the statistics are shared across the
+    transpositions through a table of the size (not used by PARALLEL_ROOT).
+    With `endgame_solver`, the moves after both decks are exhausted are searched
+    by the exact EndgameSolver instead, within the same time limit.
+    `play_until` stops the search at the deadline as well, keeping MOVE_OVERHEAD
+    seconds to play the move.
+    """
+
+    def __init__(
+        self,
+        player_id: int,
+        time_limit: Optional[float] = DEFAULT_TIME_LIMIT,
+        iterations: Optional[int] = None,
+        reuse_tree: bool = True,
+        exploration: float = DEFAULT_EXPLORATION,
+        rng: Optional[random.Random] = None,
+        parallel: Optional[str] = None,
+        num_workers: Optional[int] = None,
+        max_memory: Optional[int] = DEFAULT_MAX_MEMORY,
+        transposition_slots: Optional[int] = None,
+        endgame_solver: bool = True,
+    ) -> None:
+        super().__init__(player_id)
+        assert time_limit is not None or iterations is not None
+        self._time_limit = time_limit
+        self._iterations = iterations
+        self._reuse_tree = reuse_tree
+        transpositions = (
+            None
+            if transposition_slots is None
+            else TranspositionTable(transposition_slots)
+        )
+        self._search: ISMCTS
+        if parallel is None:
+            self._search = ISMCTS(
+                player_id,
+                exploration=exploration,
+                rng=rng,
+                max_memory=max_memory,
+                transpositions=transpositions,
+            )
+        elif parallel == PARALLEL_ROOT:
+            self._search = RootParallelISMCTS(
+                player_id,
+                num_workers,
+                exploration=exploration,
+                rng=rng,
+                max_memory=max_memory,
+            )
+        elif parallel == PARALLEL_LEAF:
+            self._search = LeafParallelISMCTS(
+                player_id,
+                num_workers,
+                exploration=exploration,
+                rng=rng,
+                max_memory=max_memory,
+                transpositions=transpositions,
+            )
+        else:
+            raise ValueError(f"unknown parallel mode: {parallel}")
+        self._endgame = EndgameSolver(player_id, rng=rng) if endgame_solver else None
+        self._last_state: Optional[GameState] = None
+        self._tracker: Optional[CardTracker] = None
+
+    def get_tracker(self) -> Optional[CardTracker]:
+        return self._tracker
+
+    def get_search(self) -> ISMCTS:
+        return self._search
+
+    def get_playouts_per_sec(self) -> float:
+        return self._search.get_playouts_per_sec()
+
+    def play(self, state: GameState) -> GameState:
+        return self.play_until(state, None)
+
+    def play_until(self, state: GameState, deadline: Optional[float]) -> GameState:
+        """Search until the deadline or the time limit, whichever comes first."""
+        if self._time_limit is not None:
+            limit = time.perf_counter() + self._time_limit
+            deadline = limit if deadline is None else min(deadline, limit)
+        if deadline is not None:
+            # leave the time to apply the move
+            deadline -= MOVE_OVERHEAD
+        tracker = self._follow_opposite_move(state)
+        if self._endgame is not None and is_endgame(state):
+            move = self._endgame.solve(state, deadline).move
+            self._search.reset()
+        else:
+            move = self._search.search(state, self._iterations, deadline, tracker)
+            if self._reuse_tree:
+                self._search.advance(encode_move(move))
+            else:
+                self._search.reset()
+        new_state = self._play_move(state, move)
+        # the drawn cards and the scouted ones are seen in the new hand
+        tracker.observe_move(self.get_id(), move)
+        tracker.observe_private(new_state)
+        self._last_state = new_state
+        return new_state
+
+    def _follow_opposite_move(self, state: GameState) -> CardTracker:
+        """Follow the opposite move by the tracker and the tree if inferable."""
+        last = self._last_state
+        tracker = self._tracker
+        self._last_state = None
+        move = None
+        if last is not None and tracker is not None:
+            move = infer_move(last, state, self.get_opposite_id())
+        if tracker is None or move is None:
+            # a new game, or the state is not continued from the last move
+            self._search.reset()
+            self._tracker = CardTracker.from_state(state, self.get_id())
+            return self._tracker
+        tracker.observe_move(self.get_opposite_id(), move)
+        if self._reuse_tree:
+            self._search.advance(encode_move(move))
+        return tracker
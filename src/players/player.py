@@ -3,6 +3,13 @@
 from abc import ABCMeta, abstractmethod
 from typing import List, Optional, Tuple
 
+from src.actions import (
+    SCOUT_DRAW_SIZE,
+    Move,
+    MoveKinds,
+    choose_scout_returns,
+    draw_card,
+)
 from src.cards.cards import (
     Card,
     TacticCard,
@@ -17,6 +24,8 @@ from src.consts import PLAYER_A, PLAYER_B, PLAYER_IDS, PLAYER_UNRESOLVED
 from src.flag import Flag
 from src.gamestate import GameState, GuileOperation
 
+_LEADERS = (TacticMorales.LEADER_ALEXANDER, TacticMorales.LEADER_DARIUS)
+
 
 class Player(metaclass=ABCMeta):
     def __init__(self, player_id: int) -> None:
@@ -27,11 +36,19 @@ class Player(metaclass=ABCMeta):
     def play(self, state: GameState) -> GameState:
         raise NotImplementedError()
 
+    def play_until(self, state: GameState, deadline: Optional[float]) -> GameState:
+        """Play within the deadline (in terms of `time.perf_counter`).
+
+        Anytime players stop thinking at the deadline and play the best move
+        found so far, the others just play as `play` does.
+        """
+        return self.play(state)
+
     def get_id(self) -> int:
         return self._id
 
     def get_opposite_id(self) -> int:
-        return PLAYER_A if self._id == PLAYER_A else PLAYER_B
+        return PLAYER_B if self._id == PLAYER_A else PLAYER_A
 
     def get_hands(self, state: GameState) -> List[Card]:
         return state.get_hands(self._id)
@@ -47,32 +64,16 @@ class Player(metaclass=ABCMeta):
         return flag.get_resolved() == PLAYER_UNRESOLVED
 
     def _can_play_tactics(self, card: TacticCard, state: GameState) -> bool:
-        deployed_tactics: List[List[TacticCard]] = [[], []]
-        # calculate sum of deployed tactics
-        for p in PLAYER_IDS:
-            for f in state.get_flags():
-                troops = f.get_stacked_cards(p)
-                deployed_tactics[p].extend(
-                    [c for c in troops if isinstance(c, TacticCard)]
-                )
-                deployed_tactics[p].extend(f.get_stacked_envs(p))
-            deployed_tactics[p].extend(
-                [o.get_tactic_guile_card() for o in state.get_operations(p)]
-            )
-        deployable_cards_num = len(deployed_tactics[self.get_opposite_id()]) + 1
-        leaders = [
-            TacticMorales.LEADER_ALEXANDER,
-            TacticMorales.LEADER_DARIUS,
-        ]
-        if isinstance(card, TacticMoraleCard) and card.get_tactic_morales() in leaders:
-            for deployed_card in deployed_tactics[self.get_id()]:
-                if (
-                    isinstance(deployed_card, TacticMoraleCard)
-                    and deployed_card.get_tactic_morales() in leaders
-                ):
-                    # you can't play both of leader cards
-                    return False
-        return len(deployed_tactics[self.get_id()]) <= deployable_cards_num
+        if (
+            isinstance(card, TacticMoraleCard)
+            and card.get_tactic_morales() in _LEADERS
+            and state.has_played_leader(self._id)
+        ):
+            # you can't play both of leader cards
+            return False
+        return state.get_num_played_tactics(self._id) <= state.get_num_played_tactics(
+            self.get_opposite_id()
+        )
 
     def _play_troop_tactic_morales_for_flag(
         self, state: GameState, flag: Flag, card: TroopAndTacticMoraleCard
@@ -83,6 +84,7 @@ class Player(metaclass=ABCMeta):
         assert self._can_play_troop_tactic_morales_for_flag(flag)
         hands.remove(card)  # type: ignore
         flag.add_stack(self._id, card)
+        state.add_played_tactic(self._id, card)  # type: ignore
         return state
 
     def _play_tactic_envs_for_flag(
@@ -94,6 +96,7 @@ class Player(metaclass=ABCMeta):
         assert self._can_play_tactic_envs_for_flag(flag)
         hands.remove(card)
         flag.add_env(self._id, card)
+        state.add_played_tactic(self._id, card)
         return state
 
     def _play_tactic_guile_scout(
@@ -109,18 +112,22 @@ class Player(metaclass=ABCMeta):
         troops = [state.get_troops_deck().draw() for _ in range(draw_troops)]
         tactics = [state.get_tactics_deck().draw() for _ in range(draw_tactics)]
         hands = state.get_hands(self.get_id())
+        assert card in hands
+        hands.remove(card)
         hands.extend(troops)
         hands.extend(tactics)
         for c in ret_card:
             assert c in hands
+            hands.remove(c)
             if isinstance(c, TroopCard):
-                state.get_troops_deck().back(c)
+                state.get_troops_deck().back(c, self.get_id())
             elif isinstance(c, TacticCard):
-                state.get_tactics_deck().back(c)
+                state.get_tactics_deck().back(c, self.get_id())
             else:
                 raise ValueError(f"Unknown card type: {repr(card)}")
         hands.sort()
         state.get_operations(self.get_id()).append(GuileOperation(card, None))
+        state.add_played_tactic(self.get_id(), card)
         return state
 
     def _play_redeploy_for_flag(
@@ -132,7 +139,7 @@ class Player(metaclass=ABCMeta):
         redeploy_flag: Optional[Flag],
     ) -> GameState:
         assert card.get_tactic_guiles() == TacticGuiles.REDEPLOY
-        self._play_tactic_guile_reclaims(
+        return self._play_tactic_guile_reclaims(
             state, card, reclaiming_flag, reclaimed_card, self.get_id(), redeploy_flag
         )
 
@@ -143,7 +150,8 @@ class Player(metaclass=ABCMeta):
         reclaiming_flag: Flag,
         reclaimed_card: TroopAndTacticMoraleCard,
     ) -> GameState:
-        self._play_tactic_guile_reclaims(
+        assert card.get_tactic_guiles() == TacticGuiles.DESERTER
+        return self._play_tactic_guile_reclaims(
             state, card, reclaiming_flag, reclaimed_card, self.get_opposite_id(), None
         )
 
@@ -190,6 +198,9 @@ class Player(metaclass=ABCMeta):
         state = new_state
         reclaim_flag = new_reclaiming_flag
         redeploy_flag = new_redeploy_flag
+        hands = self.get_hands(state)
+        assert card in hands
+        hands.remove(card)
         removal = reclaim_flag.remove_stack(reclaimed_player, reclaimed_card)
         assert removal is not None and reclaimed_card == removal
         if redeploy_flag is not None:
@@ -197,8 +208,70 @@ class Player(metaclass=ABCMeta):
             state.get_operations(self.get_id()).append(GuileOperation(card, None))
         else:
             state.get_operations(self.get_id()).append(GuileOperation(card, removal))
+        state.add_played_tactic(self.get_id(), card)
         return state
 
+    def _play_move(self, state: GameState, move: Move) -> GameState:
+        """Play the move, including the draw at the end of the turn."""
+        kind = move.kind
+        if kind == MoveKinds.PASS:
+            return state
+        card = self._find_hand(state, move.card)
+        flags = state.get_flags()
+        if kind == MoveKinds.DEPLOY:
+            new_state = self._play_troop_tactic_morales_for_flag(
+                state, flags[move.flag], card  # type: ignore
+            )
+        elif kind == MoveKinds.ENVIRONMENT:
+            new_state = self._play_tactic_envs_for_flag(
+                state, flags[move.flag], card  # type: ignore
+            )
+        elif kind == MoveKinds.SCOUT:
+            ret_card = choose_scout_returns(state, self._id, move.draw)
+            return self._play_tactic_guile_scout(
+                state,
+                card,  # type: ignore
+                (SCOUT_DRAW_SIZE - move.draw, move.draw),
+                (ret_card[0], ret_card[1]),
+            )
+        elif kind == MoveKinds.REDEPLOY:
+            flag = flags[move.flag]
+            new_state = self._play_redeploy_for_flag(
+                state,
+                card,  # type: ignore
+                flag,
+                flag.get_stacked_cards(self._id)[move.slot],
+                flags[move.dest] if move.dest >= 0 else None,
+            )
+        elif kind == MoveKinds.DESERTER:
+            flag = flags[move.flag]
+            new_state = self._play_deserter_for_flag(
+                state,
+                card,  # type: ignore
+                flag,
+                flag.get_stacked_cards(self.get_opposite_id())[move.slot],
+            )
+        elif kind == MoveKinds.TRAITOR:
+            flag = flags[move.flag]
+            new_state = self._play_traitor_for_flag(
+                state,
+                card,  # type: ignore
+                flag,
+                flag.get_stacked_cards(self.get_opposite_id())[move.slot],
+                flags[move.dest],
+            )
+        else:
+            raise ValueError(f"unknown move: {move}")
+        # new state is a clone, so draw the card in place
+        draw_card(new_state, self._id, move.draw)
+        return new_state
+
+    def _find_hand(self, state: GameState, card_id: int) -> Card:
+        for c in self.get_hands(state):
+            if c.get_card_id() == card_id:
+                return c
+        raise ValueError(f"card {card_id} is not in the hands")
+
     @staticmethod
     def _generate_new_state(state: GameState, flag: Flag) -> Tuple[GameState, Flag]:
         new_state = state.clone()
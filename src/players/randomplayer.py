@@ -0,0 +1,20 @@
+"""Player choosing the legal move uniformly at random."""
+
+import random
+from typing import Optional
+
+from src.actions import Move, decode_action, legal_actions
+from src.gamestate import GameState
+from src.players.player import Player
+
+
+class RandomPlayer(Player):
+    def __init__(self, player_id: int, rng: Optional[random.Random] = None) -> None:
+        super().__init__(player_id)
+        self._rng = rng or random.Random(random.getrandbits(64))
+
+    def play(self, state: GameState) -> GameState:
+        return self._play_move(state, self.choose_move(state))
+
+    def choose_move(self, state: GameState) -> Move:
+        return decode_action(self._rng.choice(legal_actions(state, self.get_id())))
@@ -0,0 +1,221 @@
+"""Exact probabilities to complete the formations on the flags.
+
+The cards drawn by the player are supposed to be taken uniformly at random from
+the troops unseen by the player (see `CardTracker`), so the probability is a
+ratio of the numbers of the combinations of the drawn cards.
+The relevant troops of a formation are split into groups (single cards, or the
+cards of a number or a color), and the combinations failing to complete the
+formation are counted by the number of the cards drawn from each group. The
+counts are memoized by the sizes of the groups.
+"""
+
+from functools import lru_cache
+from math import comb
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src import profiling
+from src.cards.cards import Card, TacticMoraleCard, TroopAndTacticMoraleCard, TroopCard
+from src.cards.cardtypes import Formations, TacticMorales
+from src.consts import NUM_CARDS, NUM_COLORS
+from src.flag import Flag
+from src.resolver import (
+    check_consecutive_formation,
+    check_same_color_in_stack,
+    is_formation_completed,
+)
+from src.tracker import CardTracker
+
+_NUM_NUMBERS = NUM_CARDS // NUM_COLORS
+
+# a group of the troops: card ids, and the numbers of the cards required from
+# the group by each alternative to complete the formation
+_Component = Tuple[List[Sequence[int]], List[Tuple[int, ...]]]
+
+
+def get_completion_probability(
+    stacked_cards: Collection[TroopAndTacticMoraleCard],
+    n_cards: int,
+    formation: Formations,
+    tracker: CardTracker,
+    draws: int,
+    hand: Iterable[Card] = (),
+) -> float:
+    """Probability to complete the formation on the stack.
+
+    Only the troops complete the formation, from the `hand` or from the `draws`
+    cards to be drawn among the troops unseen by the tracker.
+    """
+    required = n_cards - len(stacked_cards)
+    if required <= 0:
+        completed = is_formation_completed(stacked_cards, n_cards, formation)
+        return 1.0 if completed else 0.0
+    components = _get_components(stacked_cards, n_cards, formation)
+    if not components:
+        return 0.0
+    held = bytearray(NUM_CARDS)
+    for card in hand:
+        if isinstance(card, TroopCard):
+            held[card.get_card_id()] = 1
+    total = tracker.get_num_unseen_troops()
+    draws = min(draws, total)
+    failures = (1,)
+    relevant = 0
+    for groups, needs in components:
+        sizes = tuple(sum(tracker.is_unseen(i) for i in g) for g in groups)
+        holds = tuple(sum(held[i] for i in g) for g in groups)
+        relevant += sum(sizes)
+        failures = _multiply(failures, _count_failures(sizes, holds, tuple(needs)))
+    failed = sum(
+        ways * _comb(total - relevant, draws - j) for j, ways in enumerate(failures)
+    )
+    return 1.0 - failed / comb(total, draws)
+
+
+def get_flag_completion_probabilities(
+    flag: Flag,
+    player: int,
+    tracker: CardTracker,
+    draws: int,
+    hand: Iterable[Card] = (),
+) -> Dict[Formations, float]:
+    """Probabilities to complete each formation on the flag by the player."""
+    stacked = flag.get_stacked_cards(player)
+    n_cards = flag.get_required_card_num()
+    hand = list(hand)
+    formations = [Formations.HOST] if flag.is_formation_disabled() else list(Formations)
+    return {
+        f: get_completion_probability(stacked, n_cards, f, tracker, draws, hand)
+        for f in formations
+    }
+
+
+def _get_components(
+    stacked_cards: Collection[TroopAndTacticMoraleCard],
+    n_cards: int,
+    formation: Formations,
+) -> List[_Component]:
+    """Independent components of the formation, any of them completes it."""
+    required = n_cards - len(stacked_cards)
+    if formation == Formations.HOST:
+        return [([range(NUM_CARDS)], [(required,)])]
+    if formation == Formations.PHALANX:
+        return [
+            ([_number_ids(n)], [(required,)]) for n in _phalanx_numbers(stacked_cards)
+        ]
+    same_color, color = check_same_color_in_stack(stacked_cards)
+    colors = [int(color)] if color is not None else range(1, NUM_COLORS + 1)
+    if formation == Formations.BATTALION_ORDER:
+        if not same_color:
+            return []
+        return [([_color_ids(c)], [(required,)]) for c in colors]
+    strength, _, cand_tuples = check_consecutive_formation(stacked_cards, n_cards)
+    if strength is not None:
+        return []
+    numbers = sorted(set(n for _, missing in cand_tuples for n in missing))
+    needs = [tuple(int(n in missing) for n in numbers) for _, missing in cand_tuples]
+    if formation == Formations.SKIRMISH_LINE:
+        return [([_number_ids(n) for n in numbers], needs)]
+    if not same_color:
+        return []
+    # wedge: the single cards of the numbers in the color
+    return [
+        ([[(c - 1) * _NUM_NUMBERS + n - 1] for n in numbers], needs) for c in colors
+    ]
+
+
+def _phalanx_numbers(stacked_cards: Collection[TroopAndTacticMoraleCard]) -> List[int]:
+    number: Optional[int] = None
+    is_shield = False
+    for c in stacked_cards:
+        if isinstance(c, TroopCard):
+            value = int(c.get_troop())
+        elif isinstance(c, TacticMoraleCard):
+            morale = c.get_tactic_morales()
+            if morale == TacticMorales.SHIELD_BEARERS:
+                is_shield = True
+            if morale != TacticMorales.COMPANION_CAVALRY:
+                continue
+            value = 8
+        else:
+            raise ValueError("invalid card: {}".format(c))
+        if number is not None and number != value:
+            return []
+        number = value
+    candidates = range(1, 4) if is_shield else range(1, _NUM_NUMBERS + 1)
+    if number is not None:
+        return [number] if number in candidates else []
+    return list(candidates)
+
+
+def _number_ids(number: int) -> List[int]:
+    return [c * _NUM_NUMBERS + number - 1 for c in range(NUM_COLORS)]
+
+
+def _color_ids(color: int) -> range:
+    return range((color - 1) * _NUM_NUMBERS, color * _NUM_NUMBERS)
+
+
+@lru_cache(maxsize=None)
+def _count_failures(
+    sizes: Tuple[int, ...], holds: Tuple[int, ...], needs: Tuple[Tuple[int, ...], ...]
+) -> Tuple[int, ...]:
+    """Count the draws from the groups failing every alternative, by their size.
+
+    The groups are drawn one by one, keeping the ways to draw by the set (a bit
+    mask) of the alternatives still satisfied by the groups drawn so far.
+
+    Args:
+        sizes - numbers of the unseen cards of the groups
+        holds - numbers of the cards of the groups already in the hand
+        needs - numbers of the cards required from the groups by each alternative
+    """
+    states: Dict[int, Tuple[int, ...]] = {(1 << len(needs)) - 1: (1,)}
+    for i, (size, hold) in enumerate(zip(sizes, holds)):
+        shortages = [max(need[i] - hold, 0) for need in needs]
+        cap = min(size, max(shortages))
+        next_states: Dict[int, Tuple[int, ...]] = {}
+        for drawn in range(cap + 1):
+            satisfied = sum(1 << k for k, s in enumerate(shortages) if s <= drawn)
+            ways = _group_ways(size, drawn, drawn == cap)
+            for alive, counts in states.items():
+                key = alive & satisfied
+                product = _multiply(counts, ways)
+                if key in next_states:
+                    product = _add(next_states[key], product)
+                next_states[key] = product
+        states = next_states
+    return states.get(0, (0,))
+
+
+@lru_cache(maxsize=None)
+def _group_ways(size: int, drawn: int, at_least: bool) -> Tuple[int, ...]:
+    """Ways to draw `drawn` (or more if `at_least`) cards of the group, by count."""
+    ways = [0] * (size + 1)
+    for j in range(drawn, size + 1 if at_least else drawn + 1):
+        ways[j] = comb(size, j)
+    return tuple(ways)
+
+
+def _multiply(a: Sequence[int], b: Sequence[int]) -> Tuple[int, ...]:
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return tuple(result)
+
+
+def _add(a: Sequence[int], b: Sequence[int]) -> Tuple[int, ...]:
+    if len(a) < len(b):
+        a, b = b, a
+    return tuple(x + (b[i] if i < len(b) else 0) for i, x in enumerate(a))
+
+
+def _comb(n: int, k: int) -> int:
+    return comb(n, k) if 0 <= k <= n else 0
+
+
+profiling.register_cache(
+    "probability.count_failures", lambda: _count_failures.cache_info()[:2]
+)
+profiling.register_cache("probability.group_ways", lambda: _group_ways.cache_info()[:2])
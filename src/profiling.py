@@ -0,0 +1,149 @@
+"""Runtime-switchable counters of the time spent in the phases of the game loop.
+
+The counters are off by default and cost a flag check when off. Once enabled
+(see `enable`), `Game.run` records the cumulative time and the number of the
+calls of each phase:
+    PHASE_DECISION: the players choosing the moves (`Player.play_until`)
+    PHASE_CLONE: cloning the states (`GameState.clone`), mostly by the players
+        within their decisions
+    PHASE_RESOLVE: resolving the flags after each move
+    PHASE_WINNER: checking the winner after each move
+
+Caches count their hits and misses as well (see `add_cache_access`), and the
+memoized functions can be registered to report the counts they keep (see
+`register_cache`).
+
+The counters are kept per process, so each worker of a pool reports its own.
+"""
+
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, TextIO, Tuple
+
+PHASE_DECISION = "decision"
+PHASE_CLONE = "clone"
+PHASE_RESOLVE = "resolve"
+PHASE_WINNER = "winner"
+
+
+class PhaseStats(NamedTuple):
+    calls: int
+    seconds: float
+
+    def get_average(self) -> float:
+        return self.seconds / self.calls if self.calls else 0.0
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+
+    def get_hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _Profile:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.phases: Dict[str, List[float]] = {}
+        self.caches: Dict[str, List[int]] = {}
+        self.providers: Dict[str, Callable[[], Tuple[int, int]]] = {}
+        self.report_interval: Optional[float] = None
+        self.out: TextIO = sys.stderr
+        self.last_report = 0.0
+
+
+_profile = _Profile()
+
+
+def enable(
+    report_interval: Optional[float] = None, out: Optional[TextIO] = None
+) -> None:
+    """Start counting.
+
+    Args:
+        report_interval - seconds between the summary lines written by
+            `maybe_report` (no line if None)
+        out - stream of the summary lines, stderr if None
+    """
+    _profile.enabled = True
+    _profile.report_interval = report_interval
+    _profile.out = out or sys.stderr
+    _profile.last_report = time.perf_counter()
+
+
+def disable() -> None:
+    """Stop counting, keeping the counts so far."""
+    _profile.enabled = False
+
+
+def is_enabled() -> bool:
+    return _profile.enabled
+
+
+def reset() -> None:
+    """Clear the counts (the ones kept by the registered caches are not)."""
+    _profile.phases.clear()
+    _profile.caches.clear()
+
+
+def add_phase_time(phase: str, seconds: float) -> None:
+    """Count a call of the phase taking the seconds."""
+    stats = _profile.phases.get(phase)
+    if stats is None:
+        _profile.phases[phase] = [1, seconds]
+    else:
+        stats[0] += 1
+        stats[1] += seconds
+
+
+def add_cache_access(cache: str, hit: bool) -> None:
+    stats = _profile.caches.get(cache)
+    if stats is None:
+        stats = _profile.caches[cache] = [0, 0]
+    stats[0 if hit else 1] += 1
+
+
+def register_cache(cache: str, get_counts: Callable[[], Tuple[int, int]]) -> None:
+    """Report the hits and the misses counted by the cache itself.
+
+    e.g. `register_cache(name, lambda: f.cache_info()[:2])` for `lru_cache`.
+    """
+    _profile.providers[cache] = get_counts
+
+
+def get_phases() -> Dict[str, PhaseStats]:
+    return {name: PhaseStats(int(c), s) for name, (c, s) in _profile.phases.items()}
+
+
+def get_caches() -> Dict[str, CacheStats]:
+    """Counts of the caches, including the registered ones."""
+    caches = {name: CacheStats(h, m) for name, (h, m) in _profile.caches.items()}
+    for name, get_counts in _profile.providers.items():
+        caches[name] = CacheStats(*get_counts())
+    return caches
+
+
+def get_summary() -> str:
+    """Summary of the counts in a line."""
+    items = [
+        f"{name} {s.seconds:.3f}s/{s.calls} ({s.get_average() * 1e6:.1f}us)"
+        for name, s in sorted(get_phases().items())
+    ]
+    items.extend(
+        f"{name} hit {s.get_hit_rate():.1%}/{s.hits + s.misses}"
+        for name, s in sorted(get_caches().items())
+    )
+    return "profile: " + ", ".join(items)
+
+
+def maybe_report() -> None:
+    """Write the summary line if the report interval has passed."""
+    interval = _profile.report_interval
+    if not _profile.enabled or interval is None:
+        return
+    now = time.perf_counter()
+    if now - _profile.last_report >= interval:
+        _profile.last_report = now
+        print(get_summary(), file=_profile.out)
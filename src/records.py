@@ -0,0 +1,288 @@
+"""Compact records of the games and the log files of them.
+
+A record keeps only the deal and the actions played from it, since the games
+are deterministic given them. The orders of the decks are stored as the ranks
+of the permutations, so a record takes about 40 bytes plus 2 bytes per action.
+
+The log file starts with LOG_MAGIC, followed by the records, each prefixed by
+its length as a 4-byte little-endian integer, so the records are appended as
+the games finish and streamed back one by one.
+"""
+
+import struct
+import sys
+from array import array
+from math import factorial
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.actions import Move, MoveKinds, encode_move
+from src.cards.cards import Card, CardGenerator
+from src.cards.decks import TacticsDeck, TroopsDeck
+from src.consts import (
+    NUM_CARDS,
+    NUM_FLAGS,
+    NUM_INITIAL_HAND,
+    NUM_TACTICS,
+    PLAYER_A,
+    PLAYER_IDS,
+    PLAYER_UNRESOLVED,
+)
+from src.events import CardPlayed, GameEvent, GameOver, GuileUsed, Passed, TurnStarted
+from src.flag import Flag
+from src.gamestate import GameState
+
+LOG_MAGIC = b"BLRC\x01"
+ACTION_TYPECODE = "H"
+
+_LENGTH = struct.Struct("<I")
+_HAS_SEED = 0x01
+_TROOPS_RANK_BYTES = (factorial(NUM_CARDS).bit_length() + 7) // 8
+_TACTICS_RANK_BYTES = (factorial(NUM_TACTICS).bit_length() + 7) // 8
+
+
+class CompactRecord(NamedTuple):
+    """A game recorded by the deal and the actions played from it.
+
+    troops: card ids of the troops deck from the bottom, then the hands of
+        PLAYER_A and PLAYER_B, as dealt.
+    tactics: card ids of the tactics deck from the bottom.
+    actions: encoded actions, played alternately from PLAYER_A.
+    winner: PLAYER_UNRESOLVED for a draw or an unfinished game.
+    seed: seed of the deal if known (see `GameState.new`), for the reference.
+    """
+
+    troops: bytes
+    tactics: bytes
+    actions: Sequence[int]
+    winner: int = PLAYER_UNRESOLVED
+    seed: Optional[int] = None
+
+    @staticmethod
+    def from_state(
+        state: GameState,
+        actions: Sequence[int] = (),
+        winner: int = PLAYER_UNRESOLVED,
+        seed: Optional[int] = None,
+    ) -> "CompactRecord":
+        """Record the deal of the initial state."""
+        if (
+            any(f.get_stacked_cards(p) for f in state.get_flags() for p in PLAYER_IDS)
+            or any(state.get_operations(p) for p in PLAYER_IDS)
+            or len(state.get_tactics_deck()) != NUM_TACTICS
+        ):
+            raise ValueError("not an initial state")
+        troops_deck = state.get_troops_deck()
+        troops = [c.get_card_id() for c in troops_deck.peek(len(troops_deck))][::-1]
+        for p in PLAYER_IDS:
+            troops.extend(c.get_card_id() for c in state.get_hands(p))
+        tactics_deck = state.get_tactics_deck()
+        tactics = [c.get_card_id() for c in tactics_deck.peek(NUM_TACTICS)][::-1]
+        return CompactRecord(bytes(troops), bytes(tactics), actions, winner, seed)
+
+    def get_initial_state(self) -> GameState:
+        """Deal the initial state of the game."""
+        troops = [_CARDS[i] for i in self.troops]
+        n_deck = NUM_CARDS - NUM_INITIAL_HAND * len(PLAYER_IDS)
+        hands: List[List[Card]] = [
+            troops[n_deck + i * NUM_INITIAL_HAND : n_deck + (i + 1) * NUM_INITIAL_HAND]
+            for i in range(len(PLAYER_IDS))
+        ]
+        return GameState(
+            TroopsDeck(troops[:n_deck]),  # type: ignore
+            TacticsDeck([_CARDS[i] for i in self.tactics]),  # type: ignore
+            [Flag() for _ in range(NUM_FLAGS)],
+            [[], []],
+            hands,
+        )
+
+
+def encode_record(record: CompactRecord) -> bytes:
+    """Encode the record into compact bytes, restored by `decode_record`.
+
+    Layout:
+        flags (0x01 if the seed is given), the seed as a varint if given
+        winner + 1
+        ranks of the permutations of the troops and the tactics
+        number of the actions as a varint, then the actions as 2-byte
+        little-endian integers
+    """
+    out = bytearray()
+    seed = record.seed
+    out.append(0 if seed is None else _HAS_SEED)
+    if seed is not None:
+        if seed < 0:
+            raise ValueError(f"negative seed: {seed}")
+        _put_varint(out, seed)
+    out.append(record.winner + 1)
+    out += _rank(record.troops, 0).to_bytes(_TROOPS_RANK_BYTES, "little")
+    out += _rank(record.tactics, NUM_CARDS).to_bytes(_TACTICS_RANK_BYTES, "little")
+    actions = array(ACTION_TYPECODE, record.actions)
+    if sys.byteorder == "big":
+        actions.byteswap()
+    _put_varint(out, len(actions))
+    out += actions.tobytes()
+    return bytes(out)
+
+
+def decode_record(data: bytes) -> CompactRecord:
+    """Restore the record encoded by `encode_record`."""
+    flags = data[0]
+    pos = 1
+    seed: Optional[int] = None
+    if flags & _HAS_SEED:
+        seed, pos = _get_varint(data, pos)
+    winner = data[pos] - 1
+    pos += 1
+    end = pos + _TROOPS_RANK_BYTES
+    troops = _unrank(int.from_bytes(data[pos:end], "little"), NUM_CARDS, 0)
+    pos, end = end, end + _TACTICS_RANK_BYTES
+    tactics = _unrank(int.from_bytes(data[pos:end], "little"), NUM_TACTICS, NUM_CARDS)
+    num_actions, pos = _get_varint(data, end)
+    end = pos + num_actions * 2
+    if end != len(data):
+        raise ValueError(f"malformed record: {len(data)} bytes for {end}")
+    actions = array(ACTION_TYPECODE, data[pos:end])
+    if sys.byteorder == "big":
+        actions.byteswap()
+    return CompactRecord(troops, tactics, actions, winner, seed)
+
+
+class RecordWriter:
+    """Append the records to the log file.
+
+    The records are buffered by the file, call `flush` to make them visible to
+    the readers.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._file: BinaryIO = open(path, "ab")
+        self._count = 0
+        if self._file.tell() == 0:
+            self._file.write(LOG_MAGIC)
+
+    def get_count(self) -> int:
+        """Number of the records written by the writer."""
+        return self._count
+
+    def write(self, record: CompactRecord) -> None:
+        self.write_encoded(encode_record(record))
+
+    def write_encoded(self, data: bytes) -> None:
+        """Append the record already encoded by `encode_record`."""
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+        self._count += 1
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *_args) -> None:
+        self.close()
+
+
+def read_encoded_records(path: str) -> Iterator[bytes]:
+    """Stream the encoded records of the log file."""
+    with open(path, "rb") as f:
+        if f.read(len(LOG_MAGIC)) != LOG_MAGIC:
+            raise ValueError(f"not a record log: {path}")
+        while True:
+            header = f.read(_LENGTH.size)
+            if not header:
+                return
+            if len(header) < _LENGTH.size:
+                raise ValueError(f"truncated record log: {path}")
+            (size,) = _LENGTH.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                raise ValueError(f"truncated record log: {path}")
+            yield data
+
+
+def read_records(path: str) -> Iterator[CompactRecord]:
+    """Stream the records of the log file, without loading the whole file."""
+    for data in read_encoded_records(path):
+        yield decode_record(data)
+
+
+class GameRecorder:
+    """Record the game from the events of `Game`, see `src.events`.
+
+    The record is written to the `writer` when the game is over, if given.
+    """
+
+    def __init__(
+        self, seed: Optional[int] = None, writer: Optional[RecordWriter] = None
+    ) -> None:
+        self._seed = seed
+        self._writer = writer
+        self._initial: Optional[CompactRecord] = None
+        self._actions = array(ACTION_TYPECODE)
+        self._winner = PLAYER_UNRESOLVED
+
+    def __call__(self, event: GameEvent) -> None:
+        if isinstance(event, (CardPlayed, GuileUsed)):
+            self._actions.append(encode_move(event.move))
+        elif isinstance(event, Passed):
+            self._actions.append(_PASS_ACTION)
+        elif isinstance(event, TurnStarted):
+            if self._initial is None and event.player == PLAYER_A:
+                self._initial = CompactRecord.from_state(event.state, seed=self._seed)
+        elif isinstance(event, GameOver):
+            self._winner = event.winner
+            if self._writer is not None:
+                self._writer.write(self.get_record())
+
+    def get_record(self) -> CompactRecord:
+        """Record of the game played so far."""
+        if self._initial is None:
+            raise ValueError("the game is not started yet")
+        return self._initial._replace(actions=self._actions, winner=self._winner)
+
+
+def _rank(permutation: bytes, offset: int) -> int:
+    """Rank of the permutation of the ids from `offset` in the factorial base."""
+    remaining = list(range(offset, offset + len(permutation)))
+    rank = 0
+    for card_id in permutation:
+        index = remaining.index(card_id)
+        rank = rank * len(remaining) + index
+        del remaining[index]
+    return rank
+
+
+def _unrank(rank: int, n: int, offset: int) -> bytes:
+    digits = []
+    for base in range(1, n + 1):
+        rank, digit = divmod(rank, base)
+        digits.append(digit)
+    remaining = list(range(offset, offset + n))
+    return bytes(remaining.pop(d) for d in reversed(digits))
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+_CARDS = [CardGenerator.from_id(i) for i in range(NUM_CARDS + NUM_TACTICS)]
+_PASS_ACTION = encode_move(Move(MoveKinds.PASS))
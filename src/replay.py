@@ -0,0 +1,144 @@
+"""Replay the recorded games, seeking to any move and extracting samples.
+
+The states are restored from the compact records (see `src.records`) by
+applying the actions from the deal. A Replay keeps the encoded state (see
+`encode_state`) every `interval` moves, so seeking to any move applies at most
+`interval` actions.
+"""
+
+import random
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from src.actions import apply_action, get_opponent
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.encoding import decode_state, encode_state
+from src.env import REWARD_DRAW, REWARD_LOSE, REWARD_WIN
+from src.gamestate import GameState
+from src.records import CompactRecord
+from src.resolver import resolve
+
+DEFAULT_SNAPSHOT_INTERVAL = 8
+
+
+class Sample(NamedTuple):
+    """A position of a recorded game and the action played on it.
+
+    outcome: final reward of the game for the player (see `src.env`).
+    """
+
+    state: GameState
+    player: int
+    action: int
+    outcome: float
+
+
+def get_outcome(player: int, winner: int) -> float:
+    if winner == PLAYER_UNRESOLVED:
+        return REWARD_DRAW
+    return REWARD_WIN if winner == player else REWARD_LOSE
+
+
+def get_player(move: int) -> int:
+    """Player of the move, since the players move alternately from PLAYER_A."""
+    return PLAYER_A if move % 2 == 0 else PLAYER_B
+
+
+class Replay:
+    """Seek the states of a recorded game.
+
+    The move `i` is the i-th action of the record, and the state of the move is
+    the one before the action (the final state for the number of the actions).
+    """
+
+    def __init__(
+        self, record: CompactRecord, interval: int = DEFAULT_SNAPSHOT_INTERVAL
+    ) -> None:
+        if interval <= 0:
+            raise ValueError(f"invalid interval: {interval}")
+        self._record = record
+        self._interval = interval
+        self._snapshots: List[bytes] = []
+        state = record.get_initial_state()
+        for i, action in enumerate(record.actions):
+            if i % interval == 0:
+                self._snapshots.append(encode_state(state))
+            apply_action(state, get_player(i), action)
+            resolve(state)
+        if len(record.actions) % interval == 0:
+            self._snapshots.append(encode_state(state))
+
+    def get_record(self) -> CompactRecord:
+        return self._record
+
+    def get_num_moves(self) -> int:
+        return len(self._record.actions)
+
+    def get_state(self, move: int) -> GameState:
+        """Restore the state of the move from the nearest snapshot before it."""
+        if not 0 <= move <= len(self._record.actions):
+            raise ValueError(f"invalid move: {move}")
+        start = move - move % self._interval
+        state = decode_state(self._snapshots[start // self._interval])
+        actions = self._record.actions
+        for i in range(start, move):
+            apply_action(state, get_player(i), actions[i])
+            resolve(state)
+        return state
+
+    def get_sample(self, move: int) -> Sample:
+        player = get_player(move)
+        return Sample(
+            self.get_state(move),
+            player,
+            self._record.actions[move],
+            get_outcome(player, self._record.winner),
+        )
+
+
+def iter_samples(
+    record: CompactRecord,
+    moves: Optional[Iterable[int]] = None,
+) -> Iterator[Sample]:
+    """Replay the game once, yielding the samples of the moves (all if None)."""
+    actions = record.actions
+    wanted = set(range(len(actions)) if moves is None else moves)
+    last = max(wanted, default=-1)
+    state = record.get_initial_state()
+    player = PLAYER_A
+    for i in range(last + 1):
+        if i in wanted:
+            outcome = get_outcome(player, record.winner)
+            yield Sample(state.clone(), player, actions[i], outcome)
+        apply_action(state, player, actions[i])
+        resolve(state)
+        player = get_opponent(player)
+
+
+def extract_samples(
+    records: Iterable[CompactRecord],
+    batch_size: int,
+    moves_per_game: Optional[int] = None,
+    rng: Optional[random.Random] = None,
+) -> Iterator[List[Sample]]:
+    """Extract the batches of the samples from the records (see `read_records`).
+
+    The records are streamed, replaying each game once. `moves_per_game` moves
+    are taken at random from each game if given, otherwise every move is.
+    The last batch may be smaller.
+    """
+    if batch_size <= 0:
+        raise ValueError(f"invalid batch size: {batch_size}")
+    rng = rng or random.Random()
+    batch: List[Sample] = []
+    for record in records:
+        moves: Optional[List[int]] = None
+        num_moves = len(record.actions)
+        if moves_per_game is not None and moves_per_game < num_moves:
+            moves = rng.sample(range(num_moves), moves_per_game)
+        for sample in iter_samples(record, moves):
+            batch.append(sample)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,305 @@
+"""Replay buffer of the training samples in a memory-mapped file.
+
+The buffer is a ring of fixed-size records, so it may be far larger than the
+memory and shared by the processes opening the same file. The appends are
+serialized by an exclusive lock of the file, and the samples are drawn under a
+shared one.
+
+Layout of the file:
+    header: magic, capacity, number of the appended records, maximum priority
+        and the exponent of the priorities
+    sum tree of the priorities (to the exponent), 2 * LEAVES doubles where
+        LEAVES is the capacity rounded up to a power of 2
+    records: observation (see `encode_observation`), legal mask packed by bits,
+        return as a float and the action as an unsigned short
+"""
+
+import fcntl
+import mmap
+import os
+import random
+import struct
+from array import array
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from src.actions import NUM_ACTIONS
+from src.encoding import OBSERVATION_SIZE, OBSERVATION_TYPECODE
+
+DEFAULT_ALPHA = 0.6
+DEFAULT_BETA = 0.4
+
+MASK_BYTES = (NUM_ACTIONS + 7) // 8
+
+_MAGIC = b"BLRB\x01\x00\x00\x00"
+_HEADER = struct.Struct("<8sQQdd")
+_HEADER_SIZE = 64
+_TAIL = struct.Struct("<fH")
+_MASK_OFFSET = OBSERVATION_SIZE
+_TAIL_OFFSET = _MASK_OFFSET + MASK_BYTES
+RECORD_SIZE = (_TAIL_OFFSET + _TAIL.size + 7) // 8 * 8
+
+
+class Batch(NamedTuple):
+    """Samples drawn from the buffer.
+
+    The observations and the masks view the mapped file without copying, so
+    they are overwritten once the ring wraps around over them.
+    weights: importance-sampling weights of the prioritized samples, normalized
+        by the largest one (all 1.0 for the uniform samples).
+    """
+
+    indices: array
+    observations: List[memoryview]
+    masks: List[memoryview]
+    actions: array
+    returns: array
+    weights: array
+
+
+def pack_mask(mask: Sequence[int]) -> bytearray:
+    """Pack the legal mask of NUM_ACTIONS flags into bits."""
+    packed = bytearray(MASK_BYTES)
+    data = bytes(mask)
+    action = data.find(1)
+    while action >= 0:
+        packed[action >> 3] |= 1 << (action & 7)
+        action = data.find(1, action + 1)
+    return packed
+
+
+def unpack_mask(packed: Sequence[int]) -> bytearray:
+    """Unpack the legal mask packed by `pack_mask`."""
+    mask = bytearray(NUM_ACTIONS)
+    for i, byte in enumerate(packed):
+        while byte:
+            bit = byte & -byte
+            mask[i * 8 + bit.bit_length() - 1] = 1
+            byte ^= bit
+    return mask
+
+
+def encode_sample(
+    observation: Sequence[int], action: int, mask: Sequence[int], ret: float
+) -> bytearray:
+    """Encode the sample into a record of RECORD_SIZE bytes."""
+    if len(observation) != OBSERVATION_SIZE:
+        raise ValueError(f"invalid observation size: {len(observation)}")
+    if not 0 <= action < NUM_ACTIONS:
+        raise ValueError(f"invalid action: {action}")
+    record = bytearray(RECORD_SIZE)
+    record[:_MASK_OFFSET] = array(OBSERVATION_TYPECODE, observation).tobytes()
+    record[_MASK_OFFSET:_TAIL_OFFSET] = pack_mask(mask)
+    _TAIL.pack_into(record, _TAIL_OFFSET, ret, action)
+    return record
+
+
+def decode_sample(record: memoryview) -> Tuple[memoryview, memoryview, int, float]:
+    """Observation, packed mask, action and return viewing the record."""
+    ret, action = _TAIL.unpack_from(record, _TAIL_OFFSET)
+    observation = record[:_MASK_OFFSET].cast(OBSERVATION_TYPECODE)
+    return observation, record[_MASK_OFFSET:_TAIL_OFFSET], action, ret
+
+
+class ReplayBuffer:
+    """Ring buffer of the samples mapped from the file at the path.
+
+    The file is created with the `capacity` and the exponent `alpha` of the
+    priorities if missing, otherwise they are read from it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        capacity: Optional[int] = None,
+        alpha: float = DEFAULT_ALPHA,
+    ) -> None:
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if exists:
+                header = os.pread(self._fd, _HEADER.size, 0)
+                magic, stored, _, _, alpha = _HEADER.unpack(header)
+                if magic != _MAGIC:
+                    raise ValueError(f"not a replay buffer: {path}")
+                if capacity is not None and capacity != stored:
+                    raise ValueError(f"capacity {stored} of the buffer: {capacity}")
+                capacity = stored
+            elif capacity is None or capacity <= 0:
+                raise ValueError(f"invalid capacity: {capacity}")
+            self._capacity = capacity
+            self._leaves = 1 << max(capacity - 1, 0).bit_length()
+            self._records_offset = _HEADER_SIZE + self._leaves * 2 * 8
+            size = self._records_offset + capacity * RECORD_SIZE
+            if not exists:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, capacity, 0, 1.0, alpha), 0)
+            self._mmap = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._view = memoryview(self._mmap)
+        self._tree = self._view[_HEADER_SIZE : self._records_offset].cast("d")
+        self._alpha = alpha
+
+    def get_capacity(self) -> int:
+        return self._capacity
+
+    def get_alpha(self) -> float:
+        return self._alpha
+
+    def get_num_appended(self) -> int:
+        """Number of the records appended since the creation of the file."""
+        return _HEADER.unpack_from(self._mmap)[2]
+
+    def __len__(self) -> int:
+        return min(self.get_num_appended(), self._capacity)
+
+    def append(
+        self,
+        observation: Sequence[int],
+        action: int,
+        mask: Sequence[int],
+        ret: float,
+        priority: Optional[float] = None,
+    ) -> int:
+        """Append the sample, overwriting the oldest one when full.
+
+        The sample gets the maximum priority so far unless given, so every new
+        sample is drawn at least once with a high probability.
+
+        Returns:
+            int - index of the record
+        """
+        return self.append_encoded(
+            encode_sample(observation, action, mask, ret), priority
+        )
+
+    def append_encoded(self, record: bytes, priority: Optional[float] = None) -> int:
+        """Append the sample encoded by `encode_sample`."""
+        if len(record) != RECORD_SIZE:
+            raise ValueError(f"invalid record size: {len(record)}")
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            magic, capacity, head, max_priority, alpha = _HEADER.unpack_from(self._mmap)
+            index = head % capacity
+            offset = self._records_offset + index * RECORD_SIZE
+            self._view[offset : offset + RECORD_SIZE] = record
+            if priority is None:
+                priority = max_priority
+            max_priority = max(max_priority, priority)
+            self._set_priority(index, priority)
+            _HEADER.pack_into(
+                self._mmap, 0, magic, capacity, head + 1, max_priority, alpha
+            )
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return index
+
+    def update_priorities(
+        self, indices: Sequence[int], priorities: Sequence[float]
+    ) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            magic, capacity, head, max_priority, alpha = _HEADER.unpack_from(self._mmap)
+            for index, priority in zip(indices, priorities):
+                if not 0 <= index < min(head, capacity):
+                    raise ValueError(f"invalid index: {index}")
+                self._set_priority(index, priority)
+                max_priority = max(max_priority, priority)
+            _HEADER.pack_into(self._mmap, 0, magic, capacity, head, max_priority, alpha)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get_priority(self, index: int) -> float:
+        """Priority of the record to the exponent alpha."""
+        return self._tree[self._leaves + index]
+
+    def _set_priority(self, index: int, priority: float) -> None:
+        tree = self._tree
+        node = self._leaves + index
+        delta = priority**self._alpha - tree[node]
+        while node:
+            tree[node] += delta
+            node >>= 1
+
+    def _find(self, value: float) -> int:
+        """Index of the record where the prefix sum of the priorities reaches."""
+        tree = self._tree
+        node = 1
+        while node < self._leaves:
+            node <<= 1
+            if value >= tree[node]:
+                value -= tree[node]
+                node += 1
+        return node - self._leaves
+
+    def sample(
+        self,
+        batch_size: int,
+        rng: Optional[random.Random] = None,
+        prioritized: bool = False,
+        beta: float = DEFAULT_BETA,
+    ) -> Batch:
+        """Draw the samples uniformly, or in proportion to the priorities.
+
+        The prioritized samples are weighted by (N * P(i)) ** -beta.
+        """
+        rng = rng or random.Random()
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+        try:
+            size = len(self)
+            if size == 0:
+                raise ValueError("the buffer is empty")
+            indices = array("q")
+            weights = array("d")
+            if prioritized:
+                total = self._tree[1]
+                for _ in range(batch_size):
+                    index = min(self._find(rng.random() * total), size - 1)
+                    indices.append(index)
+                    weights.append((size * self.get_priority(index) / total) ** -beta)
+                largest = max(weights)
+                for i, w in enumerate(weights):
+                    weights[i] = w / largest
+            else:
+                indices.extend(rng.randrange(size) for _ in range(batch_size))
+                weights.extend([1.0] * batch_size)
+            return self._get_batch(indices, weights)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _get_batch(self, indices: array, weights: array) -> Batch:
+        view = self._view
+        observations = []
+        masks = []
+        actions = array("H")
+        returns = array("f")
+        for index in indices:
+            offset = self._records_offset + index * RECORD_SIZE
+            observation, mask, action, ret = decode_sample(
+                view[offset : offset + RECORD_SIZE]
+            )
+            observations.append(observation)
+            masks.append(mask)
+            actions.append(action)
+            returns.append(ret)
+        return Batch(indices, observations, masks, actions, returns, weights)
+
+    def flush(self) -> None:
+        self._mmap.flush()
+
+    def close(self) -> None:
+        """Close the mapping, the views of the batches must be released before."""
+        if self._fd < 0:
+            return
+        self._tree.release()
+        self._view.release()
+        self._mmap.close()
+        os.close(self._fd)
+        self._fd = -1
+
+    def __enter__(self) -> "ReplayBuffer":
+        return self
+
+    def __exit__(self, *_args) -> None:
+        self.close()
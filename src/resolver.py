@@ -4,19 +4,45 @@ import itertools
 from itertools import chain
 from typing import Collection, Iterable, List, Optional, Tuple
 
+from src import profiling
 from src.cards.cards import TacticMoraleCard, TroopAndTacticMoraleCard, TroopCard
-from src.cards.cardtypes import TacticMorales, TroopColors
+from src.cards.cardtypes import Formations, TacticMorales, TroopColors
 from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
 from src.flag import Flag
 from src.gamestate import GameState
 
+RESOLVER_USED_TROOPS_CACHE = "resolver.used_troops"
 
-def resolve(state: GameState) -> None:
-    used_cards = aggregate_used_troops(state)
+
+def resolve(
+    state: GameState, used_cards: Optional[Collection[TroopCard]] = None
+) -> None:
+    """Resolve the flags which could not be taken back.
+
+    Args:
+        used_cards - troops deployed on the flags or discarded, collected from
+            the state if not given (see `CardTracker.get_used_troops`)
+
+    The used troops are collected at most once and shared by the flags, which is
+    counted as the cache RESOLVER_USED_TROOPS_CACHE when profiled.
+    """
+    profile = profiling.is_enabled()
     for flag in state.get_flags():
         if flag.is_resolved():
             # already resolved
             continue
+        n_cards = flag.get_required_card_num()
+        if (
+            len(flag.get_stacked_cards(PLAYER_A)) < n_cards
+            and len(flag.get_stacked_cards(PLAYER_B)) < n_cards
+        ):
+            # flag could not be resolved until either side completes the formation
+            continue
+        if profile:
+            hit = used_cards is not None
+            profiling.add_cache_access(RESOLVER_USED_TROOPS_CACHE, hit)
+        if used_cards is None:
+            used_cards = aggregate_used_troops(state)
         resolve = check_resolvable_for_single_flag(flag, used_cards)
         # resolve flag
         if resolve != PLAYER_UNRESOLVED:
@@ -35,7 +61,11 @@ def aggregate_used_troops(state: GameState) -> List[TroopCard]:
     ops = chain.from_iterable(
         [state.get_operations(PLAYER_A), state.get_operations(PLAYER_B)]
     )
-    discards = [t for t in [op.get_discarded_troop_card() for op in ops] if t]
+    discards = [
+        t
+        for t in [op.get_discarded_troop_card() for op in ops]
+        if isinstance(t, TroopCard)
+    ]
     cards.extend(discards)
     return cards
 
@@ -76,16 +106,44 @@ def check_resolvable_for_single_flag(
     return PLAYER_UNRESOLVED
 
 
+def get_formation(flag: Flag, player: int) -> Optional[Formations]:
+    """Formation completed by the player on the flag.
+
+    None if the stack of the player is not completed.
+    """
+    stack = flag.get_stacked_cards(player)
+    n_cards = flag.get_required_card_num()
+    if len(stack) < n_cards:
+        return None
+    if flag.is_formation_disabled():
+        return Formations.HOST
+    for formation, resolver in _FORMATION_RESOLVERS:
+        _, completed = resolver(stack, n_cards, ())
+        if completed:
+            return formation
+    return Formations.HOST
+
+
+def is_formation_completed(
+    stacked_cards: Collection[TroopAndTacticMoraleCard],
+    n_cards: int,
+    formation: Formations,
+) -> bool:
+    """Whether the stacked cards complete the formation."""
+    _, completed = _POSSIBLE_MAXIMUM_STRENGTHS[formation](stacked_cards, n_cards, ())
+    return completed
+
+
 def possible_maximum_strength_for_wedge(
     stacked_cards: Collection[TroopAndTacticMoraleCard],
     n_cards: int,
     used_cards: Collection[TroopCard],
 ) -> Tuple[int, bool]:
     """Cards have the same color and consecutive values."""
-    have_same_color, color = _check_same_color_in_stack(stacked_cards)
+    have_same_color, color = check_same_color_in_stack(stacked_cards)
     if not have_same_color:  # have different colors
         return 0, False
-    strength, result, cand_tuples = _check_consecutive_formation(stacked_cards, n_cards)
+    strength, result, cand_tuples = check_consecutive_formation(stacked_cards, n_cards)
     if strength is not None:  # strength is fixed
         return strength, result
     for c in used_cards:
@@ -163,7 +221,7 @@ def possible_maximum_strength_for_battalion(
 ) -> Tuple[int, bool]:
     """Cards have the same color."""
     # check all cards have the same colors
-    have_same_color, color = _check_same_color_in_stack(stacked_cards)
+    have_same_color, color = check_same_color_in_stack(stacked_cards)
     if not have_same_color:
         # not eligible for batalion
         return 0, False
@@ -189,7 +247,7 @@ def possible_maximum_strength_for_skirmish(
     used_cards: Collection[TroopCard],
 ) -> Tuple[int, bool]:
     """Cards have the consecutive values(with any colors)."""
-    strength, result, cand_tuples = _check_consecutive_formation(stacked_cards, n_cards)
+    strength, result, cand_tuples = check_consecutive_formation(stacked_cards, n_cards)
     if strength is not None:  # strength is fixed
         return strength, result
     # check volatiled numbers
@@ -225,7 +283,7 @@ def possible_maximum_strength_for_host(
     return max_str_com + cur_value, False
 
 
-def _check_consecutive_formation(
+def check_consecutive_formation(
     stacked_cards: Collection[TroopAndTacticMoraleCard], n_cards: int
 ) -> Tuple[Optional[int], bool, List[Tuple[int, List[int]]]]:
     """Check cards have the consecutive values.
@@ -356,9 +414,15 @@ def _calculate_strength_of_stack(
     return value
 
 
-def _check_same_color_in_stack(
+def check_same_color_in_stack(
     stack: Collection[TroopAndTacticMoraleCard],
 ) -> Tuple[bool, Optional[TroopColors]]:
+    """Check the troops have the same color.
+
+    Returns:
+        bool - whether the troops have the same color (the morales are wild)
+        Optional[TroopColors] - the color, None if no troop is stacked
+    """
     card_color: Optional[TroopColors] = None
 
     # check troop cards
@@ -382,3 +446,13 @@ def _check_same_color_in_stack(
 def _iterate_consecutive_candidates_number(n_cards: int) -> Iterable[List[int]]:
     for i in reversed(range(1, 12 - n_cards)):
         yield list(range(i, i + n_cards))
+
+
+_FORMATION_RESOLVERS = [
+    (Formations.WEDGE, possible_maximum_strength_for_wedge),
+    (Formations.PHALANX, possible_maximum_strength_for_phalanx),
+    (Formations.BATTALION_ORDER, possible_maximum_strength_for_battalion),
+    (Formations.SKIRMISH_LINE, possible_maximum_strength_for_skirmish),
+]
+_POSSIBLE_MAXIMUM_STRENGTHS = dict(_FORMATION_RESOLVERS)
+_POSSIBLE_MAXIMUM_STRENGTHS[Formations.HOST] = possible_maximum_strength_for_host
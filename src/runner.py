@@ -0,0 +1,285 @@
+"""Headless runner to play many games between automated players."""
+
+import importlib
+import multiprocessing
+import random
+import time
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from src import metrics
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_IDS, PLAYER_UNRESOLVED
+from src.database import ClaimTurnObserver, FlagClaim, GameDatabase, get_flag_claims
+from src.events import Observer
+from src.game import Game
+from src.gamestate import GameState
+from src.players.greedyplayer import GreedyPlayer
+from src.players.humanplayer import HumanPlayer
+from src.players.mctsplayer import ISMCTSPlayer
+from src.players.player import Player
+from src.players.randomplayer import RandomPlayer
+from src.records import GameRecorder, RecordWriter, encode_record
+
+DEFAULT_MAX_TURNS = 100
+
+PLAYER_TYPES: Dict[str, Type[Player]] = {
+    "human": HumanPlayer,
+    "random": RandomPlayer,
+    "greedy": GreedyPlayer,
+    "ismcts": ISMCTSPlayer,
+}
+
+
+def get_player_type(name: str) -> Type[Player]:
+    """Find the player type by the registered name or by `module.path:ClassName`."""
+    if name in PLAYER_TYPES:
+        return PLAYER_TYPES[name]
+    module_name, sep, class_name = name.partition(":")
+    if not sep:
+        raise ValueError(f"unknown player type: {name}")
+    player_type = getattr(importlib.import_module(module_name), class_name, None)
+    if not isinstance(player_type, type) or not issubclass(player_type, Player):
+        raise ValueError(f"not a player type: {name}")
+    return player_type
+
+
+class GameResult(NamedTuple):
+    """Result of a game, with the record (see `encode_record`) if recorded.
+
+    claims: flags claimed in the game, if collected for the database.
+    """
+
+    index: int
+    winner: int
+    turns: int
+    record: Optional[bytes] = None
+    claims: Tuple[FlagClaim, ...] = ()
+
+
+class RunnerStats:
+    def __init__(self) -> None:
+        self._games = 0
+        self._wins = [0 for _ in PLAYER_IDS]
+        self._draws = 0
+        self._turns = 0
+        self._started = time.perf_counter()
+
+    def add(self, result: GameResult) -> None:
+        self._games += 1
+        self._turns += result.turns
+        if result.winner == PLAYER_UNRESOLVED:
+            self._draws += 1
+        else:
+            self._wins[result.winner] += 1
+
+    def get_games(self) -> int:
+        return self._games
+
+    def get_elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def get_games_per_sec(self) -> float:
+        elapsed = self.get_elapsed()
+        return self._games / elapsed if elapsed > 0 else 0.0
+
+    def get_average_turns(self) -> float:
+        return self._turns / self._games if self._games else 0.0
+
+    def get_win_rate(self, player: int) -> float:
+        return self._wins[player] / self._games if self._games else 0.0
+
+    def get_draw_rate(self) -> float:
+        return self._draws / self._games if self._games else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"games: {self._games} ({self.get_games_per_sec():.1f} games/sec), "
+            f"turns: {self.get_average_turns():.1f}, "
+            f"win rates: A {self.get_win_rate(PLAYER_A):.3f}"
+            f" / B {self.get_win_rate(PLAYER_B):.3f}"
+            f" / draw {self.get_draw_rate():.3f}"
+        )
+
+
+def play_game(
+    player_types: Tuple[str, str],
+    seed: Optional[int] = None,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    observers: Iterable[Observer] = (),
+) -> Tuple[int, int]:
+    """Play a single game without any terminal output.
+
+    The global random generator is seeded as well when the seed is given, so the
+    players drawing from it play reproducibly.
+    The `observers` are given the events of the game (see `Game`).
+
+    Returns:
+        Tuple[int, int] - the winner (PLAYER_UNRESOLVED for a draw by the turn
+            limit or by the passes) and the turn length of the game.
+    """
+    game = _run_game(player_types, seed, max_turns, observers)
+    return game.get_winner(), game.get_turn_length()
+
+
+def _run_game(
+    player_types: Tuple[str, str],
+    seed: Optional[int],
+    max_turns: int,
+    observers: Iterable[Observer],
+) -> Game:
+    if seed is not None:
+        random.seed(seed)
+    players = (
+        get_player_type(player_types[PLAYER_A])(PLAYER_A),
+        get_player_type(player_types[PLAYER_B])(PLAYER_B),
+    )
+    game = Game(
+        GameState.new(random.Random(seed)),
+        players,
+        verbose=False,
+        observers=observers,
+    )
+    while not game.is_over() and game.get_turn_length() < max_turns:
+        game.run()
+    if metrics.is_enabled():
+        metrics.observe_game()
+    return game
+
+
+def _play_indexed_game(
+    args: Tuple[int, Tuple[str, str], Optional[int], int, bool, bool],
+) -> GameResult:
+    index, player_types, seed, max_turns, record, claims = args
+    if not record and not claims:
+        winner, turns = play_game(player_types, seed, max_turns)
+        return GameResult(index, winner, turns)
+    observers: List[Observer] = []
+    recorder = GameRecorder(seed)
+    claim_turns = ClaimTurnObserver()
+    if record:
+        observers.append(recorder)
+    if claims:
+        observers.append(claim_turns)
+    game = _run_game(player_types, seed, max_turns, observers)
+    return GameResult(
+        index,
+        game.get_winner(),
+        game.get_turn_length(),
+        encode_record(recorder.get_record()) if record else None,
+        get_flag_claims(game.get_state(), claim_turns.get_turns()) if claims else (),
+    )
+
+
+def run_games(
+    player_types: Tuple[str, str],
+    num_games: int,
+    num_workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    report_interval: float = 1.0,
+    on_report: Optional[Callable[[RunnerStats], None]] = None,
+    on_result: Optional[Callable[[GameResult], None]] = None,
+    record_path: Optional[str] = None,
+    db_path: Optional[str] = None,
+) -> RunnerStats:
+    """Play games across the process pool and aggregate the results.
+
+    The game i is seeded with `seed + i`, so the whole run is reproducible
+    regardless of the number of workers.
+
+    Args:
+        player_types - names of the players (see `get_player_type`) for A and B
+        num_workers - size of the process pool, games run in process if 1
+        on_report - called with the stats every `report_interval` seconds
+        on_result - called with the result of each game as it finishes
+        record_path - log file to append the records of the games as they
+            finish (see `src.records`)
+        db_path - SQLite database to store the results and the claims of the
+            games in (see `src.database`)
+    """
+    for name in player_types:
+        # fail fast before spawning workers
+        get_player_type(name)
+    tasks = [
+        (
+            i,
+            player_types,
+            None if seed is None else seed + i,
+            max_turns,
+            record_path is not None,
+            db_path is not None,
+        )
+        for i in range(num_games)
+    ]
+    stats = RunnerStats()
+    writer = None if record_path is None else RecordWriter(record_path)
+    database = None if db_path is None else GameDatabase(db_path)
+    if database is not None:
+        on_result = _store_results(database, player_types, seed, on_result)
+    try:
+        if num_workers == 1:
+            results: Iterable[GameResult] = map(_play_indexed_game, tasks)
+            _collect(results, stats, report_interval, on_report, on_result, writer)
+            return stats
+        num_workers = num_workers or multiprocessing.cpu_count()
+        chunksize = max(1, num_games // (num_workers * 8))
+        with multiprocessing.Pool(num_workers) as pool:
+            results = pool.imap_unordered(_play_indexed_game, tasks, chunksize)
+            _collect(results, stats, report_interval, on_report, on_result, writer)
+    finally:
+        if writer is not None:
+            writer.close()
+        if database is not None:
+            database.close()
+    return stats
+
+
+def _store_results(
+    database: GameDatabase,
+    player_types: Tuple[str, str],
+    seed: Optional[int],
+    on_result: Optional[Callable[[GameResult], None]],
+) -> Callable[[GameResult], None]:
+    def store(result: GameResult) -> None:
+        database.add_game(
+            player_types,
+            result.winner,
+            result.turns,
+            result.claims,
+            None if seed is None else seed + result.index,
+        )
+        if on_result is not None:
+            on_result(result)
+
+    return store
+
+
+def _collect(
+    results: Iterable[GameResult],
+    stats: RunnerStats,
+    report_interval: float,
+    on_report: Optional[Callable[[RunnerStats], None]],
+    on_result: Optional[Callable[[GameResult], None]],
+    writer: Optional[RecordWriter] = None,
+) -> None:
+    last_report = time.perf_counter()
+    for result in results:
+        stats.add(result)
+        if writer is not None and result.record is not None:
+            writer.write_encoded(result.record)
+        if on_result is not None:
+            on_result(result)
+        if (
+            on_report is not None
+            and time.perf_counter() - last_report >= report_interval
+        ):
+            last_report = time.perf_counter()
+            on_report(stats)
@@ -0,0 +1,162 @@
+"""Sample the hidden information of the game from the view of a player."""
+
+import copy
+import random
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from src.actions import get_opponent
+from src.cards.cards import Card, CardGenerator, TacticCard, TroopCard
+from src.cards.decks import Deck, TacticsDeck, TroopsDeck
+from src.consts import PLAYER_IDS
+from src.gamestate import GameState
+from src.tracker import CardTracker
+
+SAMPLE_TYPECODE = "B"
+
+
+def get_unseen_cards(
+    state: GameState, player: int
+) -> Tuple[List[TroopCard], List[TacticCard]]:
+    """Collect the cards the player could not see.
+
+    They are the cards either in the opposite hands or in the decks, except the
+    cards the player put back on the decks by the scout.
+    """
+    return CardTracker.from_state(state, player).get_unseen_cards()
+
+
+class DeterminizationSampler:
+    """Sample the hidden cards consistently with the view of the player.
+
+    The opposite hands keep the number of troops and tactics cards, since the
+    backs of the cards are visible to the player, and the decks keep their sizes.
+    The cards the player put back on the decks stay at their known positions.
+
+    A sample is an array of card ids: the opposite hands, then the troops deck
+    and the tactics deck from the bottom. The unseen cards are collected once
+    by the constructor, so many samples are drawn with little allocation.
+
+    The unseen cards are taken from the `tracker` of the player kept along the
+    game if given, instead of scanning the state. The cards the tracker knows
+    to be drawn by the opponent stay in the opposite hands.
+    """
+
+    def __init__(
+        self, state: GameState, player: int, tracker: Optional[CardTracker] = None
+    ) -> None:
+        if tracker is None:
+            tracker = CardTracker.from_state(state, player)
+        elif tracker.get_player() != player:
+            raise ValueError(f"tracker of the player {tracker.get_player()}")
+        self._state = state
+        self._player = player
+        opponent = get_opponent(player)
+        troops, tactics = tracker.get_unseen_cards()
+        opposite_hands = state.get_hands(opponent)
+        self._hand_troops = sum(1 for c in opposite_hands if isinstance(c, TroopCard))
+        self._hand_tactics = len(opposite_hands) - self._hand_troops
+        # the known cards beyond the opposite hands are dealt as the unseen ones
+        known = tracker.get_opposite_known_cards(state)
+        known_troops = [c for c in known if isinstance(c, TroopCard)]
+        known_tactics = [c for c in known if isinstance(c, TacticCard)]
+        troops += known_troops[self._hand_troops :]
+        tactics += known_tactics[self._hand_tactics :]
+        self._known_troops = array(
+            SAMPLE_TYPECODE,
+            [c.get_card_id() for c in known_troops[: self._hand_troops]],
+        )
+        self._known_tactics = array(
+            SAMPLE_TYPECODE,
+            [c.get_card_id() for c in known_tactics[: self._hand_tactics]],
+        )
+        self._troops = array(SAMPLE_TYPECODE, [c.get_card_id() for c in troops])
+        self._tactics = array(SAMPLE_TYPECODE, [c.get_card_id() for c in tactics])
+        self._troops_deck = self._get_layout(state.get_troops_deck())
+        self._tactics_deck = self._get_layout(state.get_tactics_deck())
+        self._size = len(opposite_hands) + len(self._troops_deck[0])
+        self._size += len(self._tactics_deck[0])
+
+    def _get_layout(self, deck: Deck) -> Tuple[array, List[int]]:
+        """Card ids of the deck with 0xFF at the unknown positions."""
+        layout = array(SAMPLE_TYPECODE, [_UNKNOWN] * len(deck))
+        for i, c in deck.get_known_cards(self._player).items():
+            layout[i] = c.get_card_id()
+        return layout, [i for i, c in enumerate(layout) if c == _UNKNOWN]
+
+    def get_sample_size(self) -> int:
+        return self._size
+
+    def sample_indices(self, rng: random.Random, out: Optional[array] = None) -> array:
+        """Sample the card ids of the hidden cards, writing into `out` if given."""
+        troops = self._troops
+        tactics = self._tactics
+        rng.shuffle(troops)
+        rng.shuffle(tactics)
+        if out is None:
+            out = array(SAMPLE_TYPECODE, bytes(self._size))
+        known_troops = self._known_troops
+        known_tactics = self._known_tactics
+        # the numbers of the unseen cards dealt to the opposite hands
+        n_troops = self._hand_troops - len(known_troops)
+        n_tactics = self._hand_tactics - len(known_tactics)
+        pos = len(known_troops)
+        out[:pos] = known_troops
+        out[pos : pos + n_troops] = troops[:n_troops]
+        pos += n_troops
+        out[pos : pos + len(known_tactics)] = known_tactics
+        pos += len(known_tactics)
+        out[pos : pos + n_tactics] = tactics[:n_tactics]
+        pos += n_tactics
+        for (layout, unknown), pool, start in (
+            (self._troops_deck, troops, n_troops),
+            (self._tactics_deck, tactics, n_tactics),
+        ):
+            out[pos : pos + len(layout)] = layout
+            for i, j in enumerate(unknown):
+                out[pos + j] = pool[start + i]
+            pos += len(layout)
+        return out
+
+    def sample_batch(self, num: int, rng: random.Random) -> List[array]:
+        return [self.sample_indices(rng) for _ in range(num)]
+
+    def build(self, sample: Sequence[int]) -> GameState:
+        """Build the state from the sampled card ids."""
+        state = self._state
+        opponent = get_opponent(self._player)
+        n_hands = self._hand_troops + self._hand_tactics
+        n_troops = len(self._troops_deck[0])
+        hands = [list(state.get_hands(p)) for p in PLAYER_IDS]
+        hands[opponent] = sorted(_CARDS[i] for i in sample[:n_hands])
+        troops = [_CARDS[i] for i in sample[n_hands : n_hands + n_troops]]
+        tactics = [_CARDS[i] for i in sample[n_hands + n_troops :]]
+        return GameState(
+            TroopsDeck(troops, dict(state.get_troops_deck().get_known())),
+            TacticsDeck(tactics, dict(state.get_tactics_deck().get_known())),
+            copy.deepcopy(list(state.get_flags())),
+            [list(state.get_operations(p)) for p in PLAYER_IDS],
+            hands,
+            state.get_played_tactics(),
+            state.get_played_leaders(),
+        )
+
+    def sample(self, rng: random.Random) -> GameState:
+        return self.build(self.sample_indices(rng))
+
+
+def determinize(state: GameState, player: int, rng: random.Random) -> GameState:
+    """Clone the state, re-dealing the unseen cards at random.
+
+    See DeterminizationSampler to draw many samples of the same state.
+    """
+    return DeterminizationSampler(state, player).sample(rng)
+
+
+_UNKNOWN = 0xFF
+_CARDS: List[Card] = [
+    *CardGenerator.troops(),
+    *CardGenerator.tactics(),
+]
+_ALL_CARD_IDS = [c.get_card_id() for c in _CARDS]
+assert _ALL_CARD_IDS == list(range(len(_CARDS)))
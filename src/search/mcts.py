@@ -0,0 +1,310 @@
+"""Information Set Monte Carlo Tree Search.
+
+Single observer ISMCTS: each iteration samples the hidden cards (the opposite
+hands and the order of the decks) consistently with the view of the searching
+player, then walks down a single tree shared by all the determinizations.
+"""
+
+import math
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.actions import (
+    Move,
+    apply_action,
+    apply_move,
+    decode_action,
+    get_opponent,
+    legal_actions,
+)
+from src.consts import PLAYER_A, PLAYER_UNRESOLVED
+from src.encoding import get_state_hash
+from src.gamestate import GameState
+from src.resolver import resolve
+from src.search.determinize import DeterminizationSampler
+from src.search.nodestore import DEFAULT_MAX_MEMORY, NO_NODE, NodeStore
+from src.search.transposition import NO_ENTRY, TranspositionTable
+from src.tracker import CardTracker
+
+DEFAULT_EXPLORATION = 0.7
+DEFAULT_MAX_ROLLOUT_MOVES = 200
+
+RolloutPolicy = Callable[[GameState, int, random.Random], int]
+
+
+def random_rollout_policy(state: GameState, player: int, rng: random.Random) -> int:
+    return rng.choice(legal_actions(state, player))
+
+
+def get_reward(player: int, winner: int) -> float:
+    if winner == PLAYER_UNRESOLVED:
+        return 0.5
+    return 1.0 if winner == player else 0.0
+
+
+def rollout(
+    state: GameState,
+    player: int,
+    policy: RolloutPolicy,
+    rng: random.Random,
+    max_moves: int = DEFAULT_MAX_ROLLOUT_MOVES,
+) -> int:
+    """Play the game out in place by the policy, returning the winner.
+
+    The used troops are counted along the moves, so the flags are resolved
+    without collecting them from the state every move.
+    """
+    tracker = CardTracker.from_state(state)
+    used_cards = tracker.get_used_troops()
+    for _ in range(max_moves):
+        move = decode_action(policy(state, player, rng))
+        apply_move(state, player, move)
+        tracker.observe_move(player, move)
+        resolve(state, used_cards)
+        winner = state.get_winner()
+        if winner != PLAYER_UNRESOLVED:
+            return winner
+        player = get_opponent(player)
+    return PLAYER_UNRESOLVED
+
+
+class ISMCTS:
+    def __init__(
+        self,
+        player: int,
+        exploration: float = DEFAULT_EXPLORATION,
+        max_rollout_moves: int = DEFAULT_MAX_ROLLOUT_MOVES,
+        rollout_policy: RolloutPolicy = random_rollout_policy,
+        rng: Optional[random.Random] = None,
+        max_memory: Optional[int] = DEFAULT_MAX_MEMORY,
+        transpositions: Optional[TranspositionTable] = None,
+    ) -> None:
+        """Initialize the search.
+
+        Args:
+            max_memory - memory limit of the tree in bytes, the least visited
+                subtrees are evicted beyond it (no limit if None)
+            transpositions - table to share the statistics of the nodes
+                reaching the same public state by different orders of the moves
+        """
+        self._player = player
+        self._exploration = exploration
+        self._max_rollout_moves = max_rollout_moves
+        self._rollout_policy = rollout_policy
+        self._rng = rng or random.Random(random.getrandbits(64))
+        self._store = NodeStore(max_memory)
+        self._transpositions = transpositions
+        self._sampler: Optional[DeterminizationSampler] = None
+        self._sampled_state: Optional[GameState] = None
+        self._tracker: Optional[CardTracker] = None
+        self._root = self._store.new_node(NO_NODE, get_opponent(player))
+        self._playouts = 0
+        self._elapsed = 0.0
+        self._total_playouts = 0
+        self._total_elapsed = 0.0
+
+    def get_store(self) -> NodeStore:
+        return self._store
+
+    def get_transpositions(self) -> Optional[TranspositionTable]:
+        return self._transpositions
+
+    def get_root(self) -> int:
+        return self._root
+
+    def reset(self) -> None:
+        self._store.clear()
+        self._root = self._store.new_node(NO_NODE, get_opponent(self._player))
+
+    def advance(self, action: int) -> None:
+        """Keep the subtree of the action played, discarding the others."""
+        store = self._store
+        child = store.find_child(self._root, action)
+        if child == NO_NODE:
+            player = get_opponent(store.player[self._root])
+            store.clear()
+            self._root = store.new_node(action, player)
+            return
+        store.detach(child)
+        store.free_subtree(self._root)
+        self._root = child
+
+    def search(
+        self,
+        state: GameState,
+        iterations: Optional[int] = None,
+        deadline: Optional[float] = None,
+        tracker: Optional[CardTracker] = None,
+    ) -> Move:
+        """Search the best move of the player from the state.
+
+        The search stops when either `iterations` playouts are done or the
+        `deadline` (in terms of `time.perf_counter`) is passed.
+        At least one iteration is always done.
+        The hidden cards are sampled from the cards unseen by the `tracker` of
+        the player if given (see `DeterminizationSampler`).
+        """
+        assert iterations is not None or deadline is not None
+        started = time.perf_counter()
+        self._sampler = None
+        self._tracker = tracker
+        playouts = 0
+        while True:
+            playouts += self._iterate_batch(state)
+            if iterations is not None and playouts >= iterations:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        self._record(playouts, time.perf_counter() - started)
+        return decode_action(self.get_best_action(state))
+
+    def _record(self, playouts: int, elapsed: float) -> None:
+        self._playouts = playouts
+        self._elapsed = elapsed
+        self._total_playouts += playouts
+        self._total_elapsed += elapsed
+
+    def _iterate_batch(self, state: GameState) -> int:
+        """Run the playouts of a step of the search, returning the count."""
+        self._store.reserve(1, self._root)
+        self._iterate(state)
+        return 1
+
+    def get_best_action(self, state: GameState) -> int:
+        actions = legal_actions(state, self._player)
+        children = self._store.get_children(self._root)
+        visits = self._store.visits
+        return max(actions, key=lambda a: visits[children[a]] if a in children else -1)
+
+    def get_visit_counts(self) -> Dict[int, int]:
+        visits = self._store.visits
+        return {a: visits[n] for a, n in self._store.get_children(self._root).items()}
+
+    def get_playouts(self) -> int:
+        return self._playouts
+
+    def get_playouts_per_sec(self) -> float:
+        """Playouts per second of the last search."""
+        return self._playouts / self._elapsed if self._elapsed > 0 else 0.0
+
+    def get_total_playouts_per_sec(self) -> float:
+        if self._total_elapsed <= 0:
+            return 0.0
+        return self._total_playouts / self._total_elapsed
+
+    def _iterate(self, state: GameState) -> None:
+        path, det, player, winner = self._descend(state)
+        if winner == PLAYER_UNRESOLVED:
+            leaf = path[-1]
+            shared = self._get_shared_value(leaf)
+            if shared is not None:
+                # the transposed nodes already evaluated the state
+                self._backpropagate_value(path, self._store.player[leaf], shared)
+                return
+            winner = self._rollout(det, player)
+        self._backpropagate(path, winner)
+
+    def _descend(self, state: GameState) -> Tuple[List[int], GameState, int, int]:
+        """Select and expand a node on a new determinization of the state.
+
+        Returns:
+            Tuple[List[int], GameState, int, int] - the path from the root, the
+                determinized state at the expanded node, the player to move
+                there and the winner if the game is already over.
+        """
+        rng = self._rng
+        store = self._store
+        available = store.available
+        det = self._get_sampler(state).sample(rng)
+        node = self._root
+        player = self._player
+        path = [node]
+        winner = PLAYER_UNRESOLVED
+        while True:
+            actions = legal_actions(det, player)
+            children = store.get_children(node)
+            untried = [a for a in actions if a not in children]
+            for a in actions:
+                if a in children:
+                    available[children[a]] += 1
+            if untried:
+                action = rng.choice(untried)
+                node = store.new_node(action, player, node)
+            else:
+                node = self._select(children, actions)
+                action = store.action[node]
+            path.append(node)
+            apply_action(det, player, action)
+            resolve(det)
+            winner = det.get_winner()
+            player = get_opponent(player)
+            if untried and self._transpositions is not None:
+                store.key[node] = get_state_hash(det, player)
+            if untried or winner != PLAYER_UNRESOLVED:
+                break
+        return path, det, player, winner
+
+    def _get_sampler(self, state: GameState) -> DeterminizationSampler:
+        if self._sampler is None or self._sampled_state is not state:
+            self._sampler = DeterminizationSampler(state, self._player, self._tracker)
+            self._sampled_state = state
+        return self._sampler
+
+    def _backpropagate(self, path: List[int], winner: int) -> None:
+        self._backpropagate_value(path, PLAYER_A, get_reward(PLAYER_A, winner))
+
+    def _backpropagate_value(self, path: List[int], player: int, reward: float) -> None:
+        """Add the reward for the player (and the rest for the opponent)."""
+        store = self._store
+        table = self._transpositions
+        for n in path:
+            r = reward if store.player[n] == player else 1.0 - reward
+            store.visits[n] += 1
+            store.value[n] += r
+            key = store.key[n]
+            if table is not None and key:
+                slot = table.store(key)
+                table.visits[slot] += 1
+                table.value[slot] += r
+
+    def _get_shared_value(self, node: int) -> Optional[float]:
+        """Average reward of the node from the transposition table, if any."""
+        table = self._transpositions
+        if table is None:
+            return None
+        slot = table.probe(self._store.key[node])
+        if slot == NO_ENTRY or not table.visits[slot]:
+            return None
+        return table.value[slot] / table.visits[slot]
+
+    def _select(self, children: Dict[int, int], actions: List[int]) -> int:
+        store = self._store
+        visits = store.visits
+        value = store.value
+        available = store.available
+        table = self._transpositions
+        c = self._exploration
+        best = NO_NODE
+        best_score = -math.inf
+        for a in actions:
+            child = children[a]
+            n = visits[child]
+            v = value[child]
+            if table is not None:
+                slot = table.probe(store.key[child])
+                if slot != NO_ENTRY and table.visits[slot] > n:
+                    # share the statistics of the transposed nodes
+                    n = table.visits[slot]
+                    v = table.value[slot]
+            score = v / n + c * math.sqrt(math.log(available[child]) / n)
+            if score > best_score:
+                best_score = score
+                best = child
+        assert best != NO_NODE
+        return best
+
+    def _rollout(self, state: GameState, player: int) -> int:
+        return rollout(
+            state, player, self._rollout_policy, self._rng, self._max_rollout_moves
+        )
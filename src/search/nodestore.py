@@ -0,0 +1,238 @@
+"""Search tree nodes stored as parallel arrays."""
+
+from array import array
+from typing import Dict, Iterator, Optional
+
+NO_NODE = -1
+
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+DEFAULT_EVICTION_RATIO = 0.25
+_INITIAL_CAPACITY = 1024
+
+# typecodes of the per node arrays
+_FIELDS = (
+    ("action", "i"),
+    ("player", "b"),
+    ("parent", "i"),
+    ("first_child", "i"),
+    ("next_sibling", "i"),
+    ("visits", "I"),
+    ("available", "I"),
+    ("value", "d"),
+    ("prior", "f"),
+    ("key", "Q"),
+)
+
+# typecode of the free list
+_FREE_TYPECODE = "i"
+# visits are counted into the classes by their bit length for the eviction
+_NUM_VISIT_CLASSES = array("I").itemsize * 8 + 1
+
+# the fields, the alive flag and the slot in the free list
+NODE_BYTES = (
+    sum(array(t).itemsize for _, t in _FIELDS) + 1 + array(_FREE_TYPECODE).itemsize
+)
+
+
+class NodeStore:
+    """Nodes of a search tree, each field stored in its own array.
+
+    A node is the index into the arrays, the children of a node are linked from
+    `first_child` through `next_sibling`.
+    The arrays grow up to the `max_memory` bytes, then `reserve` evicts the
+    subtrees of the least visited nodes to make room, and the freed slots are
+    reused. The free list is an array as well, so the store keeps within the
+    limit without any per node Python object.
+
+    action: action leading to the node.
+    player: player who played the action.
+    visits, value: number of the visits and sum of the rewards for `player`.
+    available: number of times the node was available for the selection.
+    prior: prior probability of the action.
+    key: hash of the state at the node, 0 if not hashed.
+    """
+
+    def __init__(
+        self,
+        max_memory: Optional[int] = DEFAULT_MAX_MEMORY,
+        eviction_ratio: float = DEFAULT_EVICTION_RATIO,
+    ) -> None:
+        if max_memory is not None and max_memory < NODE_BYTES * 2:
+            raise ValueError(f"too small memory limit: {max_memory}")
+        if not 0.0 < eviction_ratio <= 1.0:
+            raise ValueError(f"invalid eviction ratio: {eviction_ratio}")
+        self._max_nodes = None if max_memory is None else max_memory // NODE_BYTES
+        self._eviction_ratio = eviction_ratio
+        self.action = array("i")
+        self.player = array("b")
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.visits = array("I")
+        self.available = array("I")
+        self.value = array("d")
+        self.prior = array("f")
+        self.key = array("Q")
+        self._alive = bytearray()
+        self._free = array(_FREE_TYPECODE)
+        self._num_nodes = 0
+        self._evicted = 0
+
+    def get_capacity(self) -> int:
+        return len(self._alive)
+
+    def get_max_nodes(self) -> Optional[int]:
+        return self._max_nodes
+
+    def get_num_nodes(self) -> int:
+        return self._num_nodes
+
+    def get_num_evicted(self) -> int:
+        return self._evicted
+
+    def get_memory_usage(self) -> int:
+        """Bytes of the arrays, including the alive flags and the free list."""
+        return self.get_capacity() * NODE_BYTES
+
+    def is_alive(self, node: int) -> bool:
+        return bool(self._alive[node])
+
+    def clear(self) -> None:
+        capacity = self.get_capacity()
+        # released before refilled, not to hold both at once
+        del self._free[:]
+        self._free.extend(range(capacity - 1, -1, -1))
+        self._alive = bytearray()
+        self._alive = bytearray(capacity)
+        self._num_nodes = 0
+
+    def new_node(
+        self, action: int, player: int, parent: int = NO_NODE, prior: float = 0.0
+    ) -> int:
+        """Allocate a node, linking it as the first child of the parent."""
+        if not self._free and not self._grow():
+            raise MemoryError("no room for a node, call reserve beforehand")
+        node = self._free.pop()
+        self._alive[node] = 1
+        self._num_nodes += 1
+        self.action[node] = action
+        self.player[node] = player
+        self.parent[node] = parent
+        self.first_child[node] = NO_NODE
+        self.visits[node] = 0
+        self.available[node] = 1
+        self.value[node] = 0.0
+        self.prior[node] = prior
+        self.key[node] = 0
+        if parent == NO_NODE:
+            self.next_sibling[node] = NO_NODE
+        else:
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+        return node
+
+    def iter_children(self, node: int) -> Iterator[int]:
+        child = self.first_child[node]
+        next_sibling = self.next_sibling
+        while child != NO_NODE:
+            yield child
+            child = next_sibling[child]
+
+    def get_children(self, node: int) -> Dict[int, int]:
+        """Map the actions to the children of the node."""
+        action = self.action
+        next_sibling = self.next_sibling
+        children = {}
+        child = self.first_child[node]
+        while child != NO_NODE:
+            children[action[child]] = child
+            child = next_sibling[child]
+        return children
+
+    def find_child(self, node: int, action: int) -> int:
+        for c in self.iter_children(node):
+            if self.action[c] == action:
+                return c
+        return NO_NODE
+
+    def detach(self, node: int) -> None:
+        """Unlink the node from its parent, making it a root."""
+        parent = self.parent[node]
+        if parent == NO_NODE:
+            return
+        if self.first_child[parent] == node:
+            self.first_child[parent] = self.next_sibling[node]
+        else:
+            for c in self.iter_children(parent):
+                if self.next_sibling[c] == node:
+                    self.next_sibling[c] = self.next_sibling[node]
+                    break
+        self.parent[node] = NO_NODE
+        self.next_sibling[node] = NO_NODE
+
+    def free_subtree(self, node: int) -> int:
+        """Free the node and all of its descendants, returning the count."""
+        self.detach(node)
+        freed = 0
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            stack.extend(self.iter_children(n))
+            self._alive[n] = 0
+            self._free.append(n)
+            freed += 1
+        self._num_nodes -= freed
+        return freed
+
+    def reserve(self, num: int, root: int) -> None:
+        """Make room for `num` nodes, evicting subtrees other than the root.
+
+        The least visited nodes are evicted first, by the classes of the bit
+        lengths of their visits, found in a pass over the nodes without sorting
+        them.
+        """
+        if self._max_nodes is None:
+            return
+        available = len(self._free) + self._max_nodes - self.get_capacity()
+        if available >= num:
+            return
+        target = max(num - available, int(self._max_nodes * self._eviction_ratio))
+        visits = self.visits
+        alive = self._alive
+        capacity = self.get_capacity()
+        counts = [0] * _NUM_VISIT_CLASSES
+        for n in range(capacity):
+            if alive[n] and n != root:
+                counts[visits[n].bit_length()] += 1
+        # the class where the evicted nodes reach the target
+        threshold = 0
+        total = 0
+        for threshold, count in enumerate(counts):
+            total += count
+            if total >= target:
+                break
+        freed = 0
+        # all the classes below the threshold, then the threshold one
+        for below in (True, False):
+            for n in range(capacity):
+                if freed >= target:
+                    break
+                if not alive[n] or n == root:
+                    continue
+                visit_class = visits[n].bit_length()
+                if visit_class < threshold or (not below and visit_class == threshold):
+                    freed += self.free_subtree(n)
+        self._evicted += freed
+
+    def _grow(self) -> bool:
+        capacity = self.get_capacity()
+        size = max(_INITIAL_CAPACITY, capacity)
+        if self._max_nodes is not None:
+            size = min(size, self._max_nodes - capacity)
+        if size <= 0:
+            return False
+        for name, typecode in _FIELDS:
+            getattr(self, name).frombytes(bytes(size * array(typecode).itemsize))
+        self._alive.extend(bytes(size))
+        self._free.extend(range(capacity + size - 1, capacity - 1, -1))
+        return True
@@ -0,0 +1,273 @@
+"""Parallel ISMCTS across a process pool.
+
+Root parallelism grows an independent tree per worker and merges the statistics
+of the root children. Leaf parallelism keeps the tree in the main process and
+sends batches of rollouts to the workers.
+States travel between the processes encoded by `encoding.encode_state`.
+"""
+
+import atexit
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from src.actions import Move, decode_action
+from src.consts import PLAYER_UNRESOLVED
+from src.encoding import decode_state, encode_state
+from src.gamestate import GameState
+from src.search.mcts import (
+    DEFAULT_EXPLORATION,
+    DEFAULT_MAX_ROLLOUT_MOVES,
+    ISMCTS,
+    RolloutPolicy,
+    random_rollout_policy,
+    rollout,
+)
+from src.search.nodestore import DEFAULT_MAX_MEMORY, NO_NODE
+from src.search.transposition import TranspositionTable
+from src.tracker import CardTracker
+
+PARALLEL_ROOT = "root"
+PARALLEL_LEAF = "leaf"
+
+_executors: Dict[int, ProcessPoolExecutor] = {}
+
+
+def get_executor(num_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Get the process pool of the size, shared by the searches in the process."""
+    num_workers = num_workers or os.cpu_count() or 1
+    executor = _executors.get(num_workers)
+    if executor is None:
+        executor = ProcessPoolExecutor(num_workers)
+        _executors[num_workers] = executor
+    return executor
+
+
+def shutdown_executors() -> None:
+    for executor in _executors.values():
+        executor.shutdown()
+    _executors.clear()
+
+
+atexit.register(shutdown_executors)
+
+
+def _search_root(
+    args: Tuple[
+        bytes,
+        int,
+        float,
+        int,
+        RolloutPolicy,
+        Optional[int],
+        Optional[float],
+        int,
+        Optional[CardTracker],
+    ],
+) -> Tuple[Dict[int, Tuple[int, float]], int]:
+    (
+        data,
+        player,
+        exploration,
+        max_moves,
+        policy,
+        iterations,
+        budget,
+        seed,
+        tracker,
+    ) = args
+    search = ISMCTS(player, exploration, max_moves, policy, random.Random(seed))
+    deadline = None if budget is None else time.perf_counter() + budget
+    search.search(decode_state(data), iterations, deadline, tracker)
+    store = search.get_store()
+    children = store.get_children(search.get_root())
+    stats = {a: (store.visits[n], store.value[n]) for a, n in children.items()}
+    return stats, search.get_playouts()
+
+
+def _rollout_encoded(args: Tuple[bytes, int, int, RolloutPolicy, int]) -> int:
+    data, player, max_moves, policy, seed = args
+    return rollout(decode_state(data), player, policy, random.Random(seed), max_moves)
+
+
+class RootParallelISMCTS(ISMCTS):
+    """Run an independent search per worker and merge the root statistics.
+
+    The trees of the workers are discarded after each search, so no subtree is
+    kept between the moves.
+    """
+
+    def __init__(
+        self,
+        player: int,
+        num_workers: Optional[int] = None,
+        exploration: float = DEFAULT_EXPLORATION,
+        max_rollout_moves: int = DEFAULT_MAX_ROLLOUT_MOVES,
+        rollout_policy: RolloutPolicy = random_rollout_policy,
+        rng: Optional[random.Random] = None,
+        max_memory: Optional[int] = DEFAULT_MAX_MEMORY,
+    ) -> None:
+        super().__init__(
+            player, exploration, max_rollout_moves, rollout_policy, rng, max_memory
+        )
+        self._num_workers = num_workers or os.cpu_count() or 1
+
+    def get_num_workers(self) -> int:
+        return self._num_workers
+
+    def search(
+        self,
+        state: GameState,
+        iterations: Optional[int] = None,
+        deadline: Optional[float] = None,
+        tracker: Optional[CardTracker] = None,
+    ) -> Move:
+        assert iterations is not None or deadline is not None
+        started = time.perf_counter()
+        self.reset()
+        data = encode_state(state)
+        budget = None if deadline is None else max(0.0, deadline - started)
+        per_worker = None if iterations is None else -(-iterations // self._num_workers)
+        tasks = [
+            (
+                data,
+                self._player,
+                self._exploration,
+                self._max_rollout_moves,
+                self._rollout_policy,
+                per_worker,
+                budget,
+                self._rng.getrandbits(64),
+                tracker,
+            )
+            for _ in range(self._num_workers)
+        ]
+        root = self._root
+        store = self._store
+        playouts = 0
+        for stats, n in get_executor(self._num_workers).map(_search_root, tasks):
+            playouts += n
+            store.reserve(len(stats), root)
+            children = store.get_children(root)
+            for action, (visits, value) in stats.items():
+                child = children.get(action, NO_NODE)
+                if child == NO_NODE:
+                    child = store.new_node(action, self._player, root)
+                    children[action] = child
+                store.visits[child] += visits
+                store.value[child] += value
+        store.visits[root] = playouts
+        self._record(playouts, time.perf_counter() - started)
+        return decode_action(self.get_best_action(state))
+
+
+class LeafParallelISMCTS(ISMCTS):
+    """Keep a single tree and run the rollouts of a batch of leaves in parallel.
+
+    The nodes on the path to a pending leaf get a virtual loss, so the leaves of
+    a batch spread across the tree.
+    """
+
+    def __init__(
+        self,
+        player: int,
+        num_workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        exploration: float = DEFAULT_EXPLORATION,
+        max_rollout_moves: int = DEFAULT_MAX_ROLLOUT_MOVES,
+        rollout_policy: RolloutPolicy = random_rollout_policy,
+        rng: Optional[random.Random] = None,
+        max_memory: Optional[int] = DEFAULT_MAX_MEMORY,
+        transpositions: Optional[TranspositionTable] = None,
+    ) -> None:
+        super().__init__(
+            player,
+            exploration,
+            max_rollout_moves,
+            rollout_policy,
+            rng,
+            max_memory,
+            transpositions,
+        )
+        self._num_workers = num_workers or os.cpu_count() or 1
+        self._batch_size = batch_size or self._num_workers * 4
+
+    def get_num_workers(self) -> int:
+        return self._num_workers
+
+    def _iterate_batch(self, state: GameState) -> int:
+        paths: List[List[int]] = []
+        winners: List[int] = []
+        tasks = []
+        visits = self._store.visits
+        self._store.reserve(self._batch_size, self._root)
+        for _ in range(self._batch_size):
+            path, det, player, winner = self._descend(state)
+            for n in path:
+                visits[n] += 1
+            paths.append(path)
+            winners.append(winner)
+            if winner == PLAYER_UNRESOLVED:
+                tasks.append(
+                    (
+                        encode_state(det),
+                        player,
+                        self._max_rollout_moves,
+                        self._rollout_policy,
+                        self._rng.getrandbits(64),
+                    )
+                )
+        executor = get_executor(self._num_workers)
+        chunksize = max(1, math.ceil(len(tasks) / self._num_workers))
+        rollouts = iter(executor.map(_rollout_encoded, tasks, chunksize=chunksize))
+        for path, winner in zip(paths, winners):
+            if winner == PLAYER_UNRESOLVED:
+                winner = next(rollouts)
+            for n in path:
+                # revert the virtual loss
+                visits[n] -= 1
+            self._backpropagate(path, winner)
+        return len(paths)
+
+
+class Speedup(NamedTuple):
+    """Playouts per second of each search mode."""
+
+    single: float
+    root_parallel: float
+    leaf_parallel: float
+
+    def get_root_speedup(self) -> float:
+        return self.root_parallel / self.single if self.single > 0 else 0.0
+
+    def get_leaf_speedup(self) -> float:
+        return self.leaf_parallel / self.single if self.single > 0 else 0.0
+
+
+def measure_speedup(
+    state: GameState,
+    player: int,
+    num_workers: Optional[int] = None,
+    duration: float = 1.0,
+    seed: Optional[int] = None,
+) -> Speedup:
+    """Measure the playouts per second of the parallel searches from the state.
+
+    Each search runs for `duration` seconds, the pool is started beforehand so
+    the spawn of the workers is not measured.
+    """
+    rng = random.Random(seed)
+    get_executor(num_workers).submit(int).result()
+    searches: List[ISMCTS] = [
+        ISMCTS(player, rng=random.Random(rng.getrandbits(64))),
+        RootParallelISMCTS(player, num_workers, rng=random.Random(rng.getrandbits(64))),
+        LeafParallelISMCTS(player, num_workers, rng=random.Random(rng.getrandbits(64))),
+    ]
+    rates = []
+    for search in searches:
+        search.search(state, deadline=time.perf_counter() + duration)
+        rates.append(search.get_playouts_per_sec())
+    return Speedup(*rates)
@@ -0,0 +1,259 @@
+"""Exact alpha-beta solver for the endgame, after both decks are exhausted.
+
+Without the decks, the only hidden cards are the opposite hands, which are
+exactly the cards the player has not seen, so the game is of perfect
+information.
+"""
+
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from src.actions import (
+    Move,
+    MoveKinds,
+    apply_action,
+    decode_action,
+    encode_move,
+    get_opponent,
+    legal_actions,
+)
+from src.consts import PLAYER_UNRESOLVED
+from src.encoding import get_state_hash
+from src.gamestate import GameState
+from src.resolver import resolve
+from src.search.determinize import determinize
+from src.search.transposition import (
+    BOUND_EXACT,
+    BOUND_LOWER,
+    BOUND_UPPER,
+    NO_ENTRY,
+    REPLACE_DEPTH,
+    TranspositionTable,
+)
+
+SCORE_WIN = 1000
+SCORE_FLAG = 10
+DEFAULT_MAX_DEPTH = 64
+DEFAULT_NUM_SLOTS = 1 << 18
+
+PASS_ACTION = encode_move(Move(MoveKinds.PASS))
+
+# depth of the entries not limited by the depth of the search
+_PROVEN_DEPTH = 0xFFFF
+# distinguish the states right after a pass, since two passes end the game
+_PASSED_KEY = 0x9E3779B97F4A7C15
+
+
+class SolveResult(NamedTuple):
+    """Result of the solver.
+
+    value: score for the player, SCORE_WIN / -SCORE_WIN if the game is won / lost.
+    exact: whether the value is the game-theoretic one, not cut by the depth.
+    """
+
+    move: Move
+    value: int
+    depth: int
+    nodes: int
+    exact: bool
+
+
+class _Timeout(Exception):
+    pass
+
+
+def is_endgame(state: GameState) -> bool:
+    """Check whether both decks are exhausted."""
+    return (
+        not state.get_troops_deck().is_remain()
+        and not state.get_tactics_deck().is_remain()
+    )
+
+
+def evaluate(state: GameState, player: int) -> int:
+    """Heuristic score for the player of an unfinished game, by the flags held."""
+    score = 0
+    for flag in state.get_flags():
+        resolved = flag.get_resolved()
+        if resolved == player:
+            score += SCORE_FLAG
+        elif resolved != PLAYER_UNRESOLVED:
+            score -= SCORE_FLAG
+    return score
+
+
+class AlphaBetaSolver:
+    """Negamax alpha-beta with a transposition table and iterative deepening.
+
+    The state is searched as is, with every hand and the order of the decks
+    known. The moves are ordered by the best move of the transposition table,
+    then by the history of the cutoffs. The game ends as a draw when both
+    players pass in a row.
+    """
+
+    def __init__(self, transpositions: Optional[TranspositionTable] = None) -> None:
+        self._table = transpositions or TranspositionTable(
+            DEFAULT_NUM_SLOTS, REPLACE_DEPTH
+        )
+        self._history: Dict[int, int] = {}
+        self._nodes = 0
+        self._limited = 0
+        self._deadline: Optional[float] = None
+
+    def get_transpositions(self) -> TranspositionTable:
+        return self._table
+
+    def solve_state(
+        self,
+        state: GameState,
+        player: int,
+        deadline: Optional[float] = None,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+    ) -> SolveResult:
+        """Search the best move of the player to move by iterative deepening.
+
+        The search stops when the value is proven, `max_depth` is reached or the
+        `deadline` (in terms of `time.perf_counter`) is passed, returning the
+        deepest completed result.
+        """
+        self._deadline = deadline
+        self._nodes = 0
+        actions = legal_actions(state, player)
+        result = SolveResult(decode_action(actions[0]), 0, 0, 0, False)
+        for depth in range(1, max_depth + 1):
+            self._limited = 0
+            try:
+                value = self._search(state, player, depth, -SCORE_WIN, SCORE_WIN, False)
+            except _Timeout:
+                break
+            slot = self._table.probe(self._get_key(state, player, False))
+            if slot != NO_ENTRY and self._table.move[slot] != NO_ENTRY:
+                move = decode_action(self._table.move[slot])
+            else:
+                move = result.move
+            # wins and losses are proven regardless of the depth
+            exact = self._limited == 0 or abs(value) == SCORE_WIN
+            result = SolveResult(move, value, depth, self._nodes, exact)
+            if exact:
+                break
+        return result
+
+    @staticmethod
+    def _get_key(state: GameState, player: int, passed: bool) -> int:
+        key = get_state_hash(state, player, hidden=True)
+        return key ^ _PASSED_KEY if passed else key
+
+    def _search(
+        self,
+        state: GameState,
+        player: int,
+        depth: int,
+        alpha: int,
+        beta: int,
+        passed: bool,
+    ) -> int:
+        self._nodes += 1
+        # a node costs much more than the clock, so check it at every node
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise _Timeout()
+        table = self._table
+        key = self._get_key(state, player, passed)
+        alpha_orig = alpha
+        best_action = NO_ENTRY
+        slot = table.probe(key)
+        if slot != NO_ENTRY:
+            best_action = table.move[slot]
+            if table.depth[slot] >= depth:
+                if table.depth[slot] != _PROVEN_DEPTH:
+                    self._limited += 1
+                value = int(table.value[slot])
+                bound = table.bound[slot]
+                if bound == BOUND_EXACT:
+                    return value
+                if bound == BOUND_LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+        if depth == 0:
+            self._limited += 1
+            return evaluate(state, player)
+        actions = self._order(legal_actions(state, player), best_action)
+        if passed and actions == [PASS_ACTION]:
+            # the game is stuck
+            return 0
+        limited = self._limited
+        opponent = get_opponent(player)
+        best = -SCORE_WIN - 1
+        for action in actions:
+            child = state.clone()
+            apply_action(child, player, action)
+            resolve(child)
+            winner = child.get_winner()
+            if winner != PLAYER_UNRESOLVED:
+                value = SCORE_WIN if winner == player else -SCORE_WIN
+            else:
+                value = -self._search(
+                    child, opponent, depth - 1, -beta, -alpha, action == PASS_ACTION
+                )
+            if value > best:
+                best = value
+                best_action = action
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                self._history[action] = self._history.get(action, 0) + depth * depth
+                break
+        if best <= alpha_orig:
+            bound = BOUND_UPPER
+        elif best >= beta:
+            bound = BOUND_LOWER
+        else:
+            bound = BOUND_EXACT
+        proven = self._limited == limited or abs(best) == SCORE_WIN
+        slot = table.store(key)
+        if table.depth[slot] <= depth or proven:
+            table.depth[slot] = _PROVEN_DEPTH if proven else depth
+            table.value[slot] = best
+            table.bound[slot] = bound
+            table.move[slot] = best_action
+        return best
+
+    def _order(self, actions: List[int], best_action: int) -> List[int]:
+        history = self._history
+        actions.sort(key=lambda a: history.get(a, 0), reverse=True)
+        if best_action != NO_ENTRY and best_action in actions:
+            actions.remove(best_action)
+            actions.insert(0, best_action)
+        return actions
+
+
+class EndgameSolver(AlphaBetaSolver):
+    """Solve the endgame of the player, inferring the opposite hands."""
+
+    def __init__(
+        self,
+        player: int,
+        transpositions: Optional[TranspositionTable] = None,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        super().__init__(transpositions)
+        self._player = player
+        self._rng = rng or random.Random(random.getrandbits(64))
+
+    def solve(
+        self,
+        state: GameState,
+        deadline: Optional[float] = None,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+    ) -> SolveResult:
+        """Search the best move of the player (see `solve_state`).
+
+        The opposite hands are the cards unseen by the player.
+        """
+        if not is_endgame(state):
+            raise ValueError("the decks are not exhausted yet")
+        state = determinize(state, self._player, self._rng)
+        return self.solve_state(state, self._player, deadline, max_depth)
@@ -0,0 +1,124 @@
+"""Bounded transposition table for the search players."""
+
+from array import array
+
+NO_ENTRY = -1
+
+BOUND_EXACT = 0
+BOUND_LOWER = 1
+BOUND_UPPER = 2
+
+REPLACE_DEPTH = "depth"
+REPLACE_VISITS = "visits"
+
+DEFAULT_NUM_SLOTS = 1 << 16
+
+
+class TranspositionTable:
+    """Statistics of the states keyed by the 64-bit hash (see `get_state_hash`).
+
+    The slots are fixed and paired in buckets of two. A key lives in either slot
+    of its bucket, a new key replaces the less valuable entry of the bucket: the
+    shallower one for REPLACE_DEPTH or the less visited one for REPLACE_VISITS.
+
+    visits, value: number of the visits and sum of the rewards of the entry.
+    depth: depth the entry was searched to.
+    bound, move: kind of the bound of `value` and the best action, for the
+        alpha-beta searches.
+    """
+
+    def __init__(
+        self, num_slots: int = DEFAULT_NUM_SLOTS, replacement: str = REPLACE_VISITS
+    ) -> None:
+        if num_slots < 2 or num_slots & (num_slots - 1):
+            raise ValueError(f"number of the slots must be a power of 2: {num_slots}")
+        if replacement not in (REPLACE_DEPTH, REPLACE_VISITS):
+            raise ValueError(f"unknown replacement: {replacement}")
+        self._num_slots = num_slots
+        self._mask = num_slots - 2
+        self.keys = array("Q", bytes(8 * num_slots))
+        self.visits = array("I", bytes(4 * num_slots))
+        self.value = array("d", bytes(8 * num_slots))
+        self.depth = array("H", bytes(2 * num_slots))
+        self.bound = array("b", bytes(num_slots))
+        self.move = array("i", bytes(4 * num_slots))
+        self._used = bytearray(num_slots)
+        self._priority = self.depth if replacement == REPLACE_DEPTH else self.visits
+        self._entries = 0
+        self._probes = 0
+        self._hits = 0
+        self._replaced = 0
+
+    def get_num_slots(self) -> int:
+        return self._num_slots
+
+    def get_num_entries(self) -> int:
+        return self._entries
+
+    def get_num_probes(self) -> int:
+        return self._probes
+
+    def get_num_hits(self) -> int:
+        return self._hits
+
+    def get_num_replaced(self) -> int:
+        return self._replaced
+
+    def get_hit_rate(self) -> float:
+        return self._hits / self._probes if self._probes else 0.0
+
+    def clear(self) -> None:
+        self._used[:] = bytes(self._num_slots)
+        self._entries = 0
+
+    def reset_stats(self) -> None:
+        self._probes = 0
+        self._hits = 0
+        self._replaced = 0
+
+    def probe(self, key: int) -> int:
+        """Find the slot of the key, NO_ENTRY if it is not stored."""
+        self._probes += 1
+        slot = key & self._mask
+        if self._used[slot] and self.keys[slot] == key:
+            self._hits += 1
+            return slot
+        slot += 1
+        if self._used[slot] and self.keys[slot] == key:
+            self._hits += 1
+            return slot
+        return NO_ENTRY
+
+    def store(self, key: int, depth: int = 0) -> int:
+        """Find or allocate the slot of the key.
+
+        A newly allocated entry starts with no visits and replaces the less
+        valuable entry of the bucket.
+        """
+        first = key & self._mask
+        second = first + 1
+        used = self._used
+        keys = self.keys
+        for slot in (first, second):
+            if used[slot] and keys[slot] == key:
+                if self.depth[slot] < depth:
+                    self.depth[slot] = depth
+                return slot
+        if not used[first]:
+            slot = first
+        elif not used[second]:
+            slot = second
+        else:
+            priority = self._priority
+            slot = first if priority[first] <= priority[second] else second
+            self._replaced += 1
+            self._entries -= 1
+        used[slot] = 1
+        self._entries += 1
+        keys[slot] = key
+        self.visits[slot] = 0
+        self.value[slot] = 0.0
+        self.depth[slot] = depth
+        self.bound[slot] = BOUND_EXACT
+        self.move[slot] = NO_ENTRY
+        return slot
@@ -0,0 +1,374 @@
+"""Tournaments between the player types with incremental ratings.
+
+The games are played in rounds across the process pool. In each round, every
+scheduled pairing plays pairs of games on the same deal with the sides swapped,
+so neither player benefits from moving first or from a lucky deal.
+
+After each game, the Elo ratings are updated incrementally and the pairing
+records the score. A pairing is settled once the confidence interval of the
+score excludes 0.5, i.e. one player is stronger with the confidence, and it
+is not scheduled anymore. The Bradley-Terry ratings are fitted from all the
+pairwise scores at the end of each round.
+"""
+
+import itertools
+import math
+import multiprocessing
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.consts import PLAYER_A, PLAYER_UNRESOLVED
+from src.runner import DEFAULT_MAX_TURNS, get_player_type, play_game
+
+MODE_ROUND_ROBIN = "round-robin"
+MODE_SWISS = "swiss"
+MODES = (MODE_ROUND_ROBIN, MODE_SWISS)
+
+DEFAULT_ELO = 1500.0
+DEFAULT_ELO_K = 16.0
+DEFAULT_CONFIDENCE = 1.96
+DEFAULT_GAMES_PER_ROUND = 2
+DEFAULT_MAX_GAMES = 200
+DEFAULT_MIN_GAMES = 10
+
+_BT_ITERATIONS = 100
+_BT_TOLERANCE = 1e-9
+
+
+class PairingStats:
+    """Scores of the player `first` against `second` (first < second)."""
+
+    def __init__(self, first: int, second: int) -> None:
+        self.first = first
+        self.second = second
+        self._wins = 0
+        self._losses = 0
+        self._draws = 0
+
+    def add(self, score: float) -> None:
+        """Add the score (1, 0.5 or 0) of the first player."""
+        if score > 0.5:
+            self._wins += 1
+        elif score < 0.5:
+            self._losses += 1
+        else:
+            self._draws += 1
+
+    def get_games(self) -> int:
+        return self._wins + self._losses + self._draws
+
+    def get_points(self) -> float:
+        """Points of the first player, a draw counts as half a win."""
+        return self._wins + self._draws * 0.5
+
+    def get_score(self) -> float:
+        """Rate of the points of the first player, 0.5 without any game."""
+        games = self.get_games()
+        return self.get_points() / games if games else 0.5
+
+    def get_score_interval(self, z: float = DEFAULT_CONFIDENCE) -> Tuple[float, float]:
+        """Wilson score interval of the score of the first player."""
+        n = self.get_games()
+        if n == 0:
+            return 0.0, 1.0
+        p = self.get_score()
+        denominator = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / denominator
+        margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+        return max(center - margin, 0.0), min(center + margin, 1.0)
+
+    def get_elo_interval(self, z: float = DEFAULT_CONFIDENCE) -> Tuple[float, float]:
+        """Interval of the Elo difference of the first player from the second."""
+        low, high = self.get_score_interval(z)
+        return _get_elo_difference(low), _get_elo_difference(high)
+
+    def is_settled(
+        self, z: float = DEFAULT_CONFIDENCE, min_games: int = DEFAULT_MIN_GAMES
+    ) -> bool:
+        """Whether the interval of the score excludes 0.5."""
+        if self.get_games() < min_games:
+            return False
+        low, high = self.get_score_interval(z)
+        return low > 0.5 or high < 0.5
+
+
+class Standing(NamedTuple):
+    """Ratings of a player after the games so far."""
+
+    name: str
+    elo: float
+    bradley_terry: float
+    games: int
+    points: float
+
+
+class Ratings:
+    """Incremental Elo ratings and the pairwise scores of the players."""
+
+    def __init__(self, num_players: int, k: float = DEFAULT_ELO_K) -> None:
+        self._k = k
+        self._elo = [DEFAULT_ELO] * num_players
+        self._pairings: Dict[Tuple[int, int], PairingStats] = {
+            (i, j): PairingStats(i, j)
+            for i, j in itertools.combinations(range(num_players), 2)
+        }
+
+    def get_num_players(self) -> int:
+        return len(self._elo)
+
+    def get_elo(self, player: int) -> float:
+        return self._elo[player]
+
+    def get_pairing(self, a: int, b: int) -> PairingStats:
+        return self._pairings[(a, b) if a < b else (b, a)]
+
+    def get_pairings(self) -> List[PairingStats]:
+        return list(self._pairings.values())
+
+    def add_result(self, a: int, b: int, score: float) -> None:
+        """Add the game of the player `a` against `b` with the score of `a`."""
+        if a == b:
+            raise ValueError(f"the player {a} against itself")
+        expected = 1 / (1 + 10 ** ((self._elo[b] - self._elo[a]) / 400))
+        delta = self._k * (score - expected)
+        self._elo[a] += delta
+        self._elo[b] -= delta
+        if a < b:
+            self._pairings[(a, b)].add(score)
+        else:
+            self._pairings[(b, a)].add(1 - score)
+
+    def get_bradley_terry(self) -> List[float]:
+        """Bradley-Terry ratings on the Elo scale, fitted by the MM algorithm.
+
+        A draw counts as half a win for both. The ratings are centered on
+        DEFAULT_ELO, and a virtual draw against each opponent keeps them finite
+        for the players without any point or loss.
+        """
+        n = self.get_num_players()
+        points = [0.0] * n
+        games = [[0] * n for _ in range(n)]
+        for stats in self._pairings.values():
+            i, j = stats.first, stats.second
+            points[i] += stats.get_points()
+            points[j] += stats.get_games() - stats.get_points()
+            games[i][j] = games[j][i] = stats.get_games()
+        strengths = [1.0] * n
+        for _ in range(_BT_ITERATIONS):
+            updated = []
+            for i in range(n):
+                denominator = sum(
+                    (games[i][j] + 1) / (strengths[i] + strengths[j])
+                    for j in range(n)
+                    if j != i
+                )
+                updated.append((points[i] + 0.5 * (n - 1)) / denominator)
+            log_mean = sum(math.log(s) for s in updated) / n
+            updated = [s / math.exp(log_mean) for s in updated]
+            change = max(abs(u - s) for u, s in zip(updated, strengths))
+            strengths = updated
+            if change < _BT_TOLERANCE:
+                break
+        return [DEFAULT_ELO + 400 * math.log10(s) for s in strengths]
+
+
+def _get_elo_difference(score: float) -> float:
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def _play_tournament_game(
+    args: Tuple[int, int, Tuple[str, str], Optional[int], int],
+) -> Tuple[int, int, int]:
+    a, b, player_types, seed, max_turns = args
+    winner, _ = play_game(player_types, seed, max_turns)
+    return a, b, winner
+
+
+class Tournament:
+    """Tournament between the player types (see `get_player_type`).
+
+    round-robin: every unsettled pairing plays in each round.
+    swiss: the players are paired by the Elo ratings in each round, preferring
+        the opponents met the least, and the unsettled pairings only.
+    Each pairing plays at most `max_games` games, `games_per_round` (rounded
+    up to even) in each round, and is settled once the interval of the `z`
+    standard scores excludes the even score after `min_games` games.
+    """
+
+    def __init__(
+        self,
+        player_types: Sequence[str],
+        mode: str = MODE_ROUND_ROBIN,
+        max_games: int = DEFAULT_MAX_GAMES,
+        games_per_round: int = DEFAULT_GAMES_PER_ROUND,
+        min_games: int = DEFAULT_MIN_GAMES,
+        z: float = DEFAULT_CONFIDENCE,
+        seed: Optional[int] = None,
+        max_turns: int = DEFAULT_MAX_TURNS,
+    ) -> None:
+        if len(player_types) < 2:
+            raise ValueError("at least 2 players are required")
+        if mode not in MODES:
+            raise ValueError(f"unknown mode: {mode}")
+        for name in player_types:
+            # fail fast before spawning workers
+            get_player_type(name)
+        self._player_types = list(player_types)
+        self._mode = mode
+        self._max_games = max_games
+        self._games_per_round = games_per_round + games_per_round % 2
+        self._min_games = min_games
+        self._z = z
+        self._seed = seed
+        self._max_turns = max_turns
+        self._ratings = Ratings(len(player_types))
+        self._round = 0
+        self._deals = 0
+
+    def get_ratings(self) -> Ratings:
+        return self._ratings
+
+    def get_round(self) -> int:
+        return self._round
+
+    def is_active(self, pairing: PairingStats) -> bool:
+        """Whether the pairing is scheduled in the next rounds."""
+        return pairing.get_games() < self._max_games and not pairing.is_settled(
+            self._z, self._min_games
+        )
+
+    def is_over(self) -> bool:
+        return not any(self.is_active(p) for p in self._ratings.get_pairings())
+
+    def get_standings(self) -> List[Standing]:
+        """Standings of the players, from the highest Bradley-Terry rating."""
+        ratings = self._ratings
+        bradley_terry = ratings.get_bradley_terry()
+        standings = []
+        for i, name in enumerate(self._player_types):
+            games = 0
+            points = 0.0
+            for p in ratings.get_pairings():
+                if p.first == i:
+                    games += p.get_games()
+                    points += p.get_points()
+                elif p.second == i:
+                    games += p.get_games()
+                    points += p.get_games() - p.get_points()
+            standings.append(
+                Standing(name, ratings.get_elo(i), bradley_terry[i], games, points)
+            )
+        standings.sort(key=lambda s: s.bradley_terry, reverse=True)
+        return standings
+
+    def schedule(self) -> List[PairingStats]:
+        """Pairings of the next round."""
+        active = [p for p in self._ratings.get_pairings() if self.is_active(p)]
+        if self._mode == MODE_ROUND_ROBIN:
+            return active
+        # swiss: pair the neighbors by the rating, met the least so far
+        ratings = self._ratings
+        order = sorted(
+            range(ratings.get_num_players()),
+            key=lambda i: ratings.get_elo(i),
+            reverse=True,
+        )
+        unpaired = [i for i in order if any(i in (p.first, p.second) for p in active)]
+        pairings = []
+        while len(unpaired) >= 2:
+            top = unpaired.pop(0)
+            candidates = [
+                i for i in unpaired if self.is_active(ratings.get_pairing(top, i))
+            ]
+            if not candidates:
+                continue
+            least = min(ratings.get_pairing(top, i).get_games() for i in candidates)
+            opponent = next(
+                i
+                for i in candidates
+                if ratings.get_pairing(top, i).get_games() == least
+            )
+            unpaired.remove(opponent)
+            pairings.append(ratings.get_pairing(top, opponent))
+        return pairings
+
+    def get_round_tasks(
+        self, pairings: Sequence[PairingStats]
+    ) -> List[Tuple[int, int, Tuple[str, str], Optional[int], int]]:
+        """Games of the round, each deal played twice with the sides swapped."""
+        tasks = []
+        names = self._player_types
+        for pairing in pairings:
+            num_games = min(
+                self._games_per_round, self._max_games - pairing.get_games()
+            )
+            for k in range(num_games):
+                if k % 2 == 0:
+                    a, b = pairing.first, pairing.second
+                    seed = None if self._seed is None else self._seed + self._deals
+                    self._deals += 1
+                else:
+                    a, b = pairing.second, pairing.first
+                tasks.append((a, b, (names[a], names[b]), seed, self._max_turns))
+        return tasks
+
+    def add_game(self, a: int, b: int, winner: int) -> None:
+        """Add the game of the player `a` as PLAYER_A against `b` as PLAYER_B."""
+        if winner == PLAYER_UNRESOLVED:
+            score = 0.5
+        else:
+            score = 1.0 if winner == PLAYER_A else 0.0
+        self._ratings.add_result(a, b, score)
+
+    def run(
+        self,
+        num_workers: Optional[int] = None,
+        max_rounds: Optional[int] = None,
+        on_round: Optional[Callable[["Tournament"], None]] = None,
+    ) -> List[Standing]:
+        """Play the rounds until every pairing is settled or played out.
+
+        Args:
+            num_workers - size of the process pool, games run in process if 1
+            max_rounds - limit of the rounds (the number of the rounds of
+                a Swiss tournament, typically)
+            on_round - called with the tournament after each round
+        """
+        if num_workers == 1:
+            self._run_rounds(map, max_rounds, on_round)
+            return self.get_standings()
+        with multiprocessing.Pool(num_workers or multiprocessing.cpu_count()) as pool:
+            # the games are dispatched one by one, balancing the slow players
+            self._run_rounds(
+                lambda f, tasks: pool.imap_unordered(f, tasks, 1), max_rounds, on_round
+            )
+        return self.get_standings()
+
+    def _run_rounds(
+        self,
+        mapper: Callable,
+        max_rounds: Optional[int],
+        on_round: Optional[Callable[["Tournament"], None]],
+    ) -> None:
+        while max_rounds is None or self._round < max_rounds:
+            tasks = self.get_round_tasks(self.schedule())
+            if not tasks:
+                return
+            for a, b, winner in mapper(_play_tournament_game, tasks):
+                self.add_game(a, b, winner)
+            self._round += 1
+            if on_round is not None:
+                on_round(self)
+
+
+def format_standings(standings: Sequence[Standing]) -> str:
+    lines = [f"{'player':<24} {'bt':>7} {'elo':>7} {'games':>6} {'points':>7}"]
+    for s in standings:
+        lines.append(
+            f"{s.name:<24} {s.bradley_terry:7.1f} {s.elo:7.1f}"
+            f" {s.games:6d} {s.points:7.1f}"
+        )
+    return "\n".join(lines)
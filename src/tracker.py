@@ -0,0 +1,173 @@
+"""Incremental card counting from the view of a player."""
+
+from typing import Iterable, List, Optional, Tuple, Union
+
+from src.actions import Move, MoveKinds
+from src.cards.cards import Card, CardGenerator, TacticCard, TroopCard
+from src.cards.cardtypes import TroopColors, Troops
+from src.consts import (
+    NUM_CARD_IDS,
+    NUM_CARDS,
+    NUM_COLORS,
+    NUM_TACTICS,
+    PLAYER_IDS,
+    PLAYER_UNRESOLVED,
+)
+from src.gamestate import GameState
+
+_NUM_NUMBERS = len(Troops)
+
+
+class CardTracker:
+    """Cards unseen by the player, updated move by move.
+
+    The unseen cards are those in the opposite hands or in the decks, except the
+    cards the player put back on the decks by the scout. With PLAYER_UNRESOLVED,
+    only the cards played in public are seen. A card once seen stays seen, even
+    after the opponent draws it back from the deck; such cards are found by
+    `get_opposite_known_cards`.
+    The used troops (deployed on the flags or discarded) are kept as well, to be
+    passed to `resolve` instead of collecting them from the flags.
+    """
+
+    def __init__(self, player: int = PLAYER_UNRESOLVED) -> None:
+        self._player = player
+        self._unseen = bytearray(b"\x01" * NUM_CARD_IDS)
+        self._colors = [_NUM_NUMBERS] * NUM_COLORS
+        self._numbers = [NUM_COLORS] * _NUM_NUMBERS
+        self._troops = NUM_CARDS
+        self._tactics = NUM_TACTICS
+        self._played = bytearray(NUM_CARD_IDS)
+        self._used_troops: List[TroopCard] = []
+        # cards put back on the decks by the scout of the player
+        self._returned: List[int] = []
+
+    @staticmethod
+    def from_state(state: GameState, player: int = PLAYER_UNRESOLVED) -> "CardTracker":
+        """Count the cards seen by the player in the state."""
+        tracker = CardTracker(player)
+        tracker.observe_private(state)
+        for flag in state.get_flags():
+            for p in PLAYER_IDS:
+                for card in flag.get_stacked_cards(p):
+                    tracker.use(card.get_card_id())  # type: ignore
+                for card in flag.get_stacked_envs(p):
+                    tracker.use(card.get_card_id())
+        for p in PLAYER_IDS:
+            for op in state.get_operations(p):
+                tracker.use(op.get_tactic_guile_card().get_card_id())
+                discarded = op.get_discarded_troop_card()
+                if discarded is not None:
+                    tracker.use(discarded.get_card_id())
+        return tracker
+
+    def get_player(self) -> int:
+        return self._player
+
+    def reveal(self, card_id: int) -> None:
+        """Mark the card as seen."""
+        if not self._unseen[card_id]:
+            return
+        self._unseen[card_id] = 0
+        if card_id < NUM_CARDS:
+            color, number = divmod(card_id, _NUM_NUMBERS)
+            self._colors[color] -= 1
+            self._numbers[number] -= 1
+            self._troops -= 1
+        else:
+            self._tactics -= 1
+
+    def use(self, card_id: int) -> None:
+        """Mark the card as played in public."""
+        self.reveal(card_id)
+        if self._played[card_id]:
+            return
+        self._played[card_id] = 1
+        if card_id < NUM_CARDS:
+            self._used_troops.append(_CARDS[card_id])  # type: ignore
+
+    def observe_hand(self, hand: Iterable[Card]) -> None:
+        for card in hand:
+            self.reveal(card.get_card_id())
+
+    def observe_private(self, state: GameState) -> None:
+        """Reveal the hand of the player and the cards returned by the scout."""
+        player = self._player
+        if player == PLAYER_UNRESOLVED:
+            return
+        self.observe_hand(state.get_hands(player))
+        for deck in (state.get_troops_deck(), state.get_tactics_deck()):
+            for card in deck.get_known_cards(player).values():
+                card_id = card.get_card_id()
+                self.reveal(card_id)
+                if card_id not in self._returned:
+                    self._returned.append(card_id)
+
+    def observe_move(
+        self, player: int, move: Move, drawn: Optional[Card] = None
+    ) -> None:
+        """Update by the move of the player.
+
+        The card `drawn` by the move (see `apply_move`) is revealed only if the
+        player is the owner of the tracker. The cards drawn by the scout are not
+        known from the move, call `observe_private` after the scout instead.
+        """
+        if move.kind == MoveKinds.PASS:
+            return
+        # the cards reclaimed by the guile tactics are already used
+        self.use(move.card)
+        if drawn is not None and player == self._player:
+            self.reveal(drawn.get_card_id())
+
+    def is_unseen(self, card_id: int) -> bool:
+        return bool(self._unseen[card_id])
+
+    def get_remaining(
+        self, color: Union[TroopColors, int], number: Union[Troops, int]
+    ) -> int:
+        """Number of the unseen troops of the color and the number (0 or 1)."""
+        return self._unseen[(int(color) - 1) * _NUM_NUMBERS + int(number) - 1]
+
+    def get_remaining_color(self, color: Union[TroopColors, int]) -> int:
+        return self._colors[int(color) - 1]
+
+    def get_remaining_number(self, number: Union[Troops, int]) -> int:
+        return self._numbers[int(number) - 1]
+
+    def get_num_unseen_troops(self) -> int:
+        return self._troops
+
+    def get_num_unseen_tactics(self) -> int:
+        return self._tactics
+
+    def get_unseen_cards(self) -> Tuple[List[TroopCard], List[TacticCard]]:
+        unseen = self._unseen
+        troops = [c for c in _CARDS[:NUM_CARDS] if unseen[c.get_card_id()]]
+        tactics = [c for c in _CARDS[NUM_CARDS:] if unseen[c.get_card_id()]]
+        return troops, tactics  # type: ignore
+
+    def get_opposite_known_cards(self, state: GameState) -> List[Card]:
+        """Cards put back by the scout of the player, drawn by the opponent since.
+
+        They are seen, but neither played nor in the hand of the player nor at
+        the positions of the decks known by the player.
+        """
+        player = self._player
+        if not self._returned:
+            return []
+        held = set(c.get_card_id() for c in state.get_hands(player))
+        for deck in (state.get_troops_deck(), state.get_tactics_deck()):
+            held.update(c.get_card_id() for c in deck.get_known_cards(player).values())
+        return [
+            _CARDS[i] for i in self._returned if not self._played[i] and i not in held
+        ]
+
+    def get_used_troops(self) -> List[TroopCard]:
+        """Troops deployed on the flags or discarded, in the order of the play."""
+        return self._used_troops
+
+
+_CARDS: List[Card] = [
+    *CardGenerator.troops(),
+    *CardGenerator.tactics(),
+]
@@ -0,0 +1,128 @@
+# noqa
+
+import random
+
+from src.actions import (
+    NUM_ACTIONS,
+    Move,
+    MoveKinds,
+    apply_action,
+    apply_move,
+    decode_action,
+    encode_move,
+    legal_actions,
+    legal_moves,
+)
+from src.cards.cards import CardGenerator
+from src.cards.cardtypes import Tactics, TroopColors
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.encoding import decode_state, encode_state
+from src.gamestate import GameState
+from src.players.randomplayer import RandomPlayer
+from src.resolver import resolve
+
+
+def test_action_roundtrip():  # noqa: D103
+    for action in range(NUM_ACTIONS):
+        assert encode_move(decode_action(action)) == action
+
+
+def test_card_id_roundtrip():  # noqa: D103
+    for card in list(CardGenerator.troops()) + list(CardGenerator.tactics()):
+        assert CardGenerator.from_id(card.get_card_id()) == card
+
+
+def test_legal_moves_initial_state():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    moves = legal_moves(state, PLAYER_A)
+    # 7 troops for 9 flags, drawing from both decks
+    assert len(moves) == 7 * 9 * 2
+    assert all(m.kind == MoveKinds.DEPLOY for m in moves)
+
+
+def test_apply_deploy_move():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    card = state.get_hands(PLAYER_A)[0]
+    move = Move(MoveKinds.DEPLOY, card=card.get_card_id(), flag=4)
+    drawn = apply_move(state, PLAYER_A, move)
+    assert state.get_flags()[4].get_stacked_cards(PLAYER_A) == [card]
+    assert drawn in state.get_hands(PLAYER_A)
+    assert card not in state.get_hands(PLAYER_A)
+    assert len(state.get_hands(PLAYER_A)) == 7
+
+
+def test_pass_only_without_troops():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    state.get_hands(PLAYER_B)[:] = [CardGenerator.tactic(Tactics.FOG)]
+    actions = legal_actions(state, PLAYER_B)
+    assert encode_move(Move(MoveKinds.PASS)) in actions
+    assert encode_move(Move(MoveKinds.PASS)) not in legal_actions(state, PLAYER_A)
+
+
+def test_tactics_limited_by_opposite():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    mud = CardGenerator.tactic(Tactics.MUD)
+    state.get_hands(PLAYER_A).append(mud)
+    apply_move(state, PLAYER_A, Move(MoveKinds.ENVIRONMENT, mud.get_card_id(), flag=0))
+    assert state.get_num_played_tactics(PLAYER_A) == 1
+    state.get_hands(PLAYER_A)[:] = [
+        CardGenerator.troop(TroopColors.RED, 1),
+        CardGenerator.tactic(Tactics.FOG),
+    ]
+    moves = legal_moves(state, PLAYER_A)
+    assert all(m.kind == MoveKinds.DEPLOY for m in moves)
+
+
+def test_deserter_discards_opposite_card():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    target = CardGenerator.troop(TroopColors.BLUE, 10)
+    state.get_flags()[2].add_stack(PLAYER_B, target)
+    state.get_hands(PLAYER_A).append(CardGenerator.tactic(Tactics.DESERTER))
+    move = Move(
+        MoveKinds.DESERTER,
+        card=CardGenerator.tactic(Tactics.DESERTER).get_card_id(),
+        flag=2,
+        slot=0,
+    )
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    apply_move(state, PLAYER_A, move)
+    assert len(state.get_flags()[2].get_stacked_cards(PLAYER_B)) == 0
+    assert state.get_operations(PLAYER_A)[0].get_discarded_troop_card() == target
+
+
+def test_played_tactics_counters():  # noqa: D103
+    rng = random.Random(0)
+    state = GameState.new(random.Random(0))
+    players = [RandomPlayer(p, random.Random(p)) for p in (PLAYER_A, PLAYER_B)]
+    for turn in range(80):
+        player = turn % 2
+        if turn % 4 < 2:
+            state = players[player].play(state)
+        else:
+            apply_action(state, player, rng.choice(legal_actions(state, player)))
+        resolve(state)
+        # the counters are carried by the clones and recounted from the state
+        counted = decode_state(encode_state(state))
+        for s in (state.clone(), counted):
+            assert s.get_played_tactics() == state.get_played_tactics()
+            assert s.get_played_leaders() == state.get_played_leaders()
+        if state.get_winner() != PLAYER_UNRESOLVED:
+            break
+    assert sum(state.get_played_tactics()) > 0
+
+    # the leader moved by the traitor stays played by its owner
+    state = GameState.new(random.Random(0))
+    leader = CardGenerator.tactic(Tactics.LEADER_ALEXANDER)
+    traitor = CardGenerator.tactic(Tactics.TRAITOR)
+    state.get_hands(PLAYER_B).append(leader)
+    state.get_hands(PLAYER_A).append(traitor)
+    deploy = Move(MoveKinds.DEPLOY, card=leader.get_card_id(), flag=0)
+    apply_move(state, PLAYER_B, deploy)
+    move = Move(MoveKinds.TRAITOR, card=traitor.get_card_id(), flag=0, slot=0, dest=1)
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    apply_move(state, PLAYER_A, move)
+    assert state.get_played_tactics() == [1, 1]
+    assert state.get_played_leaders() == [0, 1]
+    decoded = decode_state(encode_state(state))
+    assert decoded.get_played_tactics() == [1, 1]
+    assert decoded.get_played_leaders() == [0, 1]
@@ -0,0 +1,27 @@
+# noqa
+
+from src.analysis import analyze_game, analyze_games, record_game, replay_states
+from src.consts import PLAYER_UNRESOLVED
+from src.search.solver import SCORE_WIN
+
+
+def test_record_game_replays():  # noqa: D103
+    record = record_game(("random", "greedy"), seed=0)
+    states = replay_states(record)
+    assert len(states) == len(record.actions) + 1
+    assert states[-1].get_winner() != PLAYER_UNRESOLVED
+
+
+def test_analyze_game():  # noqa: D103
+    record = record_game(("random", "random"), seed=1)
+    analysis = analyze_game(record, time_limit=0.05)
+    assert [a.ply for a in analysis] == list(range(len(record.actions)))
+    last = analysis[-1]
+    # the last move wins the game
+    assert last.exact and last.value == SCORE_WIN
+
+
+def test_analyze_games_in_pool():  # noqa: D103
+    records = [record_game(("random", "random"), seed=i) for i in range(2)]
+    analyses = analyze_games(records, num_workers=2, time_limit=0.01)
+    assert [len(a) for a in analyses] == [len(r.actions) for r in records]
@@ -0,0 +1,50 @@
+# noqa
+
+import json
+
+from src.benchmark import (
+    BenchmarkResult,
+    compare_results,
+    get_benchmarks,
+    get_fixture_states,
+    get_formation_flag,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+from src.cards.cardtypes import Formations
+from src.consts import PLAYER_A, PLAYER_UNRESOLVED
+from src.resolver import check_resolvable_for_single_flag, get_formation
+
+
+def test_fixtures_seeded():  # noqa: D103
+    states = get_fixture_states(1)
+    assert [repr(s) for s in states] == [repr(s) for s in get_fixture_states(1)]
+    names = get_benchmarks()
+    for formation in Formations:
+        assert f"resolver.check_resolvable.{formation.name.lower()}" in names
+
+
+def test_formation_flags():  # noqa: D103
+    for formation in Formations:
+        flag = get_formation_flag(formation)
+        assert get_formation(flag, PLAYER_A) == formation
+        # undecided, so the resolver evaluates the stack of the opponent
+        assert check_resolvable_for_single_flag(flag, []) == PLAYER_UNRESOLVED
+
+
+def test_run_and_compare(tmp_path):  # noqa: D103
+    names = ["gamestate.clone", "resolver.check_resolvable.wedge"]
+    results = run_benchmarks(names, repeat=2, min_time=0.001)
+    assert [r.name for r in results] == names
+    assert all(r.seconds_per_op > 0 and r.number > 0 for r in results)
+    path = str(tmp_path / "results.json")
+    save_results(path, results)
+    with open(path) as f:
+        assert set(json.load(f)["benchmarks"]) == set(names)
+    baseline = load_results(path)
+    assert not any(c.regressed for c in compare_results(results, baseline))
+    slower = [BenchmarkResult(r.name, r.seconds_per_op * 2, 1, 1) for r in results]
+    comparisons = compare_results(slower, baseline, tolerance=0.5)
+    assert [c.regressed for c in comparisons] == [True, True]
+    assert compare_results(results, {}) == []
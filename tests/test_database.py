@@ -0,0 +1,49 @@
+# noqa
+
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.database import FlagClaim, GameDatabase
+from src.cards.cardtypes import Formations
+from src.runner import DEFAULT_MAX_TURNS, run_games
+
+
+def test_game_database(tmp_path):  # noqa: D103
+    path = str(tmp_path / "games.db")
+    with GameDatabase(path, batch_size=2) as database:
+        database.add_game(
+            ("greedy", "random"),
+            PLAYER_A,
+            30,
+            [
+                FlagClaim(0, PLAYER_A, 10, Formations.WEDGE),
+                FlagClaim(1, PLAYER_B, 20, Formations.HOST),
+            ],
+        )
+        database.add_game(("random", "greedy"), PLAYER_B, 40, seed=1)
+        database.add_game(
+            ("random", "random"),
+            PLAYER_UNRESOLVED,
+            50,
+            [FlagClaim(0, PLAYER_B, 30, Formations.WEDGE)],
+        )
+        assert database.get_num_games() == 3
+        assert database.get_win_rates() == {"greedy": 1.0, "random": 0.0}
+        assert database.get_average_claim_turns() == {0: 20.0, 1: 20.0}
+        assert database.get_formation_wins() == {
+            Formations.WEDGE: 2,
+            Formations.HOST: 1,
+        }
+    # reopened with the stored games
+    with GameDatabase(path) as database:
+        assert database.get_num_games() == 3
+
+
+def test_run_games_database(tmp_path):  # noqa: D103
+    path = str(tmp_path / "games.db")
+    stats = run_games(("greedy", "random"), 4, num_workers=1, seed=0, db_path=path)
+    with GameDatabase(path) as database:
+        assert database.get_num_games() == 4
+        rates = database.get_win_rates()
+        assert abs(rates["greedy"] - stats.get_win_rate(PLAYER_A)) < 1e-9
+        turns = database.get_average_claim_turns()
+        assert turns and all(0 < t <= DEFAULT_MAX_TURNS for t in turns.values())
+        assert set(database.get_formation_wins()) <= set(Formations)
@@ -0,0 +1,101 @@
+# noqa
+
+import random
+
+from src.actions import NUM_ACTIONS, legal_actions
+from src.encoding import OBSERVATION_SIZE, decode_state, encode_state
+from src.env import SubprocVectorEnv, VectorEnv
+
+
+def _random_actions(env, result, rng):  # noqa: D103
+    actions = []
+    for i in range(env.get_num_games()):
+        mask = result.masks[i * NUM_ACTIONS : (i + 1) * NUM_ACTIONS]
+        actions.append(rng.choice([a for a, legal in enumerate(mask) if legal]))
+    return actions
+
+
+def test_vector_env_reset():  # noqa: D103
+    env = VectorEnv(3, seed=0)
+    result = env.reset()
+    assert len(result.observations) == 3 * OBSERVATION_SIZE
+    assert len(result.masks) == 3 * NUM_ACTIONS
+    assert list(result.players) == [0, 0, 0]
+    assert all(
+        sum(result.masks[i * NUM_ACTIONS : (i + 1) * NUM_ACTIONS]) > 0 for i in range(3)
+    )
+
+
+def test_vector_env_runs_until_done():  # noqa: D103
+    env = VectorEnv(4, seed=0)
+    rng = random.Random(0)
+    result = env.reset()
+    finished = 0
+    for _ in range(400):
+        result = env.step(_random_actions(env, result, rng))
+        for i, done in enumerate(result.dones):
+            if done:
+                finished += 1
+                assert result.rewards[i] in (-1.0, 0.0, 1.0)
+    assert finished > 0
+
+
+def test_vector_env_seeded():  # noqa: D103
+    def run():  # noqa: D103
+        env = VectorEnv(2, seed=42)
+        rng = random.Random(1)
+        result = env.reset()
+        for _ in range(30):
+            result = env.step(_random_actions(env, result, rng))
+        return bytes(result.observations)
+
+    assert run() == run()
+
+
+def test_vector_env_rejects_illegal_action():  # noqa: D103
+    env = VectorEnv(1, seed=0)
+    result = env.reset()
+    illegal = result.masks.index(0)
+    try:
+        env.step([illegal])
+    except ValueError:
+        return
+    assert False, "illegal action accepted"
+
+
+def test_subproc_vector_env():  # noqa: D103
+    rng = random.Random(0)
+    with SubprocVectorEnv(4, num_workers=2, seed=0) as env:
+        result = env.reset()
+        assert env.get_num_workers() == 2
+        for _ in range(20):
+            result = env.step(_random_actions(env, result, rng))
+        assert len(result.observations) == 4 * OBSERVATION_SIZE
+        assert all(p in (0, 1) for p in result.players)
+
+
+def test_encode_state_roundtrip():  # noqa: D103
+    env = VectorEnv(1, seed=0)
+    rng = random.Random(0)
+    result = env.reset()
+    for _ in range(60):
+        state = env.get_states()[0]
+        data = encode_state(state)
+        decoded = decode_state(data)
+        assert encode_state(decoded) == data
+        player = result.players[0]
+        assert legal_actions(decoded, player) == legal_actions(state, player)
+        result = env.step(_random_actions(env, result, rng))
+
+
+def test_subproc_vector_env_pin_failure(monkeypatch):  # noqa: D103
+    # a core out of the allowed set fails the workers instead of hanging them
+    monkeypatch.setattr("src.env._get_allowed_cores", lambda: [1 << 20])
+    env = SubprocVectorEnv(2, num_workers=2, seed=0, timeout=10.0)
+    try:
+        env.reset()
+    except RuntimeError:
+        return
+    finally:
+        env.close()
+    assert False, "failed workers not reported"
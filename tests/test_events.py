@@ -0,0 +1,61 @@
+# noqa
+
+import io
+import random
+
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.events import (
+    CardDrawn,
+    CardPlayed,
+    FlagClaimed,
+    GameOver,
+    GuileUsed,
+    Passed,
+    TerminalObserver,
+    TurnStarted,
+)
+from src.game import Game
+from src.gamestate import GameState
+from src.players.greedyplayer import GreedyPlayer
+from src.players.randomplayer import RandomPlayer
+
+
+def test_game_events():  # noqa: D103
+    random.seed(0)
+    events = []
+    out = io.StringIO()
+    game = Game(
+        GameState.new(random.Random(0)),
+        (RandomPlayer(PLAYER_A, random.Random(0)), GreedyPlayer(PLAYER_B)),
+        verbose=False,
+        observers=[events.append, TerminalObserver(out)],
+    )
+    # both players are left with the passes only, ending the game as a draw
+    while not game.is_over() and game.get_turn_length() < 100:
+        game.run()
+    assert game.is_over()
+    turns = [e for e in events if isinstance(e, TurnStarted)]
+    moves = [e for e in events if isinstance(e, (CardPlayed, GuileUsed, Passed))]
+    assert len(moves) == len(turns)
+    drawn = [e for e in events if isinstance(e, CardDrawn)]
+    assert 0 < len(drawn) <= len(moves)
+    claimed = [e.flag for e in events if isinstance(e, FlagClaimed)]
+    resolved = [
+        i for i, f in enumerate(game.get_state().get_flags()) if f.is_resolved()
+    ]
+    assert sorted(claimed) == resolved
+    assert game.get_winner() == PLAYER_UNRESOLVED
+    assert events[-1] == GameOver(game.get_turn_length(), PLAYER_UNRESOLVED)
+    assert [type(e) for e in moves[-2:]] == [Passed, Passed]
+    assert out.getvalue().count("claims the flag") == len(claimed)
+
+
+def test_game_without_observers():  # noqa: D103
+    players = (RandomPlayer(PLAYER_A), RandomPlayer(PLAYER_B))
+    game = Game(GameState.new(random.Random(0)), players, verbose=False)
+    events = []
+    game.add_observer(events.append)
+    game.run()
+    game.remove_observer(events.append)
+    game.run()
+    assert [type(e) for e in events if isinstance(e, TurnStarted)] == [TurnStarted] * 2
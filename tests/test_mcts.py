@@ -0,0 +1,327 @@
+# noqa
+
+import random
+import time
+import tracemalloc
+
+import pytest
+
+from src.actions import (
+    Move,
+    MoveKinds,
+    apply_action,
+    encode_move,
+    get_opponent,
+    legal_actions,
+)
+from src.cards.cards import CardGenerator, TroopCard
+from src.cards.cardtypes import Tactics
+from src.cards.decks import TacticsDeck
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.encoding import get_state_hash
+from src.gamestate import GameState
+from src.players.mctsplayer import ISMCTSPlayer
+from src.players.randomplayer import RandomPlayer
+from src.resolver import resolve
+from src.search.determinize import (
+    DeterminizationSampler,
+    determinize,
+    get_unseen_cards,
+)
+from src.search.mcts import ISMCTS
+from src.search.nodestore import NODE_BYTES, NO_NODE, NodeStore
+from src.search.parallel import LeafParallelISMCTS, RootParallelISMCTS
+from src.search.solver import SCORE_WIN, EndgameSolver, is_endgame
+from src.search.transposition import NO_ENTRY, REPLACE_VISITS, TranspositionTable
+from src.tracker import CardTracker
+
+
+def test_unseen_cards():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    troops, tactics = get_unseen_cards(state, PLAYER_A)
+    assert len(troops) == 60 - 7
+    assert len(tactics) == 10
+    assert not any(c in state.get_hands(PLAYER_A) for c in troops)
+
+
+def test_determinize_keeps_view():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    det = determinize(state, PLAYER_A, random.Random(1))
+    assert det.get_hands(PLAYER_A) == state.get_hands(PLAYER_A)
+    assert len(det.get_hands(PLAYER_B)) == 7
+    assert all(isinstance(c, TroopCard) for c in det.get_hands(PLAYER_B))
+    assert len(det.get_troops_deck()) == len(state.get_troops_deck())
+    assert len(det.get_tactics_deck()) == len(state.get_tactics_deck())
+
+
+def test_search_returns_legal_move():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    search = ISMCTS(PLAYER_A, rng=random.Random(0))
+    move = search.search(state, iterations=30)
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    assert search.get_playouts() == 30
+    assert sum(search.get_visit_counts().values()) == 30
+    assert search.get_playouts_per_sec() > 0
+
+
+def test_search_tree_reuse():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    search = ISMCTS(PLAYER_A, rng=random.Random(0))
+    move = search.search(state, iterations=30)
+    store = search.get_store()
+    child = store.find_child(search.get_root(), encode_move(move))
+    subtree = store.get_num_nodes() - 30 + store.visits[child]
+    search.advance(encode_move(move))
+    assert search.get_root() == child
+    assert store.parent[child] == NO_NODE
+    assert store.get_num_nodes() <= subtree
+
+
+def test_node_store_eviction():  # noqa: D103
+    store = NodeStore(max_memory=NODE_BYTES * 100)
+    root = store.new_node(NO_NODE, PLAYER_B)
+    for a in range(99):
+        store.reserve(1, root)
+        child = store.new_node(a, PLAYER_A, root)
+        store.visits[child] = a
+    assert store.get_num_nodes() == 100
+    store.reserve(1, root)
+    assert store.get_num_nodes() == 75
+    assert store.is_alive(root)
+    assert min(store.visits[c] for c in store.iter_children(root)) == 25
+    for _ in range(200):
+        store.reserve(1, root)
+        store.new_node(0, PLAYER_A, root)
+    assert store.get_capacity() == 100
+
+
+def test_node_store_memory_limit():  # noqa: D103
+    max_memory = NODE_BYTES * 20000
+    tracemalloc.start()
+    try:
+        store = NodeStore(max_memory=max_memory)
+        root = store.new_node(NO_NODE, PLAYER_B)
+        parent = root
+        for a in range(50000):
+            store.reserve(1, root)
+            if not store.is_alive(parent):
+                parent = root
+            node = store.new_node(a, PLAYER_A, parent)
+            store.visits[node] = a % 97
+            if a % 3 == 0:
+                parent = node
+        store.clear()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert store.get_num_evicted() > 0
+    assert store.get_memory_usage() <= max_memory
+    # the arrays may be over-allocated by their growth
+    assert peak < max_memory * 1.2
+
+
+def test_search_under_memory_limit():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    search = ISMCTS(PLAYER_A, rng=random.Random(0), max_memory=NODE_BYTES * 50)
+    move = search.search(state, iterations=200)
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    assert search.get_store().get_capacity() == 50
+    assert search.get_store().get_num_evicted() > 0
+
+
+def test_ismcts_player_follows_opposite_move():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    player = ISMCTSPlayer(PLAYER_A, time_limit=None, iterations=20)
+    opposite = RandomPlayer(PLAYER_B, random.Random(0))
+    state = player.play(state)
+    state = opposite.play(state)
+    state = player.play(state)
+    assert player.get_search().get_playouts() == 20
+    # the tracker follows both moves instead of rescanning the state
+    tracker = player.get_tracker()
+    expected = CardTracker.from_state(state, PLAYER_A)
+    assert tracker.get_unseen_cards() == expected.get_unseen_cards()
+    used = [
+        sorted(c.get_card_id() for c in t.get_used_troops())
+        for t in (tracker, expected)
+    ]
+    assert used[0] == used[1]
+
+
+def test_root_parallel_search():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    search = RootParallelISMCTS(PLAYER_A, num_workers=2, rng=random.Random(0))
+    move = search.search(state, iterations=20)
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    assert search.get_playouts() == 20
+    assert sum(search.get_visit_counts().values()) == 20
+
+
+def test_leaf_parallel_search():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    search = LeafParallelISMCTS(
+        PLAYER_A, num_workers=2, batch_size=4, rng=random.Random(0)
+    )
+    move = search.search(state, iterations=12)
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    assert search.get_playouts() == 12
+    assert sum(search.get_visit_counts().values()) == 12
+
+
+def test_state_hash_transposition():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    hands = state.get_hands(PLAYER_A)
+    first = encode_move(Move(MoveKinds.DEPLOY, hands[0].get_card_id(), flag=0))
+    second = encode_move(Move(MoveKinds.DEPLOY, hands[1].get_card_id(), flag=1))
+    a = state.clone()
+    apply_action(a, PLAYER_A, first)
+    b = state.clone()
+    apply_action(b, PLAYER_A, second)
+    apply_action(a, PLAYER_A, second)
+    apply_action(b, PLAYER_A, first)
+    assert get_state_hash(a, PLAYER_B) == get_state_hash(b, PLAYER_B)
+    assert get_state_hash(a, PLAYER_B) != get_state_hash(a, PLAYER_A)
+    assert get_state_hash(a, PLAYER_B) != get_state_hash(state, PLAYER_B)
+    assert get_state_hash(a, PLAYER_B, hidden=True) == get_state_hash(
+        b, PLAYER_B, hidden=True
+    )
+
+
+def test_transposition_table_replacement():  # noqa: D103
+    table = TranspositionTable(4, REPLACE_VISITS)
+    keys = [0x10, 0x20, 0x30]  # all in the first bucket
+    for visits, key in zip((5, 1), keys):
+        slot = table.store(key)
+        table.visits[slot] = visits
+    assert table.store(keys[2]) == table.probe(keys[2])
+    assert table.probe(keys[0]) != NO_ENTRY
+    assert table.probe(keys[1]) == NO_ENTRY
+    assert table.get_num_replaced() == 1
+    assert table.get_num_entries() == 2
+    assert table.get_hit_rate() == 2 / 3
+    with pytest.raises(ValueError):
+        TranspositionTable(3)
+
+
+def test_search_with_transpositions():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    table = TranspositionTable(1 << 10)
+    search = ISMCTS(PLAYER_A, rng=random.Random(0), transpositions=table)
+    move = search.search(state, iterations=300)
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    assert table.get_num_entries() > 0
+    assert table.get_num_hits() > 0
+
+
+def _play_until_endgame(rng):  # noqa: D103
+    while True:
+        state = GameState.new(rng)
+        player = PLAYER_A
+        while state.get_winner() == PLAYER_UNRESOLVED and not is_endgame(state):
+            apply_action(state, player, rng.choice(legal_actions(state, player)))
+            resolve(state)
+            player = get_opponent(player)
+        if state.get_winner() == PLAYER_UNRESOLVED:
+            return state, player
+
+
+def test_endgame_solver():  # noqa: D103
+    state, player = _play_until_endgame(random.Random(0))
+    solver = EndgameSolver(player)
+    result = solver.solve(state)
+    assert result.exact
+    assert encode_move(result.move) in legal_actions(state, player)
+    # the proven move keeps the value
+    apply_action(state, player, encode_move(result.move))
+    resolve(state)
+    winner = state.get_winner()
+    if winner == PLAYER_UNRESOLVED:
+        reply = EndgameSolver(get_opponent(player)).solve(state)
+        assert reply.value == -result.value
+    else:
+        assert result.value == (SCORE_WIN if winner == player else -SCORE_WIN)
+    with pytest.raises(ValueError):
+        solver.solve(GameState.new(random.Random(0)))
+
+
+def test_endgame_solver_deadline():  # noqa: D103
+    state, player = _play_until_endgame(random.Random(0))
+    # the clock is checked at every node, so a passed deadline stops at once
+    result = EndgameSolver(player).solve(state, deadline=time.perf_counter())
+    assert result.depth == 0 and result.nodes <= 1
+    assert encode_move(result.move) in legal_actions(state, player)
+
+
+def test_determinize_keeps_scout_returns():  # noqa: D103
+    initial = GameState.new(random.Random(0))
+    scout_card = CardGenerator.tactic(Tactics.SCOUT)
+    tactics_deck = [c for c in CardGenerator.tactics() if c != scout_card]
+    state = GameState(
+        initial.get_troops_deck(),
+        TacticsDeck(tactics_deck),
+        initial.get_flags(),
+        [[], []],
+        [initial.get_hands(p) for p in (PLAYER_A, PLAYER_B)],
+    )
+    state.get_hands(PLAYER_A).pop()
+    state.add_hand(PLAYER_A, scout_card)
+    scout = Move(MoveKinds.SCOUT, draw=1)
+    apply_action(state, PLAYER_A, encode_move(scout))
+    decks = (state.get_troops_deck(), state.get_tactics_deck())
+    known = [deck.get_known_cards(PLAYER_A) for deck in decks]
+    assert sum(len(k) for k in known) == 2
+    assert not any(deck.get_known_cards(PLAYER_B) for deck in decks)
+    troops, tactics = get_unseen_cards(state, PLAYER_A)
+    assert not any(c in k.values() for k in known for c in troops + tactics)
+    sampler = DeterminizationSampler(state, PLAYER_A)
+    for sample in sampler.sample_batch(10, random.Random(0)):
+        det = sampler.build(sample)
+        det_decks = (det.get_troops_deck(), det.get_tactics_deck())
+        for deck, original, k in zip(det_decks, decks, known):
+            assert len(deck) == len(original)
+            cards = list(deck.peek(len(deck)))[::-1]
+            assert all(cards[i] == c for i, c in k.items())
+    # the known positions are forgotten once drawn
+    for deck in decks:
+        for _ in range(len(deck)):
+            deck.draw()
+        assert not deck.get_known()
+
+
+def test_determinize_with_tracker():  # noqa: D103
+    initial = GameState.new(random.Random(0))
+    scout_card = CardGenerator.tactic(Tactics.SCOUT)
+    tactics_deck = [c for c in CardGenerator.tactics() if c != scout_card]
+    state = GameState(
+        initial.get_troops_deck(),
+        TacticsDeck(tactics_deck),
+        initial.get_flags(),
+        [[], []],
+        [initial.get_hands(p) for p in (PLAYER_A, PLAYER_B)],
+    )
+    state.get_hands(PLAYER_A).pop()
+    state.add_hand(PLAYER_A, scout_card)
+    tracker = CardTracker.from_state(state, PLAYER_A)
+    scout = Move(MoveKinds.SCOUT, draw=1)
+    tracker.observe_move(PLAYER_A, scout)
+    apply_action(state, PLAYER_A, encode_move(scout))
+    tracker.observe_private(state)
+    # the opponent draws the cards put back by the scout
+    for deck in (state.get_troops_deck(), state.get_tactics_deck()):
+        while len(deck) - 1 in deck.get_known_cards(PLAYER_A):
+            state.add_hand(PLAYER_B, deck.draw())
+    known = tracker.get_opposite_known_cards(state)
+    assert len(known) == 2
+    assert CardTracker.from_state(state, PLAYER_A).get_opposite_known_cards(state) == []
+    sampler = DeterminizationSampler(state, PLAYER_A, tracker)
+    for sample in sampler.sample_batch(10, random.Random(0)):
+        det = sampler.build(sample)
+        hands = det.get_hands(PLAYER_B)
+        assert all(c in hands for c in known)
+        assert len(set(sample)) == len(sample)
+        troops = sum(isinstance(c, TroopCard) for c in hands)
+        assert troops == sum(
+            isinstance(c, TroopCard) for c in state.get_hands(PLAYER_B)
+        )
+    with pytest.raises(ValueError):
+        DeterminizationSampler(state, PLAYER_B, tracker)
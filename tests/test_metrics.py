@@ -0,0 +1,90 @@
+# noqa
+
+import math
+import urllib.request
+
+from src import metrics
+from src.runner import play_game
+
+
+def test_histogram_quantiles():  # noqa: D103
+    histogram = metrics.Histogram("latency_seconds", "Latency.", ("bot",))
+    assert math.isnan(histogram.get_quantile(0.5, ("a",)))
+    for i in range(1, 1001):
+        histogram.observe(i / 1000, ("a",))
+    assert histogram.get_count(("a",)) == 1000
+    assert abs(histogram.get_sum(("a",)) - 500.5) < 1e-6
+    for q in metrics.QUANTILES:
+        # within a bucket of the exact quantile
+        assert abs(histogram.get_quantile(q, ("a",)) / q - 1) < math.sqrt(2) - 1
+    for bound in histogram.get_bounds():
+        assert histogram._get_index(bound) == histogram.get_bounds().index(bound)
+    try:
+        histogram.observe(1.0, ("a", "b"))
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_histogram_render():  # noqa: D103
+    histogram = metrics.Histogram(
+        "latency_seconds", "Latency.", ("bot",), minimum=1.0, growth=2.0, num_buckets=3
+    )
+    for value in [0.5, 1.5, 3.0, 100.0]:
+        histogram.observe(value, ('say "hi"',))
+    lines = list(histogram.render())
+    assert lines[:2] == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+    ]
+    assert lines[2:8] == [
+        'latency_seconds_bucket{bot="say \\"hi\\"",le="1.0"} 1',
+        'latency_seconds_bucket{bot="say \\"hi\\"",le="2.0"} 2',
+        'latency_seconds_bucket{bot="say \\"hi\\"",le="4.0"} 3',
+        'latency_seconds_bucket{bot="say \\"hi\\"",le="+Inf"} 4',
+        'latency_seconds_sum{bot="say \\"hi\\""} 105.0',
+        'latency_seconds_count{bot="say \\"hi\\""} 4',
+    ]
+    assert "# TYPE latency_seconds_quantile gauge" in lines
+    assert 'latency_seconds_quantile{bot="say \\"hi\\"",quantile="0.99"} 4.0' in lines
+
+
+def test_metrics_game(tmp_path):  # noqa: D103
+    path = str(tmp_path / "metrics.{worker}.prom")
+    worker = (metrics.get_worker(),)
+    games = metrics.GAMES.get(worker)
+    moves = metrics.MOVE_LATENCY.get_count(("GreedyPlayer",))
+    metrics.enable(path, interval=0.0)
+    try:
+        play_game(("greedy", "random"), seed=1, max_turns=20)
+    finally:
+        metrics.disable()
+    assert metrics.GAMES.get(worker) == games + 1
+    assert metrics.GAMES_PER_SECOND.get(worker) > 0
+    assert metrics.MOVE_LATENCY.get_count(("GreedyPlayer",)) > moves
+    assert metrics.MOVE_LATENCY.get_count(("RandomPlayer",)) > 0
+    with open(path.replace("{worker}", worker[0])) as f:
+        text = f.read()
+    assert 'battleline_move_latency_seconds_count{bot="GreedyPlayer"}' in text
+    assert "# TYPE battleline_games_total counter" in text
+
+    # not observed while disabled
+    play_game(("random", "random"), seed=1, max_turns=5)
+    assert metrics.GAMES.get(worker) == games + 1
+
+
+def test_metrics_serve():  # noqa: D103
+    registry = metrics.Registry()
+    counter = metrics.Counter("requests_total", "Requests.")
+    registry.register(counter)
+    counter.inc()
+    server = metrics.serve(0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+            assert response.read().decode().splitlines()[-1] == "requests_total 1.0"
+    finally:
+        server.shutdown()
+        server.server_close()
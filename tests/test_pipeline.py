@@ -0,0 +1,77 @@
+import os
+import queue
+import random
+
+from src.actions import NUM_ACTIONS
+from src.encoding import OBSERVATION_SIZE, encode_observation
+from src.pipeline import (
+    SelfPlayConfig,
+    ShardLoader,
+    TrainingPipeline,
+    encode_game_samples,
+)
+from src.records import GameRecorder
+from src.replay import iter_samples
+from src.replaybuffer import MASK_BYTES, ReplayBuffer, unpack_mask
+from src.runner import play_game
+
+
+def test_shard_loader(tmp_path):  # noqa: D103
+    recorder = GameRecorder(3)
+    play_game(("random", "random"), 3, 20, [recorder])
+    record = recorder.get_record()
+    encoded = encode_game_samples(record)
+    assert len(encoded) == len(record.actions)
+    sample = next(iter_samples(record))
+    observation = encode_observation(sample.state, sample.player)
+    assert encoded[0][:OBSERVATION_SIZE] == observation.tobytes()
+
+    path = str(tmp_path / "shard.bin")
+    with open(path, "wb") as f:
+        f.write(b"".join(encoded))
+    shards: "queue.Queue" = queue.Queue()
+    shards.put(path)
+    shards.put(None)
+    loader = ShardLoader(shards, 1, 16, shuffle_size=8, rng=random.Random(0))
+    batches = list(loader)
+    loader.close()
+    assert [len(b) for b in batches] == [16] * (len(encoded) // 16) + (
+        [len(encoded) % 16] if len(encoded) % 16 else []
+    )
+    assert sorted(a for b in batches for a in b.actions) == sorted(record.actions)
+    assert not os.path.exists(path)
+
+
+def test_training_pipeline(tmp_path):  # noqa: D103
+    config = SelfPlayConfig(("random", "random"), max_turns=20, shard_size=16, seed=1)
+    data_dir = str(tmp_path / "shards")
+    with TrainingPipeline(
+        data_dir,
+        config,
+        batch_size=8,
+        num_workers=2,
+        games_per_worker=2,
+        max_pending_shards=2,
+        shuffle_size=32,
+        rng=random.Random(0),
+    ) as pipeline:
+        batches = list(pipeline)
+        num_samples = pipeline.get_loader().get_num_samples()
+    assert num_samples == sum(len(b) for b in batches)
+    assert num_samples > 0
+    assert all(len(b) == 8 for b in batches[:-1])
+    for b in batches:
+        assert len(b.observations) == len(b) * OBSERVATION_SIZE
+        assert len(b.masks) == len(b) * MASK_BYTES
+        assert len(b.returns) == len(b)
+        for i, action in enumerate(b.actions):
+            assert action < NUM_ACTIONS
+            assert unpack_mask(b.masks[i * MASK_BYTES : (i + 1) * MASK_BYTES])[action]
+    # the consumed shards are removed
+    assert os.listdir(data_dir) == []
+
+    with ReplayBuffer(str(tmp_path / "buffer"), 64) as buffer:
+        for i in range(len(batches[0])):
+            buffer.append_encoded(batches[0].get_record(i))
+        assert len(buffer) == len(batches[0])
+        assert buffer.sample(1).actions[0] in batches[0].actions
@@ -0,0 +1,93 @@
+# noqa
+
+import random
+import time
+
+from src.actions import MoveKinds, encode_move, legal_actions, legal_moves
+from src.cards.cards import CardGenerator
+from src.cards.cardtypes import Tactics, TroopColors
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.game import Game, TimeControl
+from src.gamestate import GameState
+from src.players.greedyplayer import GreedyPlayer
+from src.players.mctsplayer import ISMCTSPlayer
+from src.players.randomplayer import RandomPlayer
+from src.runner import play_game
+
+
+def test_opposite_id():  # noqa: D103
+    assert RandomPlayer(PLAYER_A).get_opposite_id() == PLAYER_B
+    assert RandomPlayer(PLAYER_B).get_opposite_id() == PLAYER_A
+
+
+def test_random_player_plays_legal_move():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    player = RandomPlayer(PLAYER_A, random.Random(0))
+    move = player.choose_move(state)
+    assert encode_move(move) in legal_actions(state, PLAYER_A)
+    new_state = player.play(state)
+    assert new_state is not state
+    assert len(new_state.get_hands(PLAYER_A)) == 7
+    stacked = [len(f.get_stacked_cards(PLAYER_A)) for f in new_state.get_flags()]
+    assert sum(stacked) == 1
+    # original state is kept as is
+    assert sum(len(f.get_stacked_cards(PLAYER_A)) for f in state.get_flags()) == 0
+
+
+def test_greedy_player_completes_wedge():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    flag = state.get_flags()[3]
+    flag.add_stack(PLAYER_A, CardGenerator.troop(TroopColors.RED, 8))
+    flag.add_stack(PLAYER_A, CardGenerator.troop(TroopColors.RED, 9))
+    state.get_hands(PLAYER_A)[:] = [
+        CardGenerator.troop(TroopColors.BLUE, 1),
+        CardGenerator.troop(TroopColors.RED, 10),
+        CardGenerator.tactic(Tactics.FOG),
+    ]
+    move = GreedyPlayer(PLAYER_A, random.Random(0)).choose_move(state)
+    assert move.kind == MoveKinds.DEPLOY
+    assert move.flag == 3
+    assert move.card == CardGenerator.troop(TroopColors.RED, 10).get_card_id()
+
+
+def test_scout_keeps_hand_size():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    scout = CardGenerator.tactic(Tactics.SCOUT)
+    state.get_hands(PLAYER_A).pop()
+    state.get_hands(PLAYER_A).append(scout)
+    player = RandomPlayer(PLAYER_A)
+    moves = [m for m in legal_moves(state, PLAYER_A) if m.kind == MoveKinds.SCOUT]
+    new_state = player._play_move(state, moves[0])
+    assert scout not in new_state.get_hands(PLAYER_A)
+    # scout leaves the hand, then draws three cards and returns two of them
+    assert len(new_state.get_hands(PLAYER_A)) == 7
+    assert len(new_state.get_operations(PLAYER_A)) == 1
+
+
+def test_random_vs_greedy_game_finishes():  # noqa: D103
+    _, turns = play_game(("random", "greedy"), seed=0)
+    assert turns > 0
+
+
+def test_time_controls():  # noqa: D103
+    class SlowPlayer(RandomPlayer):
+        def play(self, state: GameState) -> GameState:
+            time.sleep(0.02)
+            return super().play(state)
+
+    players = (
+        ISMCTSPlayer(PLAYER_A, time_limit=None, iterations=10**9),
+        SlowPlayer(PLAYER_B, random.Random(0)),
+    )
+    controls = (TimeControl(0.05), TimeControl(1.0, total_time=0.03))
+    game = Game(GameState.new(random.Random(0)), players, False, controls)
+    started = time.perf_counter()
+    assert game.run() == PLAYER_UNRESOLVED
+    assert time.perf_counter() - started < 0.5
+    assert game.get_remaining_time(PLAYER_A) is None
+    assert all(overrun < 0.05 for overrun in game.get_overruns(PLAYER_A))
+    assert len(game.get_overruns(PLAYER_B)) == 0
+    # the second move of the slow player uses up its time
+    assert game.run() == PLAYER_A
+    assert game.get_remaining_time(PLAYER_B) <= 0
+    assert len(game.get_overruns(PLAYER_B)) == 1
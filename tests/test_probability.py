@@ -0,0 +1,64 @@
+# noqa
+
+import itertools
+import random
+
+from src.cards.cards import CardGenerator
+from src.cards.cardtypes import Formations, TacticEnvironments, Tactics
+from src.consts import NUM_CARD_IDS, PLAYER_A
+from src.flag import Flag
+from src.probability import (
+    get_completion_probability,
+    get_flag_completion_probabilities,
+)
+from src.tracker import CardTracker
+
+
+def test_completion_probability_matches_enumeration():  # noqa: D103
+    rng = random.Random(0)
+    troops = list(CardGenerator.troops())
+    for _ in range(30):
+        rng.shuffle(troops)
+        pool = troops[: rng.randint(3, 9)]
+        tracker = CardTracker(PLAYER_A)
+        for card in troops[len(pool) :]:
+            tracker.reveal(card.get_card_id())
+        for card_id in range(60, NUM_CARD_IDS):
+            tracker.reveal(card_id)
+        n_cards = rng.choice([3, 4])
+        stack = troops[len(pool) : len(pool) + rng.randint(0, n_cards - 1)]
+        if stack and rng.random() < 0.3:
+            stack[-1] = CardGenerator.tactic(Tactics.LEADER_ALEXANDER)
+        hand = troops[len(pool) + len(stack) :][: rng.randint(0, 2)]
+        draws = rng.randint(0, len(pool))
+        required = n_cards - len(stack)
+        for formation in Formations:
+            completed = 0
+            combinations = list(itertools.combinations(pool, draws))
+            for drawn in combinations:
+                # the completed stacks are certain, without any draw
+                completed += any(
+                    get_completion_probability(
+                        stack + list(c), n_cards, formation, tracker, 0
+                    )
+                    == 1.0
+                    for c in itertools.combinations(hand + list(drawn), required)
+                )
+            probability = get_completion_probability(
+                stack, n_cards, formation, tracker, draws, hand
+            )
+            assert abs(probability - completed / len(combinations)) < 1e-9
+
+
+def test_flag_completion_probabilities():  # noqa: D103
+    flag = Flag()
+    tracker = CardTracker(PLAYER_A)
+    for number in (8, 9, 10):
+        flag.add_stack(PLAYER_A, CardGenerator.troop(1, number))
+    probabilities = get_flag_completion_probabilities(flag, PLAYER_A, tracker, 0)
+    assert probabilities.pop(Formations.PHALANX) == 0.0
+    assert probabilities == {f: 1.0 for f in Formations if f != Formations.PHALANX}
+    flag = Flag()
+    flag.add_env(PLAYER_A, CardGenerator.tactic(TacticEnvironments.FOG))
+    probabilities = get_flag_completion_probabilities(flag, PLAYER_A, tracker, 3)
+    assert probabilities == {Formations.HOST: 1.0}
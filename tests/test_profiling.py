@@ -0,0 +1,38 @@
+# noqa
+
+import io
+
+from src import profiling
+from src.resolver import RESOLVER_USED_TROOPS_CACHE
+from src.runner import play_game
+
+
+def test_profiling_game():  # noqa: D103
+    out = io.StringIO()
+    profiling.reset()
+    profiling.enable(report_interval=0.0, out=out)
+    try:
+        play_game(("greedy", "random"), seed=1, max_turns=20)
+    finally:
+        profiling.disable()
+    phases = profiling.get_phases()
+    for phase in [
+        profiling.PHASE_DECISION,
+        profiling.PHASE_CLONE,
+        profiling.PHASE_RESOLVE,
+        profiling.PHASE_WINNER,
+    ]:
+        assert phases[phase].calls > 0 and phases[phase].seconds > 0
+    assert phases[profiling.PHASE_RESOLVE].calls == phases[profiling.PHASE_WINNER].calls
+    caches = profiling.get_caches()
+    assert caches[RESOLVER_USED_TROOPS_CACHE].misses > 0
+    assert 0.0 <= caches[RESOLVER_USED_TROOPS_CACHE].get_hit_rate() <= 1.0
+    assert "probability.count_failures" in caches
+    lines = out.getvalue().splitlines()
+    assert lines and lines[-1] == profiling.get_summary()
+
+    # not counted while disabled
+    play_game(("random", "random"), seed=1, max_turns=5)
+    assert profiling.get_phases() == phases
+    profiling.reset()
+    assert profiling.get_phases() == {}
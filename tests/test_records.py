@@ -0,0 +1,88 @@
+# noqa
+
+import random
+
+import pytest
+
+from src.actions import apply_action, get_opponent, legal_actions
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.encoding import encode_state
+from src.gamestate import GameState
+from src.records import (
+    CompactRecord,
+    GameRecorder,
+    RecordWriter,
+    decode_record,
+    encode_record,
+    read_records,
+)
+from src.resolver import resolve
+from src.runner import play_game, run_games
+
+_PLAYERS = ("random", "greedy")
+
+
+def test_record_roundtrip():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    record = CompactRecord.from_state(state, [0, 1, 2632], PLAYER_B, 12345)
+    data = encode_record(record)
+    assert len(data) < 60
+    decoded = decode_record(data)
+    assert decoded.troops == record.troops and decoded.tactics == record.tactics
+    assert list(decoded.actions) == [0, 1, 2632]
+    assert (decoded.winner, decoded.seed) == (PLAYER_B, 12345)
+    assert encode_state(decoded.get_initial_state()) == encode_state(state)
+    with pytest.raises(ValueError):
+        decode_record(data + b"\x00")
+    apply_action(state, PLAYER_A, legal_actions(state, PLAYER_A)[0])
+    with pytest.raises(ValueError):
+        CompactRecord.from_state(state)
+
+
+def test_recorder_replays_game():  # noqa: D103
+    recorder = GameRecorder(seed=3)
+    winner, _ = play_game(_PLAYERS, seed=3, observers=[recorder])
+    record = recorder.get_record()
+    assert (record.winner, record.seed) == (winner, 3)
+    state = record.get_initial_state()
+    assert encode_state(state) == encode_state(GameState.new(random.Random(3)))
+    player = PLAYER_A
+    for action in record.actions:
+        apply_action(state, player, action)
+        resolve(state)
+        player = get_opponent(player)
+    assert state.get_winner() == winner
+
+
+def test_record_log(tmp_path):  # noqa: D103
+    path = str(tmp_path / "games.log")
+    records = [
+        CompactRecord.from_state(GameState.new(random.Random(i)), [i], seed=i)
+        for i in range(3)
+    ]
+    with RecordWriter(path) as writer:
+        writer.write(records[0])
+    # appended by another writer
+    with RecordWriter(path) as writer:
+        for record in records[1:]:
+            writer.write(record)
+        assert writer.get_count() == 2
+    read = read_records(path)
+    assert next(read).seed == 0
+    assert [(r.seed, list(r.actions)) for r in read] == [(1, [1]), (2, [2])]
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00")
+    with pytest.raises(ValueError):
+        list(read_records(path))
+
+
+def test_run_games_records(tmp_path):  # noqa: D103
+    path = str(tmp_path / "games.log")
+    results = []
+    run_games(
+        _PLAYERS, 3, num_workers=1, seed=0, on_result=results.append, record_path=path
+    )
+    records = list(read_records(path))
+    assert [r.seed for r in records] == [0, 1, 2]
+    assert [r.winner for r in records] == [r.winner for r in results]
+    assert all(r.winner != PLAYER_UNRESOLVED or len(r.actions) > 0 for r in records)
@@ -0,0 +1,43 @@
+# noqa
+
+import random
+
+import pytest
+
+from src.encoding import encode_state
+from src.env import REWARD_DRAW, REWARD_LOSE, REWARD_WIN
+from src.records import GameRecorder
+from src.replay import Replay, extract_samples, iter_samples
+from src.runner import play_game
+
+
+def _record_game(seed):  # noqa: D103
+    recorder = GameRecorder(seed)
+    play_game(("random", "greedy"), seed, observers=[recorder])
+    return recorder.get_record()
+
+
+def test_replay_seek():  # noqa: D103
+    record = _record_game(0)
+    replay = Replay(record, interval=4)
+    samples = list(iter_samples(record))
+    assert len(samples) == replay.get_num_moves() == len(record.actions)
+    for move in random.Random(0).sample(range(len(samples)), 10):
+        assert encode_state(replay.get_state(move)) == encode_state(samples[move].state)
+        sample = replay.get_sample(move)
+        assert sample[1:] == samples[move][1:]
+    final = replay.get_state(replay.get_num_moves())
+    assert final.get_winner() == record.winner
+    with pytest.raises(ValueError):
+        replay.get_state(replay.get_num_moves() + 1)
+
+
+def test_extract_samples():  # noqa: D103
+    records = [_record_game(i) for i in range(3)]
+    batches = list(extract_samples(records, 16))
+    assert all(len(b) == 16 for b in batches[:-1])
+    assert sum(len(b) for b in batches) == sum(len(r.actions) for r in records)
+    for sample in batches[0]:
+        assert sample.outcome in (REWARD_WIN, REWARD_LOSE, REWARD_DRAW)
+    batches = list(extract_samples(records, 4, moves_per_game=2, rng=random.Random(0)))
+    assert [len(b) for b in batches] == [4, 2]
@@ -0,0 +1,79 @@
+# noqa
+
+import multiprocessing
+import random
+
+import pytest
+
+from src.actions import NUM_ACTIONS
+from src.encoding import OBSERVATION_SIZE
+from src.env import VectorEnv
+from src.replaybuffer import ReplayBuffer, pack_mask, unpack_mask
+
+
+def _append_samples(path, num):  # noqa: D103
+    env = VectorEnv(1, seed=num)
+    result = env.reset()
+    with ReplayBuffer(path) as buffer:
+        for i in range(num):
+            buffer.append(result.observations, i, result.masks, 1.0)
+
+
+def test_pack_mask():  # noqa: D103
+    mask = bytearray(NUM_ACTIONS)
+    for action in (0, 7, 8, 1000, NUM_ACTIONS - 1):
+        mask[action] = 1
+    assert unpack_mask(pack_mask(mask)) == mask
+
+
+def test_replay_buffer_ring(tmp_path):  # noqa: D103
+    path = str(tmp_path / "buffer")
+    env = VectorEnv(1, seed=0)
+    result = env.reset()
+    with ReplayBuffer(path, capacity=5) as buffer:
+        for i in range(7):
+            assert buffer.append(result.observations, i, result.masks, -i) == i % 5
+        assert len(buffer) == 5 and buffer.get_num_appended() == 7
+        batch = buffer.sample(20, random.Random(0))
+        assert sorted(set(batch.actions)) == [2, 3, 4, 5, 6]
+        for action, ret in zip(batch.actions, batch.returns):
+            assert ret == -action
+        assert bytes(batch.observations[0]) == bytes(result.observations)
+        assert unpack_mask(batch.masks[0]) == bytes(result.masks)
+        del batch
+    with pytest.raises(ValueError):
+        ReplayBuffer(path, capacity=6)
+    with ReplayBuffer(path) as buffer:
+        assert buffer.get_capacity() == 5 and len(buffer) == 5
+
+
+def test_replay_buffer_prioritized(tmp_path):  # noqa: D103
+    observation = bytes(OBSERVATION_SIZE)
+    mask = bytes(NUM_ACTIONS)
+    with ReplayBuffer(str(tmp_path / "buffer"), capacity=4, alpha=1.0) as buffer:
+        for i in range(4):
+            buffer.append(observation, i, mask, 0.0, priority=1.0)
+        buffer.update_priorities([3], [97.0])
+        batch = buffer.sample(1000, random.Random(0), prioritized=True, beta=1.0)
+        assert sum(1 for i in batch.indices if i == 3) > 900
+        assert max(batch.weights) == 1.0
+        assert min(batch.weights) == pytest.approx(1.0 / 97.0)
+        del batch
+
+
+def test_replay_buffer_concurrent_appends(tmp_path):  # noqa: D103
+    path = str(tmp_path / "buffer")
+    ReplayBuffer(path, capacity=100).close()
+    workers = [
+        multiprocessing.Process(target=_append_samples, args=(path, n))
+        for n in (20, 30)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with ReplayBuffer(path) as buffer:
+        assert buffer.get_num_appended() == 50
+        batch = buffer.sample(10)
+        assert len(batch.indices) == 10
+        del batch
@@ -1,12 +1,14 @@
 # noqa
 from src.cards.cards import CardGenerator, TroopCard
-from src.cards.cardtypes import TacticMorales, TroopColors
+from src.cards.cardtypes import Formations, TacticMorales, TroopColors
 from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
 from src.flag import Flag
 from src.gamestate import GameState
 from src.resolver import (
     aggregate_used_troops,
     check_resolvable_for_single_flag,
+    get_formation,
+    is_formation_completed,
     possible_maximum_strength_for_battalion,
     possible_maximum_strength_for_host,
     possible_maximum_strength_for_phalanx,
@@ -544,3 +546,18 @@ def test_solve_failed_wedge_but_battalion_vs_battalion():  # noqa: D103
 def _check_resolve(flag: Flag, state: GameState) -> int:
     used_cards = aggregate_used_troops(state)
     return check_resolvable_for_single_flag(flag, used_cards)
+
+
+def test_get_formation():  # noqa: D103
+    flag = Flag()
+    for i in (3, 4, 5):
+        flag.add_stack(PLAYER_A, CardGenerator.from_id(i))
+    for i in (3, 13):
+        flag.add_stack(PLAYER_B, CardGenerator.from_id(i))
+    assert get_formation(flag, PLAYER_A) == Formations.WEDGE
+    assert get_formation(flag, PLAYER_B) is None
+    flag.add_stack(PLAYER_B, CardGenerator.from_id(23))
+    assert get_formation(flag, PLAYER_B) == Formations.PHALANX
+    stack = flag.get_stacked_cards(PLAYER_A)
+    completed = [f for f in Formations if is_formation_completed(stack, 3, f)]
+    assert set(completed) == set(Formations) - {Formations.PHALANX}
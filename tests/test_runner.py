@@ -0,0 +1,47 @@
+# noqa
+
+from src.actions import apply_move, legal_moves
+from src.consts import PLAYER_A, PLAYER_B
+from src.gamestate import GameState
+from src.players.humanplayer import HumanPlayer
+from src.players.player import Player
+from src.runner import get_player_type, play_game, run_games
+
+_FIRST_MOVE_PLAYER = "tests.test_runner:FirstMovePlayer"
+
+
+class FirstMovePlayer(Player):  # noqa: D101
+    def play(self, state: GameState) -> GameState:  # noqa: D102
+        state = state.clone()
+        apply_move(state, self.get_id(), legal_moves(state, self.get_id())[0])
+        return state
+
+
+def test_get_player_type():  # noqa: D103
+    assert get_player_type("human") is HumanPlayer
+    assert get_player_type(_FIRST_MOVE_PLAYER).__name__ == "FirstMovePlayer"
+
+
+def test_get_player_type_unknown():  # noqa: D103
+    for name in ["unknown", "src.gamestate:GameState"]:
+        try:
+            get_player_type(name)
+        except ValueError:
+            continue
+        assert False, name
+
+
+def test_play_game_seeded():  # noqa: D103
+    players = (_FIRST_MOVE_PLAYER, _FIRST_MOVE_PLAYER)
+    assert play_game(players, seed=3) == play_game(players, seed=3)
+
+
+def test_run_games_stats():  # noqa: D103
+    players = (_FIRST_MOVE_PLAYER, _FIRST_MOVE_PLAYER)
+    results = []
+    stats = run_games(players, 4, num_workers=1, seed=0, on_result=results.append)
+    assert stats.get_games() == 4
+    assert sorted(r.index for r in results) == [0, 1, 2, 3]
+    rates = stats.get_win_rate(PLAYER_A) + stats.get_win_rate(PLAYER_B)
+    assert abs(rates + stats.get_draw_rate() - 1.0) < 1e-9
+    assert stats.get_average_turns() > 0
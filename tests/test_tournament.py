@@ -0,0 +1,84 @@
+# noqa
+
+from src.consts import PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.tournament import (
+    DEFAULT_ELO,
+    MODE_SWISS,
+    PairingStats,
+    Ratings,
+    Tournament,
+)
+
+_FIRST_MOVE_PLAYER = "tests.test_runner:FirstMovePlayer"
+
+
+def test_pairing_stats():  # noqa: D103
+    stats = PairingStats(0, 1)
+    assert not stats.is_settled()
+    for _ in range(20):
+        stats.add(1.0)
+    stats.add(0.5)
+    assert stats.get_games() == 21
+    assert stats.get_points() == 20.5
+    low, high = stats.get_score_interval()
+    assert 0.5 < low < stats.get_score() < high <= 1.0
+    assert stats.is_settled()
+    assert not stats.is_settled(min_games=30)
+    assert stats.get_elo_interval()[0] > 0
+
+
+def test_ratings():  # noqa: D103
+    ratings = Ratings(3)
+    for _ in range(10):
+        ratings.add_result(0, 1, 1.0)
+        ratings.add_result(2, 1, 1.0)
+        ratings.add_result(0, 2, 0.5)
+    assert ratings.get_elo(0) > DEFAULT_ELO > ratings.get_elo(1)
+    assert abs(sum(ratings.get_elo(i) for i in range(3)) - 3 * DEFAULT_ELO) < 1e-6
+    assert ratings.get_pairing(1, 0).get_score() == 1.0
+    bt = ratings.get_bradley_terry()
+    assert abs(bt[0] - bt[2]) < 1e-6
+    assert bt[0] > DEFAULT_ELO > bt[1]
+
+
+def test_tournament_round_robin():  # noqa: D103
+    tournament = Tournament(
+        ["greedy", "random", _FIRST_MOVE_PLAYER],
+        max_games=8,
+        games_per_round=4,
+        min_games=4,
+        seed=0,
+        max_turns=30,
+    )
+    tasks = tournament.get_round_tasks(tournament.schedule())
+    assert len(tasks) == 12
+    # each deal is played by both sides
+    assert tasks[0][3] == tasks[1][3] and tasks[0][:2] == tasks[1][1::-1]
+    standings = tournament.run(num_workers=1)
+    assert tournament.is_over()
+    assert tournament.get_round() <= 2
+    assert {s.name for s in standings} == {"greedy", "random", _FIRST_MOVE_PLAYER}
+    assert sum(s.games for s in standings) == 2 * sum(
+        p.get_games() for p in tournament.get_ratings().get_pairings()
+    )
+
+
+def test_tournament_swiss():  # noqa: D103
+    tournament = Tournament(
+        ["random", "random", _FIRST_MOVE_PLAYER, _FIRST_MOVE_PLAYER],
+        mode=MODE_SWISS,
+        seed=0,
+        max_turns=20,
+    )
+    pairings = tournament.schedule()
+    assert len(pairings) == 2
+    players = [i for p in pairings for i in (p.first, p.second)]
+    assert sorted(players) == [0, 1, 2, 3]
+    tournament.add_game(0, 1, PLAYER_A)
+    tournament.add_game(2, 3, PLAYER_B)
+    tournament.add_game(0, 3, PLAYER_UNRESOLVED)
+    tournament.run(num_workers=1, max_rounds=2)
+    assert tournament.get_round() == 2
+    # a pairing plays at most once per round
+    for p in tournament.get_ratings().get_pairings():
+        assert p.get_games() <= 2 * 2 + 1
@@ -0,0 +1,63 @@
+# noqa
+
+import random
+
+from src.actions import (
+    MoveKinds,
+    apply_move,
+    decode_action,
+    get_opponent,
+    legal_actions,
+)
+from src.cards.cardtypes import TroopColors, Troops
+from src.consts import NUM_CARD_IDS, PLAYER_A, PLAYER_B, PLAYER_UNRESOLVED
+from src.gamestate import GameState
+from src.resolver import aggregate_used_troops, resolve
+from src.tracker import CardTracker
+
+
+def test_tracker_initial_counts():  # noqa: D103
+    state = GameState.new(random.Random(0))
+    tracker = CardTracker.from_state(state, PLAYER_A)
+    assert tracker.get_num_unseen_troops() == 60 - 7
+    assert tracker.get_num_unseen_tactics() == 10
+    assert tracker.get_used_troops() == []
+    for card in state.get_hands(PLAYER_A):
+        color, number = card.get_color(), card.get_troop()  # type: ignore
+        assert not tracker.is_unseen(card.get_card_id())
+        assert tracker.get_remaining(color, number) == 0
+    colors = [tracker.get_remaining_color(c) for c in TroopColors]
+    numbers = [tracker.get_remaining_number(n) for n in Troops]
+    assert sum(colors) == sum(numbers) == 60 - 7
+
+
+def test_tracker_follows_game():  # noqa: D103
+    rng = random.Random(0)
+    state = GameState.new(random.Random(0))
+    trackers = [CardTracker.from_state(state, p) for p in (PLAYER_A, PLAYER_B)]
+    public = CardTracker.from_state(state)
+    player = PLAYER_A
+    scouted = False
+    for _ in range(200):
+        moves = [decode_action(a) for a in legal_actions(state, player)]
+        scouts = [m for m in moves if m.kind == MoveKinds.SCOUT]
+        move = rng.choice(scouts or moves)
+        drawn = apply_move(state, player, move)
+        for tracker in (*trackers, public):
+            tracker.observe_move(player, move, drawn)
+        if move.kind == MoveKinds.SCOUT:
+            trackers[player].observe_private(state)
+            scouted = True
+        resolve(state, public.get_used_troops())
+        for p, tracker in ((PLAYER_A, trackers[0]), (PLAYER_B, trackers[1])):
+            # the scouted cards drawn by the opponent are not seen in the state
+            expected = CardTracker.from_state(state, p)
+            for card_id in range(NUM_CARD_IDS):
+                if tracker.is_unseen(card_id):
+                    assert expected.is_unseen(card_id)
+        assert sorted(public.get_used_troops()) == sorted(aggregate_used_troops(state))
+        assert public.get_player() == PLAYER_UNRESOLVED
+        if state.get_winner() != PLAYER_UNRESOLVED:
+            break
+        player = get_opponent(player)
+    assert scouted